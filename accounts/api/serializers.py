@@ -1,18 +1,34 @@
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from ..models import User
-from shortener.api.serializers import ShortURLSerializer
+from shortener.api.serializers import ShortURLSerializer, UserStatsSerializer
+from shortener.stats import get_user_stats
 
 class UserSerializer(serializers.ModelSerializer):
     """
-    Serializer for the User model.
-
-    Includes a nested representation of the user's short URLs (read-only).
+    Serializer for the User model, with the totals over the user's links.
     """
-    urls = ShortURLSerializer(many=True, read_only=True)
+    stats = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'email', 'first_name', 'last_name', 'urls']
+        fields = ['id', 'email', 'first_name', 'last_name', 'stats']
+
+    @extend_schema_field(UserStatsSerializer)
+    def get_stats(self, user):
+        return UserStatsSerializer(get_user_stats(user)).data
+
+class UserWithURLsSerializer(UserSerializer):
+    """
+    User serializer with a nested list of the user's short URLs (read-only).
+
+    Its size grows with the account, so it is only used on request;
+    the export endpoint is the scalable way to fetch every link.
+    """
+    urls = ShortURLSerializer(many=True, read_only=True)
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['urls']
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
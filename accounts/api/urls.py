@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import RegisterAPIView, LoginAPIView, UserDetailAPIView
+from .views import RegisterAPIView, LoginAPIView, AsyncLoginAPIView, UserDetailAPIView
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     path('register/', RegisterAPIView.as_view(), name='api_register'),
     path('login/', LoginAPIView.as_view(), name='api_login'),
+    path('login/async/', AsyncLoginAPIView.as_view(), name='api_login_async'),
     path('me/', UserDetailAPIView.as_view(), name='api_user_detail'),
     path('token/refresh/', TokenRefreshView.as_view(), name='api_token_refresh'),
 ]
\ No newline at end of file
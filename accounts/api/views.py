@@ -1,24 +1,58 @@
+import json
+from asgiref.sync import sync_to_async
 from django.db import models
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
+from django.contrib.auth import aauthenticate, authenticate
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from shortener.api.serializers import DeletionJobSerializer
+from shortener.deletion import start_account_deletion
+from shortener.ratelimit import RateLimitMixin
+from ..hashing import LoginBusy
 from ..models import User
-from .serializers import UserSerializer, RegisterSerializer
+from .serializers import UserSerializer, UserWithURLsSerializer, RegisterSerializer
 import logging
 
 logger = logging.getLogger('accounts')
+# Per-request messages: sampled and rate-limited (see shortener.logutils)
+request_logger = logging.getLogger('accounts.requests')
 
-class UserDetailAPIView(generics.RetrieveAPIView):
+LOGIN_BUSY_ERROR = "Login is temporarily overloaded, please retry."
+
+class UserDetailAPIView(generics.RetrieveDestroyAPIView):
     """
-    API endpoint to retrieve details of the authenticated user.
+    API endpoint to retrieve or delete the authenticated user.
+
+    The user's links are only nested when requested with ?include=urls.
+    DELETE deactivates the account and its links at once and deletes them
+    in the background; the response is the deletion job.
     """
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.request.query_params.get('include') == 'urls':
+            return UserWithURLsSerializer
+        return UserSerializer
+
+    @extend_schema(parameters=[OpenApiParameter('include', str, enum=['urls'], description="Nest every short URL the user owns.")])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @extend_schema(responses={202: DeletionJobSerializer})
+    def delete(self, request, *args, **kwargs):
+        job = start_account_deletion(request.user)
+        logger.info(f"API account deletion requested: {request.user.email}")
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
     def get_object(self):
-        logger.info(f"API User detail accessed: {self.request.user.email}")
+        request_logger.info("API User detail accessed: %s", self.request.user.email)
         return self.request.user
 
 class RegisterAPIView(generics.CreateAPIView):
@@ -34,15 +68,50 @@ class LoginAPIView(APIView):
     API endpoint to obtain JWT tokens.
     """
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'login'
 
     def post(self, request):
         email = request.data.get("email")
         password = request.data.get("password")
-        user = authenticate(email=email, password=password)
+        try:
+            user = authenticate(email=email, password=password)
+        except LoginBusy:
+            logger.warning("API login rejected: password check pool is full")
+            return Response({"error": LOGIN_BUSY_ERROR}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
         if user:
             refresh = RefreshToken.for_user(user)
             return Response({
                 "refresh": str(refresh),
                 "access": str(refresh.access_token),
             })
-        return Response({"error": "Invalid Credentials"}, status=status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        return Response({"error": "Invalid Credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncLoginAPIView(RateLimitMixin, View):
+    """
+    Async variant of LoginAPIView for ASGI deployments.
+
+    Password hashing is awaited on the bounded login pool, so the event loop
+    keeps serving other requests during a login burst.
+    """
+    throttle_scope = 'login'
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+        try:
+            user = await aauthenticate(request, email=data.get("email"), password=data.get("password"))
+        except LoginBusy:
+            logger.warning("Async API login rejected: password check pool is full")
+            return JsonResponse({"error": LOGIN_BUSY_ERROR}, status=503, headers={'Retry-After': '1'})
+        if user:
+            # Issuing a refresh token records it in the blacklist app's table
+            refresh = await sync_to_async(RefreshToken.for_user)(user)
+            return JsonResponse({
+                "refresh": str(refresh),
+                "access": str(refresh.access_token),
+            })
+        return JsonResponse({"error": "Invalid Credentials"}, status=401)
@@ -0,0 +1,52 @@
+"""
+API authentication backends.
+
+CachedJWTAuthentication keeps the principal of JWT-authenticated requests in
+the shared cache, so steady-state API traffic needs no user query. Entries
+are evicted by accounts.signals whenever a User is saved or deleted.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+def user_cache_key(user_id):
+    return f"accounts:user:{user_id}"
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves users from a short-TTL cache.
+
+    Behaves like simplejwt's JWTAuthentication (including the is_active and
+    revoked-token checks), but only loads the User row on a cache miss.
+    Changes made with QuerySet.update() skip the eviction signal and become
+    visible after ACCOUNTS_USER_CACHE_TIMEOUT seconds.
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            cache.set(key, user, settings.ACCOUNTS_USER_CACHE_TIMEOUT)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
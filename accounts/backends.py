@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+from .hashing import check_encoded_password, get_login_pool
+
+UserModel = get_user_model()
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend that hashes passwords on the bounded login pool.
+
+    The user lookup and any rehash save stay on the calling thread; only the
+    CPU-bound hashing runs on the pool. If the stored hash uses an outdated
+    hasher or cost, it is rewritten after a successful login.
+
+    Raises:
+        LoginBusy: From authenticate()/aauthenticate() when the pool is saturated.
+    """
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            user = None
+
+        pool = get_login_pool()
+        valid, must_update = pool.run(check_encoded_password, password, user.password if user else None)
+        if not valid:
+            return None
+        if must_update:
+            user.password = pool.run(make_password, password)
+            user.save(update_fields=['password'])
+        return user if self.user_can_authenticate(user) else None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            user = None
+
+        pool = get_login_pool()
+        valid, must_update = await pool.arun(check_encoded_password, password, user.password if user else None)
+        if not valid:
+            return None
+        if must_update:
+            user.password = await pool.arun(make_password, password)
+            await user.asave(update_fields=['password'])
+        return user if self.user_can_authenticate(user) else None
@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth import authenticate
+from .hashing import LoginBusy
 from .models import User
 from django.contrib.auth.password_validation import validate_password
 
@@ -49,14 +50,17 @@ class UserLoginForm(forms.Form):
         Authenticate the user.
 
         Raises:
-            ValidationError: If authentication fails.
+            ValidationError: If authentication fails or the login pool is saturated.
         """
         cleaned_data = super().clean()
         email = cleaned_data.get('email')
         password = cleaned_data.get('password')
 
         if email and password:
-            user = authenticate(email=email, password=password)
+            try:
+                user = authenticate(email=email, password=password)
+            except LoginBusy:
+                raise forms.ValidationError("Too many sign-ins right now. Please try again in a moment.")
             if not user:
                 raise forms.ValidationError("Invalid email or password.")
             cleaned_data['user'] = user
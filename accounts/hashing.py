@@ -0,0 +1,132 @@
+"""
+Bounded offloading of password hashing for the login paths.
+
+Hash verification runs on a dedicated thread pool (hashlib releases the GIL
+while hashing, so threads give real parallelism) with its own cap on
+pending work. When the cap is reached new logins are rejected immediately
+with LoginBusy instead of tying up request workers, so a login storm only
+degrades login.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password, verify_password
+
+logger = logging.getLogger('accounts')
+
+
+class LoginBusy(Exception):
+    """Raised when the password check pool has no free slot."""
+
+
+class PasswordCheckPool:
+    """
+    Thread pool for CPU-bound password hashing with queue-time metrics.
+
+    At most `max_pending` checks (running plus queued) are admitted at once.
+    """
+    def __init__(self, workers, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-check')
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending else None
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._rejected = 0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+
+    def submit(self, fn, *args):
+        """
+        Schedule fn(*args) on the pool.
+
+        Returns:
+            concurrent.futures.Future: The pending result.
+
+        Raises:
+            LoginBusy: If the pool already holds max_pending checks.
+        """
+        if self._slots is None or not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise LoginBusy()
+
+        enqueued = time.monotonic()
+
+        def run():
+            waited = time.monotonic() - enqueued
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+                with self._lock:
+                    self._completed += 1
+                    self._queue_time_total += waited
+                    self._queue_time_max = max(self._queue_time_max, waited)
+
+        return self._executor.submit(run)
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and block until it finishes."""
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        """Run fn(*args) on the pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Completed and rejected checks plus average and max queue time (seconds).
+        """
+        with self._lock:
+            return {
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'queue_time_avg': self._queue_time_total / self._completed if self._completed else 0.0,
+                'queue_time_max': self._queue_time_max,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_login_pool():
+    """Return the process-wide password check pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordCheckPool(settings.ACCOUNTS_LOGIN_WORKERS, settings.ACCOUNTS_LOGIN_MAX_PENDING)
+    return _pool
+
+
+def check_encoded_password(password, encoded):
+    """
+    Verify a raw password against a stored hash.
+
+    With no stored hash (unknown user) a hash is still computed so response
+    time does not reveal whether the account exists.
+
+    Returns:
+        tuple: (is_correct, must_update).
+    """
+    if encoded is None:
+        make_password(password)
+        return False, False
+    return verify_password(password, encoded)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from ACCOUNTS_PBKDF2_ITERATIONS.
+
+    It keeps the 'pbkdf2_sha256' algorithm name, so existing hashes still
+    verify and are rewritten with the configured cost on the next login.
+    """
+    @property
+    def iterations(self):
+        return settings.ACCOUNTS_PBKDF2_ITERATIONS
@@ -0,0 +1,14 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import user_cache_key
+from .models import User
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    """
+    Drop the cached API principal so deactivation, password changes and
+    deletions take effect on the next request.
+    """
+    cache.delete(user_cache_key(instance.pk))
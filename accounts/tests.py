@@ -1,9 +1,16 @@
-from django.test import TestCase
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
 from django.urls import reverse
+from shortener.ratelimit import get_limiter
+from .hashing import PasswordCheckPool, get_login_pool
 from .models import User
 
 class AuthenticationTests(TestCase):
     def setUp(self):
+        get_limiter().reset()
+        self.addCleanup(get_limiter().reset)
         self.register_url = reverse('register')
         self.login_url = reverse('login')
         self.user_data = {
@@ -49,3 +56,85 @@ class AuthenticationTests(TestCase):
         response = self.client.get(reverse('logout'))
         self.assertEqual(response.status_code, 302)
         self.assertFalse('_auth_user_id' in self.client.session)
+
+    @override_settings(SHORTENER_RATE_LIMITS={'login': {'rate': '1/min', 'burst': 1, 'key': 'ip'}})
+    def test_login_api_is_throttled(self):
+        credentials = {'email': 'nobody@example.com', 'password': 'wrong'}
+        response = self.client.post(reverse('api_login'), credentials)
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post(reverse('api_login'), credentials)
+        self.assertEqual(response.status_code, 429)
+
+    def test_user_detail_nests_urls_only_on_request(self):
+        user = User.objects.create_user(
+            email=self.user_data['email'],
+            password=self.user_data['password'],
+            first_name=self.user_data['first_name'],
+            last_name=self.user_data['last_name']
+        )
+        self.client.force_login(user)
+        response = self.client.get(reverse('api_user_detail'))
+        self.assertNotIn('urls', response.json())
+        response = self.client.get(reverse('api_user_detail'), {'include': 'urls'})
+        self.assertEqual(response.json()['urls'], [])
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='jwt@example.com',
+            password='StrongPassword123!',
+            first_name='Jwt',
+            last_name='User'
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def test_cached_user_needs_no_query(self):
+        self.assertEqual(self.client.get(reverse('api_user_detail'), **self.auth).status_code, 200)
+        # Only the user's link totals; the user itself comes from the cache
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_user_detail'), **self.auth)
+        self.assertEqual(response.json()['email'], 'jwt@example.com')
+
+    def test_deactivation_invalidates_cache(self):
+        self.assertEqual(self.client.get(reverse('api_user_detail'), **self.auth).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('api_user_detail'), **self.auth).status_code, 401)
+
+
+class PooledLoginTests(TestCase):
+    def setUp(self):
+        get_limiter().reset()
+        self.addCleanup(get_limiter().reset)
+        self.credentials = {'email': 'pool@example.com', 'password': 'StrongPassword123!'}
+        self.user = User.objects.create_user(first_name='Pool', last_name='User', **self.credentials)
+
+    def test_login_rejected_when_pool_is_full(self):
+        with mock.patch('accounts.hashing._pool', PasswordCheckPool(workers=1, max_pending=0)):
+            response = self.client.post(reverse('api_login'), self.credentials)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(
+        PASSWORD_HASHERS=['accounts.hashing.TunedPBKDF2PasswordHasher'],
+        ACCOUNTS_PBKDF2_ITERATIONS=1000,
+    )
+    def test_login_rehashes_with_configured_profile(self):
+        self.assertEqual(self.client.post(reverse('api_login'), self.credentials).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertGreater(get_login_pool().metrics()['completed'], 0)
+
+    async def test_async_login(self):
+        response = await self.async_client.post(
+            reverse('api_login_async'), self.credentials, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
+
+        response = await self.async_client.post(
+            reverse('api_login_async'), {'email': 'pool@example.com', 'password': 'nope'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
@@ -3,6 +3,7 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
 from django.views.generic import TemplateView
+from shortener.ratelimit import RateLimitMixin
 from .forms import UserRegistrationForm, UserLoginForm
 import logging
 
@@ -41,13 +42,15 @@ class RegisterView(View):
         logger.warning("Registration failed: Invalid form data")
         return render(request, self.template_name, {'form': form})
 
-class LoginView(View):
+class LoginView(RateLimitMixin, View):
     """
     Handles user login.
 
     Authenticates existing users via email and password.
     """
     template_name = 'registration/login.html'
+    throttle_scope = 'login'
+    throttle_methods = ('POST',)
     
     def get(self, request):
         return render(request, self.template_name, {'form': UserLoginForm()})
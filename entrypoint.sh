@@ -14,16 +14,41 @@ if [ "$1" = 'web' ]; then
     python manage.py migrate --noinput
     echo "Collecting static files..."
     python manage.py collectstatic --noinput
+    if [ "$WARM_REDIRECT_CACHE_TOP" ]; then
+        echo "Warming redirect cache..."
+        python manage.py warm_redirect_cache --top "$WARM_REDIRECT_CACHE_TOP" --by "${WARM_REDIRECT_CACHE_BY:-clicks}" \
+            || echo "Cache warm-up failed, continuing"
+    fi
     echo "Starting Gunicorn..."
     exec gunicorn url_shortener.wsgi:application --bind 0.0.0.0:8000
+elif [ "$1" = 'resolver' ]; then
+    # Redirect-only app (url_shortener/redirect_asgi.py); route /<code>/ here
+    echo "Starting redirect resolver..."
+    exec daphne -b 0.0.0.0 -p "${RESOLVER_PORT:-8001}" url_shortener.redirect_asgi:application
 elif [ "$1" = 'dev' ]; then
     echo "Running migrations..."
     python manage.py migrate --noinput
     echo "Starting Development Server (Hot Reloading)..."
     exec python manage.py runserver 0.0.0.0:8000
 elif [ "$1" = 'worker' ]; then
+    # Every queue, most urgent first (single-container setups)
     echo "Starting Celery worker..."
-    exec celery -A url_shortener worker --loglevel=info
+    exec celery -A url_shortener worker --loglevel=info -Q critical,default,bulk,maintenance \
+        ${CELERY_CONCURRENCY:+--concurrency "$CELERY_CONCURRENCY"}
+elif [ "$1" = 'worker-critical' ]; then
+    # New-link activation only; keep at least one running
+    echo "Starting Celery worker (critical)..."
+    exec celery -A url_shortener worker --loglevel=info -Q critical -n critical@%h \
+        ${CELERY_CONCURRENCY:+--concurrency "$CELERY_CONCURRENCY"}
+elif [ "$1" = 'worker-bulk' ]; then
+    # QR rendering, link-health runs and anything unrouted
+    echo "Starting Celery worker (bulk)..."
+    exec celery -A url_shortener worker --loglevel=info -Q default,bulk,maintenance -n bulk@%h -O fair \
+        ${CELERY_CONCURRENCY:+--concurrency "$CELERY_CONCURRENCY"}
+elif [ "$1" = 'beat' ]; then
+    # Periodic tasks (CELERY_BEAT_SCHEDULE); run exactly one per deployment
+    echo "Starting Celery beat..."
+    exec celery -A url_shortener beat --loglevel=info --schedule /tmp/celerybeat-schedule
 else
     exec "$@"
 fi
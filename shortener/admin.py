@@ -1,8 +1,194 @@
+"""
+Admin for ShortURL, built to stay responsive on tables with tens of millions
+of rows: no exact counts, indexed-only search and keyset ("cursor") paging
+instead of OFFSET when the list is in its default newest-first order.
+"""
+
 from django.contrib import admin
-from .models import ShortURL
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.utils.functional import cached_property
+from .hotkeys import hot_codes
+from .models import ArchivedShortURL, DeletionJob, ShortURL
+
+CURSOR_VAR = 'cursor'
+
+
+def estimate_table_rows(model, using='default'):
+    """
+    Read the planner's row estimate for a model's table.
+
+    Returns:
+        int: The estimated row count, or None if the backend doesn't keep one.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 for a table that has never been analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an unbounded COUNT(*).
+
+    Unfiltered lists use the planner's table estimate (`estimated`);
+    filtered lists (and backends without one) count at most
+    `max_exact_count` rows (`capped` when they hit it).
+    """
+    max_exact_count = 10000
+    capped = False
+    estimated = False
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimate_table_rows(self.object_list.model, self.object_list.db)
+            if estimate is not None:
+                self.estimated = True
+                return estimate
+        count = self.object_list[:self.max_exact_count].count()
+        self.capped = count >= self.max_exact_count
+        return count
+
+
+class CursorChangeList(ChangeList):
+    """
+    ChangeList that pages by primary key in the default (newest-first) order.
+
+    `?cursor=<pk>` shows the rows older than that pk, so every page costs one
+    index range scan however deep it is. Any other ordering falls back to the
+    regular numbered pages.
+    """
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing a filter, search or sort restarts from the first page
+        if not new_params or CURSOR_VAR not in new_params:
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        self.cursor = self.params.get(CURSOR_VAR)
+        self.next_cursor = None
+        self.cursor_mode = ORDER_VAR not in self.params
+        if not self.cursor_mode:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        if self.cursor:
+            try:
+                queryset = queryset.filter(pk__lt=int(self.cursor))
+            except ValueError:
+                raise IncorrectLookupParameters
+        rows = list(queryset.order_by('-pk')[:self.list_per_page + 1])
+        if len(rows) > self.list_per_page:
+            rows = rows[:self.list_per_page]
+            self.next_cursor = rows[-1].pk
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = self.next_cursor is not None or bool(self.cursor)
+        self.paginator = paginator
+
+    @property
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR])
+
+    @property
+    def next_page_url(self):
+        return self.get_query_string({CURSOR_VAR: self.next_cursor})
+
+class HotLinkFilter(admin.SimpleListFilter):
+    """
+    Restricts the changelist to the codes in the current hot set.
+    """
+    title = 'traffic'
+    parameter_name = 'hot'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Hot right now')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            codes = [code for code, _ in hot_codes()]
+            return queryset.filter(models.Q(short_key__in=codes) | models.Q(custom_key__in=codes))
+        return queryset
 
 @admin.register(ShortURL)
 class ShortURLAdmin(admin.ModelAdmin):
-    list_display = ('short_key', 'custom_key', 'original_url', 'user', 'status', 'click_count', 'created_at')
-    search_fields = ('short_key', 'custom_key', 'original_url', 'user__email')
-    list_filter = ('status', 'created_at')
+    list_display = ('short_key', 'custom_key', 'original_url', 'user', 'status', 'is_active', 'click_count', 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('short_key', 'custom_key', 'user__email')
+    search_help_text = "Code prefix, or the owner's exact email address."
+    list_filter = (HotLinkFilter, 'status', 'is_active', 'health__ok', 'created_at')
+    # Only indexed columns can be sorted without a full table sort
+    sortable_by = ('short_key', 'custom_key')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search with index lookups only: an exact owner email, or a prefix of
+        the short or custom code. Unanchored LIKE scans are never issued.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if '@' in term:
+            return queryset.filter(user__email=term), False
+        return queryset.filter(models.Q(short_key__startswith=term) | models.Q(custom_key__startswith=term)), False
+
+
+@admin.register(ArchivedShortURL)
+class ArchivedShortURLAdmin(admin.ModelAdmin):
+    list_display = ('short_key', 'custom_key', 'original_url', 'user', 'click_count', 'archived_at')
+    list_select_related = ('user',)
+    search_fields = ('=short_key', '=custom_key')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'email', 'kind', 'status', 'deleted', 'total', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('=email',)
+    readonly_fields = [field.name for field in DeletionJob._meta.fields]
+    actions = ['resume']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Resume selected jobs")
+    def resume(self, request, queryset):
+        from .tasks import run_deletion_job_task
+        jobs = list(queryset.exclude(status='done').values_list('pk', flat=True))
+        for job_id in jobs:
+            run_deletion_job_task.delay(job_id)
+        self.message_user(request, f"Queued {len(jobs)} deletion jobs.")
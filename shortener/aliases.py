@@ -0,0 +1,147 @@
+"""
+Batch availability checks and short-lived reservations for custom aliases.
+
+taken_codes() answers for any number of candidate aliases with two queries:
+an IN lookup on the indexed short_key and custom_key columns of the main
+table, then of the archive table (archived codes stay reserved, see
+shortener.archive). reserve_aliases() then holds the free ones for the
+calling user for SHORTENER_ALIAS_RESERVATION_TTL seconds, and link creation
+refuses an alias another user holds, so a bulk campaign that checked its
+aliases first doesn't fail halfway. With REDIS_URL all of a request's
+aliases are claimed (SET NX) or renewed by one Lua script call; without it
+the reservations live in the process-local cache.
+"""
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from .archive import archived_codes
+from .models import ShortURL
+
+ALIAS_MAX_LENGTH = ShortURL._meta.get_field('custom_key').max_length
+
+# KEYS: reservation keys; ARGV: owner, ttl. Returns the (1-based) positions
+# of the keys now held by the owner.
+RESERVE_SCRIPT = """
+local held = {}
+for i, key in ipairs(KEYS) do
+    if redis.call('SET', key, ARGV[1], 'NX', 'EX', ARGV[2]) then
+        held[#held + 1] = i
+    elseif redis.call('GET', key) == ARGV[1] then
+        redis.call('EXPIRE', key, ARGV[2])
+        held[#held + 1] = i
+    end
+end
+return held
+"""
+
+_redis = None
+_reserve_script = None
+
+
+def _client():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _redis
+
+
+def alias_reservation_key(alias):
+    return f"shortener:alias:{alias}"
+
+
+def is_valid_alias(alias):
+    """Whether `alias` can be stored as a custom key and routed as /<alias>/."""
+    return bool(alias) and len(alias) <= ALIAS_MAX_LENGTH and '/' not in alias
+
+
+def taken_codes(codes):
+    """
+    Return which of `codes` are used by a link, live or archived, in two queries.
+    """
+    codes = {code for code in codes if code}
+    if not codes:
+        return set()
+    taken = set()
+    live = ShortURL.objects.filter(
+        models.Q(short_key__in=codes) | models.Q(custom_key__in=codes)
+    ).values_list('short_key', 'custom_key')
+    for pair in live:
+        taken.update(code for code in pair if code in codes)
+    return taken | archived_codes(codes - taken)
+
+
+def reserved_by_others(user_id, aliases):
+    """Return which of `aliases` are currently reserved by another user."""
+    aliases = list(aliases)
+    keys = [alias_reservation_key(alias) for alias in aliases]
+    if not keys:
+        return set()
+    if settings.REDIS_URL:
+        owner = str(user_id).encode()
+        held = _client().mget(keys)
+        return {alias for alias, holder in zip(aliases, held) if holder is not None and holder != owner}
+    held = cache.get_many(keys)
+    return {alias for alias, key in zip(aliases, keys) if key in held and held[key] != user_id}
+
+
+def reserve_aliases(user_id, aliases, ttl=None):
+    """
+    Reserve free aliases for a user; ones the user already holds are renewed.
+
+    With REDIS_URL all of them are claimed in one round-trip.
+
+    Returns:
+        set: The aliases now held by the user.
+    """
+    global _reserve_script
+    ttl = ttl or settings.SHORTENER_ALIAS_RESERVATION_TTL
+    aliases = list(aliases)
+    if not aliases:
+        return set()
+    if settings.REDIS_URL:
+        if _reserve_script is None:
+            _reserve_script = _client().register_script(RESERVE_SCRIPT)
+        held = _reserve_script(keys=[alias_reservation_key(alias) for alias in aliases], args=[user_id, ttl])
+        return {aliases[position - 1] for position in held}
+    reserved = set()
+    for alias in aliases:
+        key = alias_reservation_key(alias)
+        if cache.add(key, user_id, ttl):
+            reserved.add(alias)
+        elif cache.get(key) == user_id:
+            cache.touch(key, ttl)
+            reserved.add(alias)
+    return reserved
+
+
+def check_aliases(user_id, aliases, reserve=False):
+    """
+    Check candidate aliases for a user, optionally reserving the free ones.
+
+    Returns:
+        dict: Alias -> None if available (and reserved, when asked), or the
+        reason it isn't: 'invalid', 'taken' or 'reserved'.
+    """
+    aliases = list(dict.fromkeys(aliases))
+    candidates = [alias for alias in aliases if is_valid_alias(alias)]
+    taken = taken_codes(candidates)
+    free = [alias for alias in candidates if alias not in taken]
+    held = reserved_by_others(user_id, free)
+    free = [alias for alias in free if alias not in held]
+    if reserve:
+        reserved = reserve_aliases(user_id, free)
+        # Lost a race for the rest since get_many
+        held.update(alias for alias in free if alias not in reserved)
+    results = {}
+    for alias in aliases:
+        if not is_valid_alias(alias):
+            results[alias] = 'invalid'
+        elif alias in taken:
+            results[alias] = 'taken'
+        elif alias in held:
+            results[alias] = 'reserved'
+        else:
+            results[alias] = None
+    return results
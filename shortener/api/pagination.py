@@ -0,0 +1,11 @@
+from rest_framework.pagination import CursorPagination
+
+class SearchResultsPagination(CursorPagination):
+    """
+    Keyset pagination for search results: no COUNT query and no OFFSET scan,
+    however deep the client pages.
+    """
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,62 @@
+import json
+from rest_framework import renderers
+from ..export import csv_lines
+
+try:
+    import orjson
+except ImportError:  # Optional: JSON is then encoded by the standard library
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    The default JSON renderer, encoding with orjson when it is installed.
+
+    Output is byte-for-byte what JSONRenderer produces in its default compact,
+    unicode mode for the values this API returns (strings, integers,
+    booleans, None and pre-formatted dates); anything else is handed to
+    JSONRenderer's encoder. Indented output (Accept: application/json;
+    indent=N) and payloads orjson rejects fall back to JSONRenderer.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these two for JavaScript embedding
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    Selects CSV output for the export endpoint (?format=csv or Accept: text/csv).
+
+    Successful exports are streamed by the view itself; render() only handles
+    error payloads such as authentication or throttling failures.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = [data]
+        fields = list(data[0]) if data else []
+        return ''.join(csv_lines(data, fields))
+
+class JSONLinesRenderer(renderers.BaseRenderer):
+    """
+    Selects JSON Lines output for the export endpoint (?format=jsonl).
+    """
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data) + '\n'
@@ -1,5 +1,31 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
-from ..models import ShortURL
+from ..aliases import reserved_by_others
+from ..archive import archived_codes
+from ..models import DeletionJob, ShortURL, UserStats
+
+class ShortURLListSerializer(serializers.ListSerializer):
+    """
+    Bulk create input: each link is validated against the database by
+    ShortURLSerializer, and here against the other links of the request.
+    """
+    def validate(self, attrs):
+        seen = set()
+        errors = []
+        for item in attrs:
+            key = item.get('custom_key')
+            if key and key in seen:
+                errors.append({'custom_key': ["This alias is used by another link in this request."]})
+            else:
+                errors.append({})
+            if key:
+                seen.add(key)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
 
 class ShortURLSerializer(serializers.ModelSerializer):
     """
@@ -9,4 +35,124 @@ class ShortURLSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = ShortURL
-        fields = ['id', 'original_url', 'short_key', 'custom_key', 'status', 'click_count', 'created_at', 'expiration_date', 'qr_code']
+        fields = ['id', 'original_url', 'short_key', 'custom_key', 'status', 'click_count', 'created_at', 'expiration_date', 'qr_code', 'redirect_status', 'updated_at', 'domain', 'is_active']
+        read_only_fields = ['domain']
+        list_serializer_class = ShortURLListSerializer
+
+    def validate_custom_key(self, value):
+        if value and archived_codes([value]):
+            raise serializers.ValidationError("This alias is already taken.")
+        request = self.context.get('request')
+        if value and request and reserved_by_others(request.user.pk, [value]):
+            raise serializers.ValidationError("This alias is reserved by another user.")
+        return value
+
+
+class ShortURLValuesSerializer:
+    """
+    Read-only fast path for ShortURLSerializer's output.
+
+    Builds the same dicts from QuerySet.values() rows (or from instances,
+    see from_instances), without creating model instances or running the
+    per-field serializer machinery for every row. QR code URLs are made by
+    appending the file name to a prefix computed once per response. Views
+    keep serializer_class = ShortURLSerializer, so the schema and the write
+    path are unchanged.
+
+    Args:
+        request (Request): Used to make QR code URLs absolute, as DRF does.
+    """
+    fields = ShortURLSerializer.Meta.fields
+    datetime_fields = ('created_at', 'expiration_date', 'updated_at')
+
+    def __init__(self, request=None):
+        self.request = request
+        self.datetime = serializers.DateTimeField().to_representation
+        self.storage = ShortURL._meta.get_field('qr_code').storage
+        self.media_prefix = None
+        if isinstance(self.storage, FileSystemStorage):
+            base_url = self.storage.base_url
+            self.media_prefix = request.build_absolute_uri(base_url) if request else base_url
+
+    def qr_code_url(self, name):
+        if not name:
+            return None
+        if self.media_prefix is not None:
+            return self.media_prefix + filepath_to_uri(name).lstrip('/')
+        url = self.storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request else url
+
+    def to_representation(self, row):
+        data = {field: row[field] for field in self.fields}
+        for field in self.datetime_fields:
+            if data[field] is not None:
+                data[field] = self.datetime(data[field])
+        data['qr_code'] = self.qr_code_url(data['qr_code'])
+        return data
+
+    def serialize(self, rows):
+        """Return the representation of every row, as a list."""
+        return [self.to_representation(row) for row in rows]
+
+    def from_instances(self, urls):
+        """Return the representation of saved ShortURL instances."""
+        rows = []
+        for url in urls:
+            row = {field: getattr(url, field) for field in self.fields}
+            row['qr_code'] = url.qr_code.name
+            rows.append(row)
+        return self.serialize(rows)
+
+
+class AliasCheckSerializer(serializers.Serializer):
+    aliases = serializers.ListField(child=serializers.CharField(trim_whitespace=False), allow_empty=False)
+    reserve = serializers.BooleanField(default=False)
+
+    def validate_aliases(self, value):
+        if len(value) > settings.SHORTENER_ALIAS_CHECK_MAX:
+            raise serializers.ValidationError(f"At most {settings.SHORTENER_ALIAS_CHECK_MAX} aliases per request.")
+        return value
+
+
+class AliasAvailabilitySerializer(serializers.Serializer):
+    alias = serializers.CharField()
+    available = serializers.BooleanField()
+    reason = serializers.ChoiceField(choices=['invalid', 'taken', 'reserved'], allow_null=True)
+
+
+class AliasCheckResultSerializer(serializers.Serializer):
+    results = AliasAvailabilitySerializer(many=True)
+    reserved_until = serializers.DateTimeField(allow_null=True)
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    """
+    Progress of a background account or bulk-link deletion.
+    """
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = DeletionJob
+        fields = ['id', 'kind', 'status', 'total', 'deleted', 'progress', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
+
+
+class UserStatsSerializer(serializers.ModelSerializer):
+    """
+    A user's link totals, as kept in UserStats.
+    """
+    active_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = UserStats
+        fields = ['link_count', 'active_count', 'expired_count', 'total_clicks']
+        read_only_fields = fields
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    codes = serializers.ListField(child=serializers.CharField(max_length=50), allow_empty=False)
+
+    def validate_codes(self, value):
+        if len(value) > settings.SHORTENER_BULK_DELETE_MAX:
+            raise serializers.ValidationError(f"At most {settings.SHORTENER_BULK_DELETE_MAX} codes per request.")
+        return value
@@ -1,10 +1,24 @@
 from django.urls import path
 from .views import (
     ShortURLListCreateAPIView,
-    ShortURLRetrieveUpdateDestroyAPIView
+    ShortURLBulkCreateAPIView,
+    ShortURLBulkDeleteAPIView,
+    AliasCheckAPIView,
+    DeletionJobDetailAPIView,
+    ShortURLRetrieveUpdateDestroyAPIView,
+    ShortURLExportAPIView,
+    ShortURLSearchAPIView,
+    HotLinksAPIView
 )
 
 urlpatterns = [
     path('shorten/', ShortURLListCreateAPIView.as_view(), name='api_url_list_create'),
+    path('shorten/bulk/', ShortURLBulkCreateAPIView.as_view(), name='api_url_bulk_create'),
+    path('shorten/bulk/delete/', ShortURLBulkDeleteAPIView.as_view(), name='api_url_bulk_delete'),
+    path('shorten/aliases/check/', AliasCheckAPIView.as_view(), name='api_alias_check'),
+    path('jobs/deletion/<int:pk>/', DeletionJobDetailAPIView.as_view(), name='api_deletion_job'),
+    path('search/', ShortURLSearchAPIView.as_view(), name='api_url_search'),
+    path('export/', ShortURLExportAPIView.as_view(), name='api_url_export'),
+    path('metrics/hot/', HotLinksAPIView.as_view(), name='api_hot_links'),
     path('urls/<str:short_key>/', ShortURLRetrieveUpdateDestroyAPIView.as_view(), name='api_url_detail'),
 ]
@@ -1,30 +1,213 @@
-from django.db import models
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from ..models import ShortURL
-from .serializers import ShortURLSerializer
+from rest_framework.views import APIView
+from ..aliases import check_aliases
+from ..archive import promote_owned
+from ..deletion import start_link_deletion
+from ..export import STATS_FIELDS, USER_EXPORT_FIELDS, encode_rows, export_links
+from ..hotkeys import hot_codes
+from ..idempotency import IdempotencyMixin
+from ..models import ArchivedShortURL, DeletionJob, ShortURL
+from ..search import search_urls
+from .pagination import SearchResultsPagination
+from .renderers import CSVRenderer, JSONLinesRenderer
+from .serializers import (
+    AliasCheckResultSerializer, AliasCheckSerializer, BulkDeleteSerializer, DeletionJobSerializer,
+    ShortURLSerializer, ShortURLValuesSerializer,
+)
 import logging
 
 logger = logging.getLogger('shortener')
+# Per-request messages: sampled and rate-limited (see shortener.logutils)
+request_logger = logging.getLogger('shortener.requests')
 
-class ShortURLListCreateAPIView(generics.ListCreateAPIView):
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified validators to GET responses.
+
+    Subclasses implement get_validators(); a request whose If-None-Match or
+    If-Modified-Since still matches is answered with a 304 before any
+    serialization happens.
+    """
+    def get_validators(self):
+        """
+        Returns:
+            tuple: (etag source string, last modified datetime or None).
+        """
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag_source, last_modified = self.get_validators()
+        etag = quote_etag(hashlib.md5(etag_source.encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        # Per-user data: browsers may keep it but must revalidate every time
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class ValuesListMixin:
+    """
+    Lists links from .values() rows through ShortURLValuesSerializer.
+
+    The JSON is the same as ShortURLSerializer's (which stays the view's
+    serializer_class, for the schema and for writes), at a fraction of the
+    per-row cost. Works with the view's pagination class.
+    """
+    def list(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).values(*ShortURLValuesSerializer.fields)
+        serializer = ShortURLValuesSerializer(request)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
+
+class ShortURLListCreateAPIView(IdempotencyMixin, ConditionalGetMixin, ValuesListMixin, generics.ListCreateAPIView):
     """
     API view to list and create short URLs.
 
-    GET: Returns a list of all short URLs for the authenticated user.
-    POST: Creates a new short URL.
+    GET: Returns a list of the authenticated user's live short URLs;
+        archived links are left out until a redirect promotes them (the
+        export includes them).
+    POST: Creates a new short URL (honours an Idempotency-Key header).
     """
     serializer_class = ShortURLSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'create'
+    throttle_methods = ('POST',)
 
     def get_queryset(self):
-        return ShortURL.objects.filter(user=self.request.user)
+        return ShortURL.objects.filter(user=self.request.user, deletion_job__isnull=True)
+
+    def get_validators(self):
+        # Any create, update or click bumps the newest updated_at; deletes change the count
+        stats = self.get_queryset().aggregate(count=models.Count('id'), last_modified=models.Max('updated_at'))
+        etag_source = f"{self.request.user.pk}:{stats['count']}:{stats['last_modified']}"
+        return etag_source, stats['last_modified']
 
     def perform_create(self, serializer):
         url = serializer.save(user=self.request.user)
-        logger.info(f"API ShortURL created by {self.request.user.email}: {url.short_key or url.custom_key}")
+        request_logger.info("API ShortURL created by %s: %s", self.request.user.email, url.short_key or url.custom_key)
 
-class ShortURLRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ShortURLBulkCreateAPIView(IdempotencyMixin, generics.CreateAPIView):
+    """
+    API view to create several short URLs in one request.
+
+    POST: Takes a JSON list of links (at most SHORTENER_BULK_CREATE_MAX) and
+    creates all of them or none. Honours an Idempotency-Key header.
+    """
+    serializer_class = ShortURLSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'create'
+    throttle_methods = ('POST',)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            raise ValidationError({'detail': "Expected a list of links."})
+        if len(request.data) > settings.SHORTENER_BULK_CREATE_MAX:
+            raise ValidationError({'detail': f"At most {settings.SHORTENER_BULK_CREATE_MAX} links per request."})
+        try:
+            with transaction.atomic():
+                serializer = self.get_serializer(data=request.data)
+                serializer.is_valid(raise_exception=True)
+                self.perform_create(serializer)
+        except IntegrityError:
+            # A concurrent request took one of the aliases after validation
+            return Response(
+                {'detail': "One of these aliases was just taken by another link; nothing was created."},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.created_data, status=status.HTTP_201_CREATED)
+
+    def perform_create(self, serializer):
+        urls = serializer.save(user=self.request.user)
+        request_logger.info("API bulk create by %s: %d ShortURLs", self.request.user.email, len(urls))
+        # Same JSON as serializer.data, without per-field serialization of every link
+        self.created_data = ShortURLValuesSerializer(self.request).from_instances(urls)
+
+class ShortURLBulkDeleteAPIView(APIView):
+    """
+    API view to delete many short URLs at once.
+
+    POST: Takes {"codes": [...]} (at most SHORTENER_BULK_DELETE_MAX). The
+    links stop redirecting immediately and are deleted in the background;
+    the response is the job, whose progress can be followed at its URL.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'create'
+
+    @extend_schema(request=BulkDeleteSerializer, responses={202: DeletionJobSerializer})
+    def post(self, request):
+        serializer = BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = start_link_deletion(request.user, serializer.validated_data['codes'])
+        if job is None:
+            return Response({'detail': "None of these codes match your links."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+class AliasCheckAPIView(APIView):
+    """
+    API view to check many candidate custom aliases at once.
+
+    POST: Takes {"aliases": [...], "reserve": false} (at most
+    SHORTENER_ALIAS_CHECK_MAX) and answers each alias's availability from
+    two database queries. With "reserve": true the available aliases are held
+    for the caller for SHORTENER_ALIAS_RESERVATION_TTL seconds, during
+    which nobody else can create a link with them.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'create'
+
+    @extend_schema(request=AliasCheckSerializer, responses={200: AliasCheckResultSerializer})
+    def post(self, request):
+        serializer = AliasCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        reserve = serializer.validated_data['reserve']
+        results = check_aliases(request.user.pk, serializer.validated_data['aliases'], reserve=reserve)
+        reserved_until = None
+        if reserve and None in results.values():
+            reserved_until = timezone.now() + timedelta(seconds=settings.SHORTENER_ALIAS_RESERVATION_TTL)
+        request_logger.info("API alias check by %s: %d aliases", request.user.email, len(results))
+        return Response(AliasCheckResultSerializer({
+            'results': [
+                {'alias': alias, 'available': reason is None, 'reason': reason}
+                for alias, reason in results.items()
+            ],
+            'reserved_until': reserved_until,
+        }).data)
+
+class DeletionJobDetailAPIView(generics.RetrieveAPIView):
+    """
+    API view to follow the progress of one of the user's deletion jobs.
+    """
+    serializer_class = DeletionJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return DeletionJob.objects.filter(user=self.request.user)
+
+class ShortURLRetrieveUpdateDestroyAPIView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a specific short URL.
 
@@ -35,25 +218,111 @@ class ShortURLRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
     lookup_field = 'short_key'
 
     def get_queryset(self):
-        return ShortURL.objects.filter(user=self.request.user)
+        return ShortURL.objects.filter(user=self.request.user, deletion_job__isnull=True)
     
     def get_object(self):
         """
         Retrieve the ShortURL instance.
 
         Tries to look up by short_key first, then falls back to custom_key.
+        The instance is memoized so validators and the handler share one query.
         """
+        if getattr(self, '_object', None) is not None:
+            return self._object
+
         queryset = self.get_queryset()
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
         
         # Also try custom_key if short_key fails
-        obj = queryset.filter(models.Q(short_key=self.kwargs[lookup_url_kwarg]) | models.Q(custom_key=self.kwargs[lookup_url_kwarg])).first()
+        code = self.kwargs[lookup_url_kwarg]
+        obj = queryset.filter(models.Q(short_key=code) | models.Q(custom_key=code)).first()
+        if not obj and promote_owned(self.request.user, [code]):
+            # An archived link of the user's: bring it back to act on it
+            obj = queryset.filter(models.Q(short_key=code) | models.Q(custom_key=code)).first()
         if not obj:
             from django.http import Http404
-            logger.warning(f"API 404 for ShortURL: {self.kwargs[lookup_url_kwarg]}")
+            request_logger.warning("API 404 for ShortURL: %s", self.kwargs[lookup_url_kwarg])
             raise Http404
         
         if self.request.method == 'DELETE':
-             logger.info(f"API ShortURL deleted by {self.request.user.email}: {obj.short_key or obj.custom_key}")
+             request_logger.info("API ShortURL deleted by %s: %s", self.request.user.email, obj.short_key or obj.custom_key)
         
+        self._object = obj
         return obj
+
+    def get_validators(self):
+        obj = self.get_object()
+        return f"{obj.pk}:{obj.updated_at.isoformat()}", obj.updated_at
+
+
+class ShortURLSearchAPIView(ValuesListMixin, generics.ListAPIView):
+    """
+    API view to search the authenticated user's short URLs.
+
+    GET ?q=<term> matches code and domain prefixes and substrings of the
+    original URL, newest first, with cursor pagination. Archived links
+    are not searched.
+    """
+    serializer_class = ShortURLSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SearchResultsPagination
+
+    def get_queryset(self):
+        term = self.request.query_params.get('q', '').strip()
+        if not term:
+            raise ValidationError({'q': "A search term is required."})
+        return search_urls(ShortURL.objects.filter(user=self.request.user, deletion_job__isnull=True), term)
+
+    @extend_schema(parameters=[OpenApiParameter('q', OpenApiTypes.STR, required=True, description="Code or domain prefix, or part of the original URL.")])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class ShortURLExportAPIView(APIView):
+    """
+    API view to download all of the authenticated user's short URLs.
+
+    Streams CSV (default) or JSON Lines straight from a chunked database
+    iterator, so large accounts never build the full list in memory.
+    Archived links are included, after the live ones. Pass ?stats=true to
+    include click statistics.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [CSVRenderer, JSONLinesRenderer]
+    throttle_scope = 'export'
+    chunk_size = 2000
+
+    @extend_schema(
+        parameters=[OpenApiParameter('stats', OpenApiTypes.BOOL, description="Include click_count and updated_at.")],
+        responses={200: OpenApiResponse(OpenApiTypes.STR, description="CSV or JSON Lines file.")},
+    )
+    def get(self, request):
+        fields = list(USER_EXPORT_FIELDS)
+        if request.query_params.get('stats', '').lower() in ('true', '1'):
+            fields += STATS_FIELDS
+
+        fmt = request.accepted_renderer.format
+        queryset = ShortURL.objects.filter(user=request.user, deletion_job__isnull=True).order_by('pk')
+        archived = ArchivedShortURL.objects.filter(user=request.user).order_by('pk')
+        rows = export_links(queryset, archived, fields, chunk_size=self.chunk_size)
+
+        response = StreamingHttpResponse(encode_rows(rows, fmt, fields), content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="snapurl-links.{fmt}"'
+        logger.info(f"API export ({fmt}) started by {request.user.email}")
+        return response
+
+
+class HotLinksAPIView(APIView):
+    """
+    Staff-only API view listing the current hot codes.
+
+    Counts are decayed redirect estimates from the heavy-hitter tracker.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(responses={200: OpenApiResponse(OpenApiTypes.OBJECT, description="Hot codes, hottest first.")})
+    def get(self, request):
+        return Response([
+            {'code': code, 'estimated_clicks': round(count)}
+            for code, count in hot_codes()
+        ])
@@ -0,0 +1,146 @@
+"""
+Hot/cold tiering of links.
+
+Links with no clicks or edits for a long time are moved by the archive_links
+command from shortener_shorturl into the narrow ArchivedShortURL table, which
+keeps only what a redirect needs. That keeps the main table, its indexes and
+per-user listings down to the working set. A redirect for an archived code
+promotes the link back into the main table under its original id, after
+which it is served and cached like any other link. Archived links stay in
+their owners' UserStats (see shortener.stats).
+"""
+
+import logging
+from collections import Counter
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from .models import ArchivedShortURL, ShortURL
+from .stats import adjust_user_stats, moving_links
+
+logger = logging.getLogger('shortener')
+
+ARCHIVED_FIELDS = (
+    'id', 'user_id', 'original_url', 'short_key', 'custom_key', 'click_count',
+    'created_at', 'expiration_date', 'redirect_status', 'expiry_counted',
+)
+
+
+def archivable(inactive_since):
+    """Filter for links archive_links() may move: active, idle and not queued for deletion."""
+    return models.Q(updated_at__lt=inactive_since, status='done', is_active=True, deletion_job__isnull=True)
+
+
+def archive_links(inactive_since, batch_size=1000, limit=None):
+    """
+    Move links not updated or clicked since `inactive_since` into the archive.
+
+    Only active links not queued for deletion are archived (see
+    archivable()): the archive keeps no is_active flag, and a promoted link
+    comes back active.
+
+    Each batch is copied and deleted in one transaction; the post_delete
+    signal evicts the batch's cached resolutions. Clicks not yet folded into
+    UserStats are added as the batch moves, so archived rows are fully counted.
+
+    Returns:
+        int: The number of links archived.
+    """
+    archived = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        with transaction.atomic():
+            links = list(
+                ShortURL.objects.select_for_update(skip_locked=True)
+                .filter(archivable(inactive_since))
+                .order_by('pk')[:size]
+            )
+            if not links:
+                break
+            ArchivedShortURL.objects.bulk_create([
+                ArchivedShortURL(
+                    archived_at=timezone.now(),
+                    qr_code=link.qr_code.name or '',
+                    **{field: getattr(link, field) for field in ARCHIVED_FIELDS}
+                )
+                for link in links
+            ])
+            with moving_links():
+                ShortURL.objects.filter(pk__in=[link.pk for link in links]).delete()
+            pending = Counter()
+            for link in links:
+                pending[link.user_id] += link.click_count - link.counted_clicks
+            for user_id, clicks in pending.items():
+                if clicks:
+                    adjust_user_stats(user_id, clicks=clicks)
+        archived += len(links)
+    return archived
+
+
+def promote(code):
+    """
+    Move an archived link back into the main table.
+
+    Returns:
+        ShortURL: The promoted link, or None if `code` isn't archived.
+    """
+    archived = ArchivedShortURL.objects.filter(models.Q(short_key=code) | models.Q(custom_key=code)).first()
+    if archived is None:
+        return None
+    link = ShortURL(
+        status='done',
+        qr_code=archived.qr_code or None,
+        counted_clicks=archived.click_count,
+        **{field: getattr(archived, field) for field in ARCHIVED_FIELDS}
+    )
+    try:
+        with transaction.atomic(), moving_links():
+            # Existing pk: save() won't schedule key or QR generation again
+            link.save(force_insert=True)
+            archived.delete()
+    except IntegrityError:
+        # A concurrent request promoted it first
+        return ShortURL.objects.filter(pk=archived.pk).first()
+    # auto_now_add/auto_now overwrote these on insert
+    ShortURL.objects.filter(pk=link.pk).update(created_at=archived.created_at)
+    logger.info(f"Promoted archived link {code} (id {link.pk}) back to the main table")
+    return link
+
+
+def promote_owned(user, codes):
+    """
+    Promote the user's archived links holding any of `codes`, so the owner
+    can act on them (edit, delete) like any other link.
+
+    Returns:
+        int: The number of links promoted.
+    """
+    codes = [code for code in codes if code]
+    if not codes:
+        return 0
+    archived = ArchivedShortURL.objects.filter(
+        models.Q(short_key__in=codes) | models.Q(custom_key__in=codes), user=user
+    ).values_list('short_key', 'custom_key')
+    promoted = 0
+    for short_key, custom_key in archived:
+        if promote(short_key or custom_key) is not None:
+            promoted += 1
+    return promoted
+
+
+def archived_codes(codes):
+    """
+    Return which of `codes` are held by archived links, in one query.
+
+    Archived codes stay reserved: handing them out again would break the
+    old link when it is promoted.
+    """
+    codes = {code for code in codes if code}
+    if not codes:
+        return set()
+    taken = set()
+    rows = ArchivedShortURL.objects.filter(
+        models.Q(short_key__in=codes) | models.Q(custom_key__in=codes)
+    ).values_list('short_key', 'custom_key')
+    for pair in rows:
+        taken.update(code for code in pair if code in codes)
+    return taken
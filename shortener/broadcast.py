@@ -0,0 +1,142 @@
+"""
+Long-lived publisher for channel-layer broadcasts from Celery workers.
+
+Calling async_to_sync(channel_layer.group_send) per message creates an event
+loop (and with channels_redis, a Redis connection pool) for every broadcast.
+ChannelPublisher instead owns one event loop in a background thread for the
+life of the worker process. Tasks enqueue messages without blocking; the loop
+drains the queue in batches whose sends run concurrently over the layer's
+pooled connections, retrying failed sends and reporting dropped ones.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from celery.signals import worker_process_shutdown
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger('shortener')
+
+
+class ChannelPublisher:
+    """
+    Queues group_send calls and flushes them from a persistent event loop.
+
+    Args:
+        channel_layer: Layer to send through; defaults to get_channel_layer().
+        max_queue (int): Pending messages kept before the oldest is dropped.
+        batch_size (int): Max messages sent concurrently per flush.
+        max_retries (int): Retries per message before it is dropped.
+        retry_delay (float): Base delay (seconds) of the exponential backoff.
+    """
+    def __init__(self, channel_layer=None, max_queue=1000, batch_size=100, max_retries=3, retry_delay=0.1):
+        self.channel_layer = channel_layer
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.stats = {'published': 0, 'retried': 0, 'dropped': 0}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._queue = None
+        self._thread = None
+
+    def _ensure_started(self):
+        # A forked worker child inherits the object but not the thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self.channel_layer is None:
+                self.channel_layer = get_channel_layer()
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name='channel-publisher', daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._pid = os.getpid()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._loop.create_task(self._drain_forever())
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+
+    def publish(self, group, message):
+        """
+        Enqueue a group_send without waiting for it to be delivered.
+
+        Args:
+            group (str): Channel-layer group name.
+            message (dict): Event with a 'type' key, as for group_send.
+        """
+        self._ensure_started()
+        self._loop.call_soon_threadsafe(self._enqueue, group, message)
+
+    def _enqueue(self, group, message):
+        if self._queue.qsize() >= self.max_queue:
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.stats['dropped'] += 1
+            logger.warning(f"Broadcast queue full ({self.max_queue}); dropped the oldest message")
+        self._queue.put_nowait((group, message))
+
+    async def _drain_forever(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await asyncio.gather(*(self._send(group, message) for group, message in batch))
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _send(self, group, message):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.channel_layer.group_send(group, message)
+                self.stats['published'] += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.stats['dropped'] += 1
+                    logger.error(f"Broadcast to '{group}' dropped after {attempt + 1} attempts: {e}")
+                    return
+                self.stats['retried'] += 1
+                logger.warning(f"Broadcast to '{group}' failed (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    def flush(self, timeout=5):
+        """Block until every queued message has been sent or dropped."""
+        if self._pid != os.getpid():
+            return
+        future = asyncio.run_coroutine_threadsafe(self._queue.join(), self._loop)
+        future.result(timeout)
+
+
+_publisher = None
+
+
+def get_publisher():
+    """Return the process-wide publisher, creating it on first use."""
+    global _publisher
+    if _publisher is None:
+        _publisher = ChannelPublisher(
+            max_queue=settings.SHORTENER_BROADCAST_MAX_QUEUE,
+            batch_size=settings.SHORTENER_BROADCAST_BATCH_SIZE,
+        )
+    return _publisher
+
+
+@worker_process_shutdown.connect
+def flush_publisher(**kwargs):
+    """Deliver pending broadcasts before a worker process exits."""
+    if _publisher is not None:
+        try:
+            _publisher.flush()
+        except Exception as e:
+            logger.warning(f"Pending broadcasts lost at worker shutdown: {e}")
@@ -0,0 +1,15 @@
+from django.db.models import F
+from django.utils import timezone
+from .models import ShortURL
+from .stats import mark_clicked
+
+def record_click(url_id):
+    """
+    Count one redirect for a link.
+
+    Uses a single atomic UPDATE, so concurrent clicks are never lost and no
+    save() signals (or cache evictions) fire on the redirect path. The link
+    is queued for the next fold into its owner's UserStats (see shortener.stats).
+    """
+    ShortURL.objects.filter(pk=url_id).update(click_count=F('click_count') + 1, updated_at=timezone.now())
+    mark_clicked(url_id)
@@ -0,0 +1,171 @@
+"""
+Background deletion of accounts and of many links at once.
+
+Deleting a user with a large number of links through the ORM collects and
+deletes every row, with its signals, in one transaction. Instead, a
+DeletionJob is created that disables everything in a single UPDATE (the
+links stop redirecting and the account can no longer log in), and
+run_deletion() later evicts the cached resolutions and deletes the rows
+and QR files in chunks of bounded size, each in its own short transaction,
+recording its progress on the job. An interrupted run resumes where it
+stopped.
+"""
+
+import logging
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+from .archive import promote_owned
+from .models import ArchivedShortURL, DeletionJob, ShortURL
+from .resolver import batched_invalidation, invalidate_codes
+from .stats import adjust_user_stats
+
+logger = logging.getLogger('shortener')
+
+
+def start_link_deletion(user, codes):
+    """
+    Disable the user's links with the given codes and create the job that deletes them.
+
+    Returns:
+        DeletionJob: The job, or None if none of the codes are the user's.
+    """
+    # Archived links are only deleted from the main table, so bring them back first
+    promote_owned(user, codes)
+    with transaction.atomic():
+        job = DeletionJob.objects.create(user=user, email=user.email, kind='links')
+        total = ShortURL.objects.filter(
+            models.Q(short_key__in=codes) | models.Q(custom_key__in=codes),
+            user=user, deletion_job__isnull=True
+        ).update(is_active=False, deletion_job=job, updated_at=timezone.now())
+        if not total:
+            transaction.set_rollback(True)
+            return None
+        # The codes are known here, so every cache layer drops them right away
+        invalidate_codes(*codes)
+        # The rows are deleted later without touching UserStats; subtract them now
+        removed = ShortURL.objects.filter(deletion_job=job).aggregate(
+            clicks=models.Sum('counted_clicks'),
+            expired=models.Count('id', filter=models.Q(expiry_counted=True)),
+        )
+        adjust_user_stats(user.pk, links=-total, clicks=-(removed['clicks'] or 0), expired=-removed['expired'])
+        job.total = total
+        job.save(update_fields=['total'])
+        _queue(job)
+    logger.info(f"Queued deletion of {total} links for {user.email} (job {job.pk})")
+    return job
+
+
+def start_account_deletion(user):
+    """
+    Deactivate the user, disable all of their links and create the job that deletes them.
+
+    Returns:
+        DeletionJob: The job.
+    """
+    with transaction.atomic():
+        job = DeletionJob.objects.create(user=user, email=user.email, kind='account')
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        links = ShortURL.objects.filter(user=user).update(is_active=False, deletion_job=job, updated_at=timezone.now())
+        # Stop every cache layer serving them now, not when the job gets to them
+        for rows in _chunks(ShortURL.objects.filter(deletion_job=job), ('short_key', 'custom_key'), settings.SHORTENER_DELETION_CHUNK_SIZE):
+            invalidate_codes(*(code for row in rows for code in row[1:]))
+        job.total = links + ArchivedShortURL.objects.filter(user=user).count()
+        job.save(update_fields=['total'])
+        _queue(job)
+    logger.info(f"Queued deletion of account {user.email} with {job.total} links (job {job.pk})")
+    return job
+
+
+def _queue(job):
+    from .tasks import run_deletion_job_task
+    transaction.on_commit(lambda: run_deletion_job_task.delay(job.pk))
+
+
+def _chunks(queryset, fields, chunk_size):
+    """Yield lists of `fields` tuples in primary-key order, one query per chunk."""
+    last_pk = None
+    while True:
+        page = queryset.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        rows = list(page.values_list('pk', *fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0]
+
+
+def delete_qr_files(names):
+    """
+    Delete stored QR images no remaining link refers to.
+
+    Names are content hashes of the image (see shortener.qr), so a file
+    can be shared; only names no ShortURL or ArchivedShortURL still uses
+    are removed.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return 0
+    in_use = set(ShortURL.objects.filter(qr_code__in=names).values_list('qr_code', flat=True))
+    in_use.update(ArchivedShortURL.objects.filter(qr_code__in=names).values_list('qr_code', flat=True))
+    removed = 0
+    for name in names - in_use:
+        try:
+            default_storage.delete(name)
+            removed += 1
+        except OSError as e:
+            logger.warning(f"Could not delete QR file {name}: {e}")
+    return removed
+
+
+def run_deletion(job, chunk_size=1000, progress=None):
+    """
+    Carry out a deletion job: evict cached codes, then delete rows and QR files chunk by chunk.
+
+    Args:
+        job (DeletionJob): The job to run (or resume).
+        chunk_size (int): Rows deleted per transaction.
+        progress (callable): Called with the job after every chunk.
+    """
+    job.status = 'running'
+    job.error = ''
+    job.save(update_fields=['status', 'error'])
+    links = ShortURL.objects.filter(deletion_job=job)
+
+    # The links are already disabled in the database; stop every cache
+    # layer serving them before the slower delete pass
+    for rows in _chunks(links, ('short_key', 'custom_key'), chunk_size):
+        invalidate_codes(*(code for row in rows for code in row[1:]))
+
+    for rows in _chunks(links, ('qr_code',), chunk_size):
+        with transaction.atomic(), batched_invalidation():
+            ShortURL.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        delete_qr_files(row[1] for row in rows)
+        _advance(job, len(rows), progress)
+
+    if job.kind == 'account' and job.user_id:
+        archived = ArchivedShortURL.objects.filter(user_id=job.user_id)
+        for rows in _chunks(archived, ('qr_code',), chunk_size):
+            ArchivedShortURL.objects.filter(pk__in=[row[0] for row in rows]).delete()
+            delete_qr_files(row[1] for row in rows)
+            _advance(job, len(rows), progress)
+        # Only what appeared since the job started is left for the cascade
+        # (e.g. an archived link promoted by a redirect in the meantime)
+        with batched_invalidation():
+            job.user.delete()
+        job.user = None
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    logger.info(f"Deletion job {job.pk} for {job.email} finished: {job.deleted} rows")
+
+
+def _advance(job, count, progress):
+    DeletionJob.objects.filter(pk=job.pk).update(deleted=models.F('deleted') + count)
+    job.deleted += count
+    if progress:
+        progress(job)
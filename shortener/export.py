@@ -0,0 +1,117 @@
+"""
+Streaming serialization of ShortURL rows to CSV and JSON Lines.
+
+Rows are read with QuerySet.values_list().iterator() and encoded one at a
+time, so memory use stays flat regardless of how many links are exported.
+Used by the export_urls management command and the API export endpoint.
+
+Exports include archived links (see shortener.archive), after the live ones
+and with the same columns, so an export always holds all of an account's
+links. The dashboard, the API list and search show live links only.
+"""
+
+import csv
+import json
+from itertools import chain
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from .models import ArchivedShortURL
+
+EXPORT_FIELDS = [
+    'short_key', 'custom_key', 'original_url', 'user', 'status',
+    'click_count', 'created_at', 'expiration_date', 'redirect_status',
+]
+
+# Columns of the per-user API export; click stats are opt-in
+USER_EXPORT_FIELDS = [
+    'short_key', 'custom_key', 'original_url', 'status',
+    'created_at', 'expiration_date', 'redirect_status',
+]
+STATS_FIELDS = ['click_count', 'updated_at']
+
+# Export columns that don't map 1:1 to a model field
+FIELD_LOOKUPS = {
+    'user': 'user__email',
+}
+
+# The same for ArchivedShortURL, which only holds finished links
+ARCHIVED_FIELD_LOOKUPS = {
+    **FIELD_LOOKUPS,
+    'status': models.Value('done', output_field=models.CharField()),
+    'updated_at': 'archived_at',
+}
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+
+def export_rows(queryset, fields=EXPORT_FIELDS, chunk_size=2000):
+    """
+    Yield one dict per link without materializing the queryset.
+
+    Args:
+        queryset (QuerySet): ShortURL or ArchivedShortURL rows to export.
+        fields (list): Export column names.
+        chunk_size (int): Rows fetched per database round-trip.
+
+    Yields:
+        dict: Column name -> raw value.
+    """
+    field_lookups = ARCHIVED_FIELD_LOOKUPS if queryset.model is ArchivedShortURL else FIELD_LOOKUPS
+    lookups = [field_lookups.get(field, field) for field in fields]
+    for values in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+        yield dict(zip(fields, values))
+
+
+def export_links(live, archived, fields=EXPORT_FIELDS, chunk_size=2000):
+    """
+    Yield the rows of `live` links followed by those of `archived` ones.
+
+    Args:
+        live (QuerySet): ShortURL rows to export.
+        archived (QuerySet): ArchivedShortURL rows to export.
+        fields (list): Export column names.
+        chunk_size (int): Rows fetched per database round-trip.
+    """
+    return chain(export_rows(live, fields, chunk_size), export_rows(archived, fields, chunk_size))
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(rows, fields=EXPORT_FIELDS):
+    """Encode rows as CSV, yielding the header and then one line per row."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[field]) for field in fields])
+
+
+def jsonl_lines(rows):
+    """Encode rows as JSON Lines, one object per line."""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def encode_rows(rows, fmt, fields=EXPORT_FIELDS):
+    """
+    Encode rows in the given export format.
+
+    Raises:
+        ValueError: If the format is not one of EXPORT_FORMATS.
+    """
+    if fmt == 'csv':
+        return csv_lines(rows, fields)
+    if fmt == 'jsonl':
+        return jsonl_lines(rows)
+    raise ValueError(f"Unsupported export format: {fmt}")
@@ -0,0 +1,266 @@
+"""
+Link-health checks: is each link's destination still reachable?
+
+LinkChecker probes destinations concurrently from one asyncio event loop
+over a pooled httpx client, so connections to the same host are reused.
+Total concurrency and concurrency per host are both bounded, the latter so
+a large batch never hammers a single site. Each probe is a HEAD, retried as
+a streamed GET (body never read) for servers that don't support HEAD.
+
+Destinations are user-supplied and probed from inside the network, so
+redirects are followed by hand and, before every hop, the host is resolved
+and refused if any of its addresses is not public (loopback, private,
+link-local, metadata endpoints...). SHORTENER_LINK_HEALTH_ALLOW_PRIVATE
+lifts that for development.
+
+Checks run from the check_links command or the Celery task, never on the
+redirect path; redirects only see the outcome through ShortURL.is_active.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from collections import defaultdict, namedtuple
+from urllib.parse import urlsplit
+
+import httpx
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from .models import LinkHealth, ShortURL
+from .resolver import invalidate_codes
+
+logger = logging.getLogger('shortener')
+
+CheckResult = namedtuple('CheckResult', ['link_id', 'status_code', 'latency_ms', 'error'])
+
+# Statuses that mean "HEAD not supported here" rather than "link broken"
+HEAD_FALLBACK_STATUSES = {403, 405, 501}
+
+MAX_REDIRECTS = 5
+
+
+class BlockedDestination(Exception):
+    """The destination (or a redirect hop) is not a public http(s) address."""
+
+
+def is_public_address(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global
+
+
+def failed_check(link_id, error):
+    return CheckResult(link_id, None, None, f"{type(error).__name__}: {error}"[:255])
+
+
+def is_healthy(status_code):
+    return status_code is not None and status_code < 400
+
+
+class LinkChecker:
+    """
+    Concurrent HEAD-then-GET prober.
+
+    Args:
+        concurrency (int): Probes in flight at once (also the connection pool size).
+        per_host (int): Probes in flight against any one host.
+        timeout (float): Seconds allowed per request.
+        transport: Optional httpx transport, e.g. for tests.
+        allow_private (bool): Also probe loopback, private and link-local addresses.
+    """
+    def __init__(self, concurrency=100, per_host=4, timeout=10, transport=None, allow_private=False):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.transport = transport
+        self.allow_private = allow_private
+
+    async def check_many(self, links):
+        """
+        Probe every (link_id, url) pair.
+
+        Returns:
+            list: One CheckResult per link, in input order.
+        """
+        overall = asyncio.Semaphore(self.concurrency)
+        per_host = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        headers = {'User-Agent': settings.SHORTENER_LINK_HEALTH_USER_AGENT}
+
+        async with httpx.AsyncClient(
+            limits=limits, timeout=self.timeout, headers=headers, follow_redirects=False, transport=self.transport
+        ) as client:
+            async def bounded(link_id, url):
+                try:
+                    host = urlsplit(url).hostname
+                except ValueError as e:
+                    return failed_check(link_id, e)
+                # Per-host slot first, so waiting on a busy host doesn't hold a global one
+                async with per_host[host], overall:
+                    return await self.check(client, link_id, url)
+
+            results = await asyncio.gather(*(bounded(link_id, url) for link_id, url in links), return_exceptions=True)
+        # A probe that still raised must not sink the batch: it is a failed check
+        return [
+            failed_check(link_id, result) if isinstance(result, BaseException) else result
+            for (link_id, _), result in zip(links, results)
+        ]
+
+    async def guard(self, url):
+        """
+        Raise BlockedDestination unless `url` is http(s) on a host with only public addresses.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise BlockedDestination(f"not an http(s) URL: {url}")
+        if self.allow_private:
+            return
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+        for info in infos:
+            if not is_public_address(info[4][0]):
+                raise BlockedDestination(f"{parts.hostname} resolves to non-public address {info[4][0]}")
+
+    async def status_of(self, client, method, url):
+        """Request `url`, following redirects only to checked destinations; return the final status."""
+        for _ in range(MAX_REDIRECTS + 1):
+            await self.guard(url)
+            if method == 'HEAD':
+                response = await client.head(url)
+            else:
+                # Streamed and closed unread: only the status matters
+                async with client.stream('GET', url) as response:
+                    pass
+            if response.next_request is None:
+                return response.status_code
+            url = str(response.next_request.url)
+        raise httpx.TooManyRedirects(f"More than {MAX_REDIRECTS} redirects")
+
+    async def check(self, client, link_id, url):
+        started = time.monotonic()
+        try:
+            status_code = await self.status_of(client, 'HEAD', url)
+            if status_code in HEAD_FALLBACK_STATUSES:
+                status_code = await self.status_of(client, 'GET', url)
+        except Exception as e:
+            # Not only httpx.HTTPError: httpx.InvalidURL and IDNA encoding
+            # errors are raised for URLs that passed URLValidator
+            return failed_check(link_id, e)
+        latency_ms = int((time.monotonic() - started) * 1000)
+        return CheckResult(link_id, status_code, latency_ms, '')
+
+
+def record_results(results, disable_after=0):
+    """
+    Store check results and optionally disable persistently broken links.
+
+    Links the checker deactivated are reactivated once a check passes;
+    links deactivated by their owner are never touched.
+
+    Args:
+        results (list): CheckResults from LinkChecker.
+        disable_after (int): Consecutive failures after which a link is
+            deactivated; 0 only records the failure.
+
+    Returns:
+        int: The number of links deactivated.
+    """
+    ids = [result.link_id for result in results]
+    previous = {
+        link_id: (failures, deactivated)
+        for link_id, failures, deactivated in LinkHealth.objects.filter(link_id__in=ids).values_list(
+            'link_id', 'consecutive_failures', 'deactivated'
+        )
+    }
+    now = timezone.now()
+    rows = []
+    failing = []
+    recovered = []
+    for result in results:
+        ok = is_healthy(result.status_code)
+        failures, deactivated = previous.get(result.link_id, (0, False))
+        failures = 0 if ok else failures + 1
+        if ok and deactivated:
+            recovered.append(result.link_id)
+        rows.append(LinkHealth(
+            link_id=result.link_id,
+            ok=ok,
+            status_code=result.status_code,
+            error=result.error,
+            latency_ms=result.latency_ms,
+            consecutive_failures=failures,
+            deactivated=deactivated and not ok,
+            checked_at=now,
+        ))
+        if disable_after and failures >= disable_after:
+            failing.append(result.link_id)
+
+    LinkHealth.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['link'],
+        update_fields=['ok', 'status_code', 'error', 'latency_ms', 'consecutive_failures', 'deactivated', 'checked_at'],
+    )
+    if recovered:
+        _set_active(ShortURL.objects.filter(pk__in=recovered, is_active=False), True, now)
+        logger.info(f"Link-health check reactivated {len(recovered)} links that pass again")
+    if not failing:
+        return 0
+
+    links = ShortURL.objects.filter(pk__in=failing, is_active=True)
+    disabled_ids = list(links.values_list('pk', flat=True))
+    disabled = _set_active(ShortURL.objects.filter(pk__in=disabled_ids), False, now)
+    LinkHealth.objects.filter(link_id__in=disabled_ids).update(deactivated=True)
+    logger.warning(f"Link-health check disabled {disabled} links after {disable_after} consecutive failures")
+    return disabled
+
+
+def _set_active(links, active, now):
+    codes = [code for pair in links.values_list('short_key', 'custom_key') for code in pair]
+    changed = links.update(is_active=active, updated_at=now)
+    invalidate_codes(*codes)
+    return changed
+
+
+def links_due(checked_before):
+    """
+    Links never checked, or last checked before `checked_before`, oldest first.
+
+    Returns:
+        QuerySet: (id, original_url) tuples.
+    """
+    return ShortURL.objects.filter(
+        models.Q(health__isnull=True) | models.Q(health__checked_at__lt=checked_before)
+    ).order_by(models.F('health__checked_at').asc(nulls_first=True), 'pk').values_list('id', 'original_url')
+
+
+def check_due_links(max_age, limit=None, batch_size=1000, checker=None, disable_after=0, progress=None):
+    """
+    Check links in batches until none are due or `limit` have been checked.
+
+    Each recorded batch stops being due, so the next query picks up where
+    the last one ended and an interrupted run simply resumes next time.
+
+    Returns:
+        tuple: (links checked, links found broken, links deactivated).
+    """
+    checker = checker or LinkChecker()
+    # Fixed for the whole run, so links checked by it are never due again
+    checked_before = timezone.now() - max_age
+    checked = broken = disabled = 0
+    while limit is None or checked < limit:
+        size = batch_size if limit is None else min(batch_size, limit - checked)
+        batch = list(links_due(checked_before)[:size])
+        if not batch:
+            break
+        results = asyncio.run(checker.check_many(batch))
+        disabled += record_results(results, disable_after)
+        checked += len(results)
+        broken += sum(1 for result in results if not is_healthy(result.status_code))
+        if progress:
+            progress(checked, broken)
+    return checked, broken, disabled
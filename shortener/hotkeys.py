@@ -0,0 +1,165 @@
+"""
+Heavy-hitter detection for short codes.
+
+Each process feeds the codes it redirects into a count-min sketch plus a
+K-entry min-heap, so memory stays fixed however many distinct codes are
+seen. Every SHORTENER_HOT_PUBLISH_INTERVAL seconds the process merges its
+top-K into the shared hot set (older counts decay), starts a new interval
+and pins the current hot codes in its process-local resolution cache.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from array import array
+from django.conf import settings
+from django.core.cache import cache
+from .resolver import pin_codes
+
+logger = logging.getLogger('shortener')
+
+HOT_SET_KEY = 'shortener:hotset'
+
+
+class CountMinSketch:
+    """
+    Approximate per-item counts in width * depth counters.
+
+    Estimates never undercount; they overcount by at most ~2N/width with
+    high probability, where N is the total number of additions.
+    """
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('Q', bytes(8 * width)) for _ in range(depth)]
+        # Rows whose indexes one 64-bit hash can supply
+        self._rows_per_hash = max(1, 64 // max(1, (width - 1).bit_length()))
+
+    def _indexes(self, item):
+        # Each row takes its own base-`width` digits of the hash, so two items
+        # share every row only if they agree on all of them. (Double hashing,
+        # h1 + d * h2, made that as likely as agreeing on two indexes, and a
+        # cold item could then inherit a hot one's count.)
+        indexes = []
+        for d in range(self.depth):
+            if d % self._rows_per_hash == 0:
+                h = (hash(item) if d == 0 else hash((d, item))) & 0xFFFFFFFFFFFFFFFF
+            h, i = divmod(h, self.width)
+            indexes.append(i)
+        return indexes
+
+    def add(self, item, count=1):
+        """
+        Count `item` and return its new estimate.
+        """
+        estimate = None
+        for row, i in zip(self.rows, self._indexes(item)):
+            row[i] += count
+            estimate = row[i] if estimate is None else min(estimate, row[i])
+        return estimate
+
+    def estimate(self, item):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(item)))
+
+
+class HeavyHitters:
+    """
+    Streaming top-K tracker over a count-min sketch.
+
+    The heap holds exactly one entry per tracked item; an entry whose count
+    has since grown is re-pushed lazily when it surfaces at the top.
+    """
+    def __init__(self, k=100, width=4096, depth=4):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.counts = {}
+        self.heap = []
+
+    def add(self, item):
+        estimate = self.sketch.add(item)
+        if item in self.counts:
+            self.counts[item] = estimate
+            return
+        if len(self.counts) < self.k:
+            self.counts[item] = estimate
+            heapq.heappush(self.heap, (estimate, item))
+            return
+        while True:
+            low, low_item = self.heap[0]
+            current = self.counts[low_item]
+            if current == low:
+                break
+            heapq.heapreplace(self.heap, (current, low_item))
+        if estimate > low:
+            heapq.heapreplace(self.heap, (estimate, item))
+            del self.counts[low_item]
+            self.counts[item] = estimate
+
+    def top(self):
+        """
+        Returns:
+            list: (item, estimated count) pairs, heaviest first.
+        """
+        return sorted(self.counts.items(), key=lambda pair: pair[1], reverse=True)
+
+
+class HotCodeTracker:
+    """
+    Per-process heavy-hitter tracker that periodically publishes the hot set.
+
+    Publishing is a read-merge-write of one cache key; a concurrent publish
+    from another process can occasionally be overwritten, which only delays
+    that process's contribution to the next interval.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._new_interval()
+
+    def _new_interval(self):
+        self.hitters = HeavyHitters(settings.SHORTENER_HOT_TOP_K, settings.SHORTENER_HOT_SKETCH_WIDTH, settings.SHORTENER_HOT_SKETCH_DEPTH)
+        self.interval_started = time.monotonic()
+
+    def record(self, code):
+        """Count one redirect for `code`, publishing if the interval has elapsed."""
+        with self._lock:
+            self.hitters.add(code)
+            if time.monotonic() - self.interval_started < settings.SHORTENER_HOT_PUBLISH_INTERVAL:
+                return
+            local_top = self.hitters.top()
+            self._new_interval()
+        self.publish(local_top)
+
+    def publish(self, local_top):
+        """Merge this interval's top-K into the shared hot set and pin it locally."""
+        try:
+            decay = settings.SHORTENER_HOT_DECAY
+            merged = {code: count * decay for code, count in (cache.get(HOT_SET_KEY) or [])}
+            for code, count in local_top:
+                merged[code] = merged.get(code, 0) + count
+            hot = sorted(merged.items(), key=lambda pair: pair[1], reverse=True)[:settings.SHORTENER_HOT_TOP_K]
+            cache.set(HOT_SET_KEY, hot, None)
+            pin_codes([code for code, _ in hot])
+        except Exception as e:
+            logger.warning(f"Publishing hot codes failed: {e}")
+
+
+def hot_codes():
+    """
+    Return the shared hot set.
+
+    Returns:
+        list: (code, decayed redirect count) pairs, hottest first.
+    """
+    return cache.get(HOT_SET_KEY) or []
+
+
+_tracker = None
+
+
+def get_tracker():
+    """Return the process-wide tracker, creating it on first use."""
+    global _tracker
+    if _tracker is None:
+        _tracker = HotCodeTracker()
+    return _tracker
@@ -0,0 +1,112 @@
+"""
+Idempotency-Key support for create endpoints.
+
+The first POST carrying a given key claims it with cache.add() (SET NX on
+Redis), runs normally and stores its response under the key for
+SHORTENER_IDEMPOTENCY_TTL seconds. A retry with the same key and payload
+gets that stored response back without reaching the database or the task
+queue; a concurrent duplicate waits for the first request to finish.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+# Per-request messages: sampled and rate-limited (see shortener.logutils)
+request_logger = logging.getLogger('shortener.requests')
+
+PENDING = 'pending'
+DONE = 'done'
+
+# Response headers worth replaying
+REPLAYED_HEADERS = ('Location',)
+
+
+def idempotency_cache_key(user_id, view_name, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"shortener:idempotency:{view_name}:{user_id}:{digest}"
+
+
+def request_fingerprint(request):
+    """Digest of the request path and parsed payload, to detect reused keys."""
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.path}\n{payload}".encode()).hexdigest()
+
+
+class IdempotencyMixin:
+    """
+    Makes POST idempotent for requests that send an Idempotency-Key header.
+
+    Requests without the header are handled as before. Only responses below
+    500 are stored; after a server error or an exception the key is released
+    so the client's next retry runs again.
+    """
+    idempotency_header = 'Idempotency-Key'
+    idempotency_poll_interval = 0.05
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header)
+        if not key:
+            return super().post(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'detail': f"{self.idempotency_header} must be at most 255 characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = idempotency_cache_key(request.user.pk, type(self).__name__, key)
+        fingerprint = request_fingerprint(request)
+        claim = {'state': PENDING, 'fingerprint': fingerprint}
+        if cache.add(cache_key, claim, settings.SHORTENER_IDEMPOTENCY_LOCK_TIMEOUT):
+            return self._run_and_store(cache_key, fingerprint, request, *args, **kwargs)
+
+        record = self._wait_for_result(cache_key)
+        if record is None:
+            # The first request failed and released the key while we waited
+            return self.post(request, *args, **kwargs)
+        if record['fingerprint'] != fingerprint:
+            return Response(
+                {'detail': f"{self.idempotency_header} was already used with a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record['state'] == PENDING:
+            response = Response(
+                {'detail': "A request with this Idempotency-Key is still in progress."},
+                status=status.HTTP_409_CONFLICT
+            )
+            response['Retry-After'] = '1'
+            return response
+
+        request_logger.info("Replaying idempotent %s response for %s", type(self).__name__, request.user.email)
+        response = Response(record['data'], status=record['status'], headers=record['headers'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def _run_and_store(self, cache_key, fingerprint, request, *args, **kwargs):
+        try:
+            response = super().post(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+            return response
+        cache.set(cache_key, {
+            'state': DONE,
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'data': response.data,
+            'headers': {name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)},
+        }, settings.SHORTENER_IDEMPOTENCY_TTL)
+        return response
+
+    def _wait_for_result(self, cache_key):
+        """Poll until the key holds a finished response, is released, or the wait runs out."""
+        deadline = time.monotonic() + settings.SHORTENER_IDEMPOTENCY_WAIT
+        while True:
+            record = cache.get(cache_key)
+            if record is None or record['state'] == DONE or time.monotonic() >= deadline:
+                return record
+            time.sleep(self.idempotency_poll_interval)
@@ -0,0 +1,247 @@
+"""
+Process-local (L1) resolution cache and its cross-worker invalidation.
+
+Each gunicorn/Daphne worker keeps a bounded LRU of recently resolved codes
+in front of the shared cache, so repeat redirects skip the network entirely.
+When a ShortURL changes, the evicted codes are published on a Redis pub/sub
+channel and every worker drops them from its L1. Pub/sub delivery is best
+effort, so entries also expire after SHORTENER_L1_TTL seconds: that TTL is
+the upper bound on how long a worker can serve a stale destination.
+
+When snapshots are enabled the same codes are also added to a Redis set of
+codes changed since the current snapshot, which shortener.snapshot uses to
+skip stale snapshot entries. The set is shared by the workers and the
+exporter, so snapshots require REDIS_URL.
+
+A publish that fails is retried in the background until Redis takes it:
+unlike the L1, the snapshot has no TTL, so a lost dirty-set write would
+let other workers serve the old destination until the next full export.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger('shortener')
+
+INVALIDATION_CHANNEL = 'shortener:invalidate'
+
+
+class LocalCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Args:
+        max_entries (int): Entries kept before the least recently used is evicted.
+        ttl (float): Seconds an entry may be served after it was stored.
+    """
+    def __init__(self, max_entries=10000, ttl=5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None if absent or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class InvalidationSubscriber:
+    """
+    Background listener that applies invalidations published by other workers.
+
+    Args:
+        redis_url (str): Server carrying the pub/sub channel.
+        on_codes (callable): Called with the list of codes in each message.
+        on_reset (callable): Called whenever messages may have been missed
+            (first subscribe, reconnect), so the caller can drop its L1.
+        retry_interval (float): Seconds to wait before reconnecting.
+    """
+    def __init__(self, redis_url, on_codes, on_reset, retry_interval=1):
+        self.redis_url = redis_url
+        self.on_codes = on_codes
+        self.on_reset = on_reset
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        # A forked worker child inherits the object but not the thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._run, name='l1-invalidation', daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                client = redis.Redis.from_url(self.redis_url, health_check_interval=30)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                self.on_reset()
+                for message in pubsub.listen():
+                    self.handle(message['data'])
+            except Exception as e:
+                logger.warning(f"L1 invalidation listener disconnected, retrying: {e}")
+            self.on_reset()
+            time.sleep(self.retry_interval)
+
+    def handle(self, data):
+        """Apply one published message (a JSON list of codes)."""
+        try:
+            codes = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed invalidation message: {data!r}")
+            return
+        self.on_codes(codes)
+
+
+# Codes changed since the current snapshot generation (see shortener.snapshot);
+# the exporter renames it to DIRTY_ROTATING_KEY while it builds the next one
+DIRTY_SET_KEY = 'shortener:snapshot:dirty'
+DIRTY_ROTATING_KEY = 'shortener:snapshot:dirty:rotating'
+
+_publisher = None
+
+# Seconds between retries of invalidations Redis didn't accept
+PUBLISH_RETRY_INTERVAL = 1
+
+# Codes whose publish failed, sent again with the next publish or retry
+_pending = set()
+_pending_lock = threading.Lock()
+_retry_timer = None
+
+
+def _client():
+    global _publisher
+    if not settings.REDIS_URL:
+        raise ImproperlyConfigured("Snapshots (SHORTENER_SNAPSHOT_DIR) require REDIS_URL.")
+    if _publisher is None:
+        _publisher = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _publisher
+
+
+def publish_invalidation(codes):
+    """
+    Tell every worker to drop `codes` from its L1 and, when snapshots are
+    enabled, record them as changed since the current snapshot. Both go out
+    in one pipelined round-trip. Without REDIS_URL there are no other
+    workers to tell.
+    """
+    if not codes or not settings.REDIS_URL:
+        return
+    track_dirty = bool(settings.SHORTENER_SNAPSHOT_DIR)
+    with _pending_lock:
+        codes = set(codes) | _pending
+        _pending.clear()
+    try:
+        pipe = _client().pipeline(transaction=False)
+        pipe.publish(INVALIDATION_CHANNEL, json.dumps(sorted(codes)))
+        if track_dirty:
+            pipe.sadd(DIRTY_SET_KEY, *codes)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Publishing invalidation for {len(codes)} codes failed, retrying: {e}")
+        _defer(codes)
+
+
+def _defer(codes):
+    global _retry_timer
+    with _pending_lock:
+        _pending.update(codes)
+        # Also after a fork, which leaves the parent's timer behind
+        if _retry_timer is None or not _retry_timer.is_alive():
+            _retry_timer = threading.Timer(PUBLISH_RETRY_INTERVAL, _retry)
+            _retry_timer.daemon = True
+            _retry_timer.start()
+
+
+def _retry():
+    global _retry_timer
+    with _pending_lock:
+        _retry_timer = None
+        codes = set(_pending)
+        _pending.clear()
+    # Fails over to _defer() again until Redis is back
+    publish_invalidation(codes)
+
+
+def dirty_codes():
+    """
+    Codes changed since the current snapshot generation, including those
+    of a generation still being exported.
+
+    Returns:
+        set: The codes (str).
+
+    Raises:
+        ImproperlyConfigured: If REDIS_URL is not set.
+    """
+    pipe = _client().pipeline(transaction=False)
+    pipe.smembers(DIRTY_SET_KEY)
+    pipe.smembers(DIRTY_ROTATING_KEY)
+    current, rotating = pipe.execute()
+    return {code.decode() for code in current | rotating}
+
+
+def rotate_dirty_codes():
+    """
+    Start a new dirty generation, returning the codes of the one it replaces.
+
+    Changes recorded from now on land in a fresh set; the returned codes stay
+    visible to dirty_codes() until release_rotated_codes() is called once the
+    new snapshot or delta has been published.
+    """
+    # Union rather than RENAME: a previous export that died before releasing
+    # its rotated codes must not lose them
+    pipe = _client().pipeline(transaction=True)
+    pipe.sunionstore(DIRTY_ROTATING_KEY, [DIRTY_ROTATING_KEY, DIRTY_SET_KEY])
+    pipe.delete(DIRTY_SET_KEY)
+    pipe.smembers(DIRTY_ROTATING_KEY)
+    rotated = pipe.execute()[-1]
+    return {code.decode() for code in rotated}
+
+
+def release_rotated_codes():
+    _client().delete(DIRTY_ROTATING_KEY)
@@ -0,0 +1,119 @@
+"""
+Logging that stays off the request path.
+
+BackgroundHandler is what the loggers write to when LOG_QUEUE is on: it
+only appends the record to an in-memory queue, and a QueueListener thread
+formats it and hands it to the real handlers (console, file). Records are
+queued unformatted, so a message is only rendered if a handler emits it.
+When the writer falls behind and the queue is full, records are dropped
+rather than blocking the request.
+
+Per-request messages (one per redirect or API call) go to the
+REQUEST_LOGGERS below with %-style arguments, and RequestSampleFilter
+samples and rate-limits them (SHORTENER_REQUEST_LOG_SAMPLE_RATE,
+SHORTENER_REQUEST_LOG_MAX_PER_SECOND).
+"""
+
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Per-request messages of the redirect and API paths
+REQUEST_LOGGERS = ('shortener.requests', 'accounts.requests')
+
+
+def _handler_by_name(name):
+    if hasattr(logging, 'getHandlerByName'):
+        return logging.getHandlerByName(name)
+    # Python < 3.12
+    return logging._handlers.get(name)
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Queue records for a background thread that writes them to `handlers`.
+
+    Used as a dictConfig factory ('()'), with the names of other configured
+    handlers; each keeps its own level, formatter and filters.
+
+    Args:
+        handlers (list): Names of the handlers that do the writing.
+        queue_size (int): Records held before new ones are dropped.
+    """
+    def __init__(self, handlers, queue_size=10000):
+        targets = [_handler_by_name(name) for name in handlers]
+        if None in targets:
+            # dictConfig retries handlers that fail like this once the rest exist
+            raise ValueError('target not configured yet')
+        super().__init__(queue.Queue(queue_size))
+        self.targets = targets
+        self.dropped = 0
+        self._closed = False
+        self._start_listener()
+        # The writer thread doesn't survive a fork (Celery prefork, gunicorn --preload)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start_listener(self):
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def _after_fork(self):
+        if not self._closed:
+            self._start_listener()
+
+    def prepare(self, record):
+        # Formatting happens in the listener thread, by the target handlers
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # logging.shutdown() closes handlers newest first, so the targets
+        # are still open while the queue is written out
+        self._closed = True
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+
+class RequestSampleFilter(logging.Filter):
+    """
+    Sample and rate-limit per-request log records.
+
+    Records below WARNING are kept with probability `sample_rate`; then at
+    most `max_per_second` records of any level pass per second (0 disables
+    the cap). Attach it to the request loggers, not to handlers.
+    """
+    def __init__(self, sample_rate=1.0, max_per_second=0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self.suppressed = 0
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING and self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        if not self.max_per_second:
+            return True
+        window = int(time.monotonic())
+        with self._lock:
+            if window != self._window:
+                self._window = window
+                self._count = 0
+            self._count += 1
+            if self._count <= self.max_per_second:
+                return True
+            self.suppressed += 1
+        return False
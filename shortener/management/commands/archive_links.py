@@ -0,0 +1,30 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from shortener.archive import archivable, archive_links
+from shortener.models import ShortURL
+
+
+class Command(BaseCommand):
+    help = (
+        "Move links that have not been clicked or edited for --inactive-days into the "
+        "compact archive table. Archived links keep working: their next redirect "
+        "promotes them back into the main table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inactive-days', type=int, default=settings.SHORTENER_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--limit', type=int, help="Stop after archiving this many links.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the links that would be archived.")
+
+    def handle(self, *args, **options):
+        inactive_since = timezone.now() - timedelta(days=options['inactive_days'])
+        if options['dry_run']:
+            count = ShortURL.objects.filter(archivable(inactive_since)).count()
+            self.stdout.write(f"{count} links would be archived.")
+            return
+
+        archived = archive_links(inactive_since, batch_size=options['batch_size'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} links inactive since {inactive_since:%Y-%m-%d}."))
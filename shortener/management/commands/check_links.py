@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from shortener.health import LinkChecker, check_due_links
+
+
+class Command(BaseCommand):
+    help = (
+        "Probe link destinations concurrently and record their status and latency. "
+        "Only links never checked or checked longer ago than --max-age-hours are "
+        "probed, oldest first, so repeated runs re-check the table incrementally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=float, default=settings.SHORTENER_LINK_HEALTH_MAX_AGE_HOURS)
+        parser.add_argument('--limit', type=int, help="Stop after checking this many links.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=settings.SHORTENER_LINK_HEALTH_CONCURRENCY)
+        parser.add_argument('--per-host', type=int, default=settings.SHORTENER_LINK_HEALTH_PER_HOST)
+        parser.add_argument('--timeout', type=float, default=settings.SHORTENER_LINK_HEALTH_TIMEOUT)
+        parser.add_argument(
+            '--disable-after', type=int, default=settings.SHORTENER_LINK_HEALTH_DISABLE_AFTER,
+            help=(
+                "Deactivate links after this many consecutive failed checks (0 = never). "
+                "Links deactivated this way are reactivated when a later check passes."
+            )
+        )
+
+    def handle(self, *args, **options):
+        checker = LinkChecker(
+            options['concurrency'], options['per_host'], options['timeout'],
+            allow_private=settings.SHORTENER_LINK_HEALTH_ALLOW_PRIVATE,
+        )
+        checked, broken, disabled = check_due_links(
+            timedelta(hours=options['max_age_hours']),
+            limit=options['limit'],
+            batch_size=options['batch_size'],
+            checker=checker,
+            disable_after=options['disable_after'],
+            progress=lambda checked, broken: self.stderr.write(f"{checked} links checked, {broken} broken"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} links: {broken} broken, {disabled} deactivated."
+        ))
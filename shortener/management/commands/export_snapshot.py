@@ -0,0 +1,33 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from shortener.snapshot import export_base, export_delta, read_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the memory-mapped snapshot of all live codes that redirect workers "
+        "consult before the cache and database. --delta only writes the codes "
+        "changed since the last run, and falls back to a full snapshot when none "
+        "exists yet or SHORTENER_SNAPSHOT_MAX_DELTAS deltas have piled up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.SHORTENER_SNAPSHOT_DIR, help="Snapshot directory.")
+        parser.add_argument('--delta', action='store_true', help="Write a delta instead of a full snapshot.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        if not directory:
+            raise CommandError("Set SHORTENER_SNAPSHOT_DIR or pass --dir.")
+
+        started = time.monotonic()
+        manifest = read_manifest(directory)
+        if options['delta'] and manifest and len(manifest['deltas']) < settings.SHORTENER_SNAPSHOT_MAX_DELTAS:
+            count = export_delta(directory)
+            kind = "delta"
+        else:
+            count = export_base(directory, chunk_size=options['chunk_size'])
+            kind = "snapshot"
+        self.stdout.write(self.style.SUCCESS(f"Wrote {kind} of {count} codes in {time.monotonic() - started:.1f}s."))
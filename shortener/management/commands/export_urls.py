@@ -0,0 +1,53 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from shortener.export import EXPORT_FORMATS, encode_rows, export_links
+from shortener.models import ArchivedShortURL, ShortURL
+
+PROGRESS_INTERVAL = 50000
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream short URLs, archived ones included, to a CSV or JSONL file. Rows "
+        "are read with QuerySet.iterator() so memory use does not grow with the table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', '-o', default='-', help="Output file path, '-' for stdout.")
+        parser.add_argument('--user', help="Only export links owned by this email address.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched per database round-trip.")
+
+    def handle(self, *args, **options):
+        queryset = ShortURL.objects.order_by('pk')
+        archived = ArchivedShortURL.objects.order_by('pk')
+        if options['user']:
+            queryset = queryset.filter(user__email=options['user'].lower())
+            archived = archived.filter(user__email=options['user'].lower())
+
+        out = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='', encoding='utf-8')
+        try:
+            rows = export_links(queryset, archived, chunk_size=options['chunk_size'])
+            total = self._write(out, encode_rows(rows, options['format']), options['format'])
+        except OSError as e:
+            raise CommandError(f"Export failed: {e}")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        self.stderr.write(self.style.SUCCESS(f"Exported {total} links."))
+
+    def _write(self, out, lines, fmt):
+        started = time.monotonic()
+        total = 0
+        if fmt == 'csv':
+            # Header line
+            out.write(next(lines))
+        for line in lines:
+            out.write(line)
+            total += 1
+            if total % PROGRESS_INTERVAL == 0:
+                elapsed = time.monotonic() - started
+                self.stderr.write(f"{total} rows exported ({total / elapsed:.0f} rows/s)")
+        return total
@@ -0,0 +1,192 @@
+import csv
+import json
+import os
+import sys
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.validators import URLValidator
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from accounts.models import User
+from shortener.aliases import taken_codes
+from shortener.export import EXPORT_FORMATS
+from shortener.models import ArchivedShortURL, ShortURL
+from shortener.stats import adjust_user_stats
+from shortener.utils import SHORT_KEY_ID_OFFSET, encode_base62, extract_domain, generated_key_id
+
+
+def read_records(stream, fmt):
+    """Yield one dict per input row from a CSV or JSONL stream."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import short URLs from a CSV or JSONL file (as written by export_urls). "
+        "Rows are inserted with chunked bulk_create, bypassing ShortURL.save(), so no "
+        "Celery task or QR code is generated per row. Rows without a short_key or "
+        "custom_key get a Base62 key from their new id. A key that an id would "
+        "generate keeps that id, so no later link is given the same key; such rows "
+        "are skipped if the id is already in use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file path, '-' for stdin.")
+        parser.add_argument('--format', choices=EXPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--user', help="Owner email for rows without a 'user' column.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or os.path.splitext(options['path'])[1].lstrip('.')
+        if fmt not in EXPORT_FORMATS:
+            raise CommandError("Could not infer the input format; pass --format csv or --format jsonl.")
+
+        self.default_owner = None
+        if options['user']:
+            self.default_owner = self._owner_id(options['user'])
+        self.owners = {}
+        self.validate_url = URLValidator()
+        self.imported = self.skipped = 0
+        self.started = time.monotonic()
+
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        try:
+            batch = []
+            for record in read_records(stream, fmt):
+                obj = self._build(record)
+                if obj is None:
+                    self.skipped += 1
+                    continue
+                batch.append(obj)
+                if len(batch) >= options['batch_size']:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {self.imported} links, skipped {self.skipped}."))
+
+    def _owner_id(self, email):
+        try:
+            return User.objects.values_list('pk', flat=True).get(email=email.lower())
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user: {email}")
+
+    def _build(self, record):
+        """Turn an input record into an unsaved ShortURL, or None if it is invalid."""
+        try:
+            self.validate_url(record.get('original_url') or '')
+        except ValidationError:
+            return None
+
+        email = record.get('user')
+        if email:
+            if email not in self.owners:
+                self.owners[email] = self._owner_id(email)
+            owner_id = self.owners[email]
+        elif self.default_owner:
+            owner_id = self.default_owner
+        else:
+            raise CommandError("Row has no 'user' column value and no --user was given.")
+
+        # A key in the generated keyspace is only safe on the id that generates it
+        key_ids = {generated_key_id(key) for key in (record.get('short_key'), record.get('custom_key')) if key}
+        key_ids.discard(None)
+        if len(key_ids) > 1:
+            return None
+
+        obj = ShortURL(
+            id=key_ids.pop() if key_ids else None,
+            user_id=owner_id,
+            original_url=record['original_url'],
+            domain=extract_domain(record['original_url']),
+            short_key=record.get('short_key') or None,
+            custom_key=record.get('custom_key') or None,
+            click_count=int(record.get('click_count') or 0),
+            # Added to the owner's total below rather than by the next fold
+            counted_clicks=int(record.get('click_count') or 0),
+            expiration_date=_parse_date(record.get('expiration_date')),
+            redirect_status=int(record['redirect_status']) if record.get('redirect_status') else None,
+            status='done',
+        )
+        # bulk_create's auto_now_add overwrites created_at; restore it afterwards
+        obj._imported_created_at = _parse_date(record.get('created_at'))
+        return obj
+
+    def _flush(self, batch):
+        """Insert one chunk, skipping rows whose keys or pinned ids are already taken."""
+        short_keys = {obj.short_key for obj in batch if obj.short_key}
+        custom_keys = {obj.custom_key for obj in batch if obj.custom_key}
+        # Either column may already hold either kind of key
+        taken = taken_codes(short_keys | custom_keys)
+        pinned = {obj.pk for obj in batch if obj.pk is not None}
+        used_ids = set()
+        if pinned:
+            used_ids.update(ShortURL.objects.filter(pk__in=pinned).values_list('pk', flat=True))
+            used_ids.update(ArchivedShortURL.objects.filter(pk__in=pinned).values_list('pk', flat=True))
+
+        rows = []
+        for obj in batch:
+            keys = {obj.short_key, obj.custom_key} - {None}
+            if keys & taken or obj.pk in used_ids:
+                self.skipped += 1
+                continue
+            # Also guards against duplicates within the file
+            taken.update(keys)
+            used_ids.add(obj.pk)
+            rows.append(obj)
+
+        with transaction.atomic():
+            created = ShortURL.objects.bulk_create([obj for obj in rows if obj.pk is not None])
+            if created:
+                # Move the id sequence past the pinned ids before drawing from it
+                with connection.cursor() as cursor:
+                    for statement in connection.ops.sequence_reset_sql(no_style(), [ShortURL]):
+                        cursor.execute(statement)
+            created += ShortURL.objects.bulk_create([obj for obj in rows if obj.pk is None])
+            changed = []
+            for obj in created:
+                dirty = False
+                if not obj.short_key and not obj.custom_key:
+                    obj.short_key = encode_base62(obj.pk + SHORT_KEY_ID_OFFSET)
+                    dirty = True
+                if obj._imported_created_at:
+                    obj.created_at = obj._imported_created_at
+                    dirty = True
+                if dirty:
+                    changed.append(obj)
+            if changed:
+                ShortURL.objects.bulk_update(changed, ['short_key', 'created_at'])
+            # bulk_create sends no post_save, so the owners' totals are adjusted here
+            totals = {}
+            for obj in created:
+                links, clicks = totals.get(obj.user_id, (0, 0))
+                totals[obj.user_id] = (links + 1, clicks + obj.click_count)
+            for user_id, (links, clicks) in totals.items():
+                adjust_user_stats(user_id, links=links, clicks=clicks)
+
+        self.imported += len(created)
+        elapsed = time.monotonic() - self.started
+        self.stderr.write(
+            f"{self.imported} rows imported, {self.skipped} skipped ({self.imported / elapsed:.0f} rows/s)"
+        )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from shortener.stats import fold_clicks, recompute_user_stats, sweep_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's UserStats (link count, clicks, expired links) from "
+        "their links, after counting links that expired and clicks recorded since "
+        "the last sweeps. Repairs totals that drifted, e.g. after rows were changed outside the app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only reconcile the user with this email.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Users recomputed per query.")
+
+    def handle(self, *args, **options):
+        swept = sweep_expired()
+        folded = fold_clicks(scan=True)
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(email=options['user'])
+            if not users.exists():
+                raise CommandError(f"No user with email {options['user']}")
+
+        checked = drifted = 0
+        user_ids = users.values_list('pk', flat=True)
+        last_pk = None
+        while True:
+            page = user_ids if last_pk is None else user_ids.filter(pk__gt=last_pk)
+            batch = list(page[:options['batch_size']])
+            if not batch:
+                break
+            drifted += recompute_user_stats(batch)
+            checked += len(batch)
+            last_pk = batch[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {checked} users ({drifted} corrected); {swept} links newly expired, "
+            f"{folded} clicks folded."
+        ))
@@ -0,0 +1,91 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from django.utils import timezone
+from shortener.hotkeys import hot_codes
+from shortener.models import ShortURL
+from shortener.resolver import RESOLVE_FIELDS, cache_rows
+
+RANKINGS = ('clicks', 'recent', 'hot', 'file')
+
+
+def read_codes(path):
+    """Yield one code per non-empty line of a hot-list file (first CSV column)."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            code = line.split(',', 1)[0].strip()
+            if code:
+                yield code
+
+
+class Command(BaseCommand):
+    help = (
+        "Preload the redirect resolution cache with the top-N links so the first "
+        "wave of redirects after a deploy or Redis restart doesn't hit the database. "
+        "Links are ranked by total clicks, by most recent activity, by the live hot "
+        "set, or taken from an exported hot list (one code per line), and written in "
+        "batched set_many calls."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=100000, help="Number of links to load.")
+        parser.add_argument('--by', choices=RANKINGS, default='clicks')
+        parser.add_argument('--file', help="Hot list for --by file.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        live = ShortURL.objects.filter(
+            models.Q(expiration_date__isnull=True) | models.Q(expiration_date__gt=timezone.now())
+        )
+        if options['by'] == 'file':
+            if not options['file']:
+                raise CommandError("--by file requires --file.")
+            codes = self._read_file(options['file'], options['top'])
+            batches = self._batches_for_codes(live, codes, options['batch_size'])
+        elif options['by'] == 'hot':
+            codes = [code for code, _ in hot_codes()][:options['top']]
+            batches = self._batches_for_codes(live, codes, options['batch_size'])
+        else:
+            order = '-click_count' if options['by'] == 'clicks' else '-updated_at'
+            rows = live.order_by(order).values_list(*RESOLVE_FIELDS)[:options['top']]
+            batches = self._chunks(rows.iterator(chunk_size=options['batch_size']), options['batch_size'])
+
+        started = time.monotonic()
+        written = 0
+        for batch in batches:
+            written += cache_rows(batch)
+            elapsed = time.monotonic() - started
+            self.stderr.write(f"{written} codes cached ({written / elapsed:.0f} codes/s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Warmed {written} codes in {time.monotonic() - started:.1f}s."))
+
+    @staticmethod
+    def _chunks(rows, size):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _read_file(path, top):
+        codes = []
+        try:
+            for code in read_codes(path):
+                codes.append(code)
+                if len(codes) >= top:
+                    break
+        except OSError as e:
+            raise CommandError(f"Could not read hot list: {e}")
+        return codes
+
+    @staticmethod
+    def _batches_for_codes(live, codes, size):
+        for start in range(0, len(codes), size):
+            chunk = codes[start:start + size]
+            yield list(live.filter(
+                models.Q(short_key__in=chunk) | models.Q(custom_key__in=chunk)
+            ).values_list(*RESOLVE_FIELDS))
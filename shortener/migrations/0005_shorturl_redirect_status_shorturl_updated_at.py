@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0004_alter_shorturl_short_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorturl',
+            name='redirect_status',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(301, 'Moved Permanently (301)'), (302, 'Found (302)'), (307, 'Temporary Redirect (307)'), (308, 'Permanent Redirect (308)')], null=True),
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS shortener_shorturl_fts_au",
+    "DROP TRIGGER IF EXISTS shortener_shorturl_fts_ad",
+    "DROP TRIGGER IF EXISTS shortener_shorturl_fts_ai",
+    "DROP TABLE IF EXISTS shortener_shorturl_fts",
+]
+POSTGRES_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS shorturl_original_url_trgm",
+]
+
+
+def fill_domains(apps, schema_editor):
+    from shortener.utils import extract_domain
+    ShortURL = apps.get_model('shortener', 'ShortURL')
+    batch = []
+    for url in ShortURL.objects.only('id', 'original_url').iterator(chunk_size=2000):
+        url.domain = extract_domain(url.original_url)
+        batch.append(url)
+        if len(batch) >= 2000:
+            ShortURL.objects.bulk_update(batch, ['domain'])
+            batch = []
+    if batch:
+        ShortURL.objects.bulk_update(batch, ['domain'])
+
+
+def create_search_index(apps, schema_editor):
+    # The index must stay on the expression search.url_substring_q() filters on
+    from shortener.search import POSTGRES_TRGM_INDEX, ensure_sqlite_search_index
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        ensure_sqlite_search_index(schema_editor.connection)
+    elif vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_EXTENSION)
+        schema_editor.execute(POSTGRES_TRGM_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0005_shorturl_redirect_status_shorturl_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorturl',
+            name='domain',
+            field=models.CharField(blank=True, default='', max_length=253),
+        ),
+        migrations.RunPython(fill_domains, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='shorturl',
+            index=models.Index(fields=['user', 'domain'], name='shorturl_user_domain_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0006_shorturl_domain_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkHealth',
+            fields=[
+                ('link', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health', serialize=False, to='shortener.shorturl')),
+                ('ok', models.BooleanField()),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('checked_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
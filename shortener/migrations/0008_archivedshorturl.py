@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0007_shorturl_is_active_linkhealth'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedShortURL',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('original_url', models.URLField(max_length=2048)),
+                ('short_key', models.CharField(blank=True, max_length=20, null=True, unique=True)),
+                ('custom_key', models.CharField(blank=True, max_length=50, null=True, unique=True)),
+                ('click_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('expiration_date', models.DateTimeField(blank=True, null=True)),
+                ('redirect_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('qr_code', models.CharField(blank=True, max_length=100)),
+                ('archived_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_urls', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
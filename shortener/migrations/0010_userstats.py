@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_user_stats(apps, schema_editor):
+    ShortURL = apps.get_model('shortener', 'ShortURL')
+    UserStats = apps.get_model('shortener', 'UserStats')
+    ShortURL.objects.filter(expiration_date__lte=timezone.now()).update(expiry_counted=True)
+    totals = ShortURL.objects.order_by().values('user_id').annotate(
+        links=models.Count('id'),
+        clicks=models.Sum('click_count'),
+        expired=models.Count('id', filter=models.Q(expiry_counted=True)),
+    )
+    now = timezone.now()
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=row['user_id'],
+                link_count=row['links'],
+                total_clicks=row['clicks'] or 0,
+                expired_count=row['expired'],
+                reconciled_at=now,
+            )
+            for row in totals.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0009_deletionjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='link_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('link_count', models.IntegerField(default=0)),
+                ('expired_count', models.IntegerField(default=0)),
+                ('total_clicks', models.BigIntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='expiry_counted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='shorturl',
+            index=models.Index(condition=models.Q(('expiration_date__isnull', False), ('expiry_counted', False)), fields=['expiration_date'], name='shorturl_expiry_pending_idx'),
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0010_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkhealth',
+            name='deactivated',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+def count_existing_clicks(apps, schema_editor):
+    # UserStats.total_clicks already includes every click recorded so far
+    ShortURL = apps.get_model('shortener', 'ShortURL')
+    ShortURL.objects.update(counted_clicks=models.F('click_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0011_linkhealth_deactivated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorturl',
+            name='counted_clicks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_clicks, migrations.RunPython.noop),
+    ]
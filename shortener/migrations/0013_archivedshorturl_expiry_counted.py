@@ -0,0 +1,46 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:10
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def count_archived_links(apps, schema_editor):
+    # Archiving used to subtract the links from their owners' totals; add them back
+    ArchivedShortURL = apps.get_model('shortener', 'ArchivedShortURL')
+    ShortURL = apps.get_model('shortener', 'ShortURL')
+    UserStats = apps.get_model('shortener', 'UserStats')
+    ArchivedShortURL.objects.filter(expiration_date__lte=timezone.now()).update(expiry_counted=True)
+    user_ids = ArchivedShortURL.objects.order_by().values_list('user_id', flat=True).distinct()
+    for user_id in user_ids.iterator(chunk_size=2000):
+        live = ShortURL.objects.filter(user_id=user_id).aggregate(
+            links=models.Count('id'),
+            clicks=models.Sum('counted_clicks'),
+            expired=models.Count('id', filter=models.Q(expiry_counted=True)),
+        )
+        archived = ArchivedShortURL.objects.filter(user_id=user_id).aggregate(
+            links=models.Count('id'),
+            clicks=models.Sum('click_count'),
+            expired=models.Count('id', filter=models.Q(expiry_counted=True)),
+        )
+        UserStats.objects.update_or_create(user_id=user_id, defaults={
+            'link_count': live['links'] + archived['links'],
+            'total_clicks': (live['clicks'] or 0) + (archived['clicks'] or 0),
+            'expired_count': live['expired'] + archived['expired'],
+            'reconciled_at': timezone.now(),
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0012_shorturl_counted_clicks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedshorturl',
+            name='expiry_counted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(count_archived_links, migrations.RunPython.noop),
+    ]
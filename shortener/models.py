@@ -1,7 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from .utils import encode_base62
+from .utils import encode_base62, extract_domain
 import uuid
 
 """
@@ -23,6 +23,12 @@ class ShortURL(models.Model):
         ('done', 'Done'),
         ('failed', 'Failed'),
     ]
+    REDIRECT_STATUS_CHOICES = [
+        (301, 'Moved Permanently (301)'),
+        (302, 'Found (302)'),
+        (307, 'Temporary Redirect (307)'),
+        (308, 'Permanent Redirect (308)'),
+    ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='urls')
     original_url = models.URLField(max_length=2048)
@@ -34,6 +40,35 @@ class ShortURL(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     expiration_date = models.DateTimeField(null=True, blank=True)
     qr_code = models.ImageField(upload_to='qr_codes/', null=True, blank=True)
+    # Null falls back to settings.SHORTENER_REDIRECT_STATUS
+    redirect_status = models.PositiveSmallIntegerField(choices=REDIRECT_STATUS_CHOICES, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Host of original_url, kept in sync by save() for indexed domain search
+    domain = models.CharField(max_length=253, blank=True, default='')
+    # Inactive links answer 404 instead of redirecting (set by owners, staff or the link-health checker)
+    is_active = models.BooleanField(default=True)
+    # Set (with is_active=False) when the link is queued for background deletion
+    deletion_job = models.ForeignKey('DeletionJob', on_delete=models.SET_NULL, null=True, blank=True, related_name='links')
+    # Whether the link's expiry is included in its owner's UserStats.expired_count (see shortener.stats)
+    expiry_counted = models.BooleanField(default=False)
+    # Clicks of the link included in its owner's UserStats.total_clicks; fold_clicks() adds the rest
+    counted_clicks = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the codes as loaded so caches can evict them if they change
+        instance._loaded_keys = (instance.__dict__.get('short_key'), instance.__dict__.get('custom_key'))
+        return instance
+
+    def get_loaded_keys(self):
+        """
+        Return the short and custom key as they were loaded from the database.
+
+        Returns:
+            tuple: (short_key, custom_key); empty for unsaved instances.
+        """
+        return getattr(self, '_loaded_keys', ())
 
     def is_expired(self):
         """
@@ -46,6 +81,15 @@ class ShortURL(models.Model):
             return timezone.now() > self.expiration_date
         return False
 
+    def get_redirect_status(self):
+        """
+        Resolve the HTTP status used when redirecting to the original URL.
+
+        Returns:
+            int: The per-link status if set, otherwise the global default.
+        """
+        return self.redirect_status or settings.SHORTENER_REDIRECT_STATUS
+
     def save(self, *args, **kwargs):
         """
         Save the model instance and trigger async key generation.
@@ -54,7 +98,17 @@ class ShortURL(models.Model):
         to generate the short key and QR code after the transaction commits.
         """
         is_new = self.pk is None
+        self.domain = extract_domain(self.original_url)
+        uncount_expiry = not is_new and self.expiry_counted and not self.is_expired()
+        if uncount_expiry:
+            # Expiration moved into the future (or removed): no longer expired
+            self.expiry_counted = False
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'expiry_counted'}
         super().save(*args, **kwargs)
+        if uncount_expiry:
+            from .stats import adjust_user_stats
+            adjust_user_stats(self.user_id, expired=-1)
         if is_new:
             from .tasks import generate_short_key_task
             from django.db import transaction
@@ -68,4 +122,126 @@ class ShortURL(models.Model):
         indexes = [
             models.Index(fields=['short_key']),
             models.Index(fields=['custom_key']),
+            models.Index(fields=['user', 'domain'], name='shorturl_user_domain_idx'),
+            # Links whose expiry the stats sweep still has to count
+            models.Index(
+                fields=['expiration_date'],
+                condition=models.Q(expiry_counted=False, expiration_date__isnull=False),
+                name='shorturl_expiry_pending_idx',
+            ),
         ]
+
+
+class LinkHealth(models.Model):
+    """
+    Result of the latest reachability check of a link's destination.
+
+    Kept apart from ShortURL so recording a check neither bumps the link's
+    updated_at nor evicts its cached resolution.
+    """
+    link = models.OneToOneField(ShortURL, on_delete=models.CASCADE, primary_key=True, related_name='health')
+    ok = models.BooleanField()
+    # None when the request failed before a response (DNS, connect, timeout, TLS)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    # The checker deactivated the link; it reactivates it when a check passes again
+    deactivated = models.BooleanField(default=False)
+    checked_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.link_id}: {self.status_code or self.error}"
+
+
+class ArchivedShortURL(models.Model):
+    """
+    A cold link moved out of ShortURL by the archive_links command.
+
+    Holds only what is needed to serve and restore the link; the id is the
+    link's original ShortURL id, reused when it is promoted back. Archived
+    links stay in their owner's UserStats, with every click counted.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_urls')
+    original_url = models.URLField(max_length=2048)
+    short_key = models.CharField(max_length=20, unique=True, null=True, blank=True)
+    custom_key = models.CharField(max_length=50, unique=True, null=True, blank=True)
+    click_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    expiration_date = models.DateTimeField(null=True, blank=True)
+    redirect_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    qr_code = models.CharField(max_length=100, blank=True)
+    archived_at = models.DateTimeField()
+    # ShortURL.expiry_counted, carried over; links expiring while archived are counted once promoted
+    expiry_counted = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.short_key or self.custom_key} -> {self.original_url} (archived)"
+
+
+class DeletionJob(models.Model):
+    """
+    A background deletion of an account or of a set of links.
+
+    The data is disabled when the job is created; the rows, QR files and
+    cache entries are then removed in chunks by shortener.deletion, which
+    records its progress here.
+    """
+    KIND_CHOICES = [
+        ('account', 'Account'),
+        ('links', 'Links'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Cleared when an account deletion removes the user; email keeps the record readable
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='deletion_jobs')
+    email = models.EmailField(max_length=255)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        """Fraction of the job's rows deleted so far (0 to 1)."""
+        if self.status == 'done':
+            return 1.0
+        return min(self.deleted / self.total, 1.0) if self.total else 0.0
+
+    def __str__(self):
+        return f"{self.get_kind_display()} deletion for {self.email} ({self.status})"
+
+
+class UserStats(models.Model):
+    """
+    Running totals over a user's links, so summaries don't scan the links.
+
+    Unlike the dashboard listing, they include archived links: moving a link
+    to or from the archive leaves the totals unchanged.
+
+    Kept up to date incrementally by shortener.stats (link create/delete,
+    and periodic sweeps for new clicks and for links that expired); the
+    reconcile_user_stats command recomputes them from the links.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='link_stats')
+    link_count = models.IntegerField(default=0)
+    # Links whose expiration date had passed at the last expiry sweep
+    expired_count = models.IntegerField(default=0)
+    total_clicks = models.BigIntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def active_count(self):
+        return self.link_count - self.expired_count
+
+    def __str__(self):
+        return f"Stats for user {self.user_id}: {self.link_count} links, {self.total_clicks} clicks"
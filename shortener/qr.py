@@ -0,0 +1,43 @@
+"""
+QR code rendering and content-addressed storage.
+
+Images are stored as qr_codes/<aa>/<sha256>.png, named after the hash of
+their bytes. Identical images share one file, a name never changes content,
+and the files can be served with immutable far-future caching.
+"""
+
+import hashlib
+from io import BytesIO
+import qrcode
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+QR_DIR = 'qr_codes'
+
+def render_qr_png(data):
+    """
+    Render `data` as a QR code.
+
+    Returns:
+        bytes: The PNG image.
+    """
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def store_qr_png(content):
+    """
+    Store PNG bytes under their content hash, writing them only once.
+
+    Returns:
+        str: The storage name to assign to ShortURL.qr_code.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    name = f"{QR_DIR}/{digest[:2]}/{digest}.png"
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(content))
@@ -0,0 +1,226 @@
+"""
+Token-bucket rate limiting shared by the redirect, create and login paths.
+
+Buckets live in Redis (settings.REDIS_URL) and are updated by a single Lua
+script call, so each limited request costs exactly one round-trip. When Redis
+is not configured or unreachable, buckets fall back to process-local memory.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger('shortener')
+# Per-request messages: sampled and rate-limited (see shortener.logutils)
+request_logger = logging.getLogger('shortener.requests')
+
+# KEYS[1] = bucket key; ARGV = capacity, refill rate (tokens/s), current time (s)
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', ARGV[3])
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a DRF-style rate string into tokens per second.
+
+    Args:
+        rate (str): e.g. '10/s', '30/min', '1000/hour'.
+
+    Returns:
+        float: The refill rate in tokens per second.
+    """
+    num, period = rate.split('/')
+    return int(num) / RATE_PERIODS[period[0]]
+
+
+class TokenBucketLimiter:
+    """
+    Token-bucket limiter backed by Redis with an in-process fallback.
+
+    After a Redis error the limiter stays on the local buckets for
+    `retry_interval` seconds instead of paying a failing round-trip per request.
+    """
+    def __init__(self, redis_url=None, max_local_buckets=10000, retry_interval=30):
+        self.max_local_buckets = max_local_buckets
+        self.retry_interval = retry_interval
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis_down_until = 0
+        self._script = None
+        if redis_url:
+            client = redis.Redis.from_url(redis_url, socket_timeout=0.1, socket_connect_timeout=0.1)
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def consume(self, key, rate, burst):
+        """
+        Take one token from the bucket identified by `key`.
+
+        Args:
+            key (str): Bucket identifier (scope + identity).
+            rate (float): Refill rate in tokens per second.
+            burst (int): Bucket capacity.
+
+        Returns:
+            tuple: (allowed, wait) where wait is the seconds until a token is available.
+        """
+        now = time.time()
+        if self._script is not None and now >= self._redis_down_until:
+            try:
+                allowed, tokens = self._script(keys=[f"ratelimit:{key}"], args=[burst, rate, repr(now)])
+                return bool(allowed), self._wait(float(tokens), rate)
+            except redis.RedisError as e:
+                logger.warning(f"Rate limiter falling back to local buckets: {e}")
+                self._redis_down_until = now + self.retry_interval
+        return self._consume_local(key, rate, burst, now)
+
+    def _consume_local(self, key, rate, burst, now):
+        with self._lock:
+            tokens, ts = self._local.pop(key, (burst, now))
+            tokens = min(burst, tokens + max(0, now - ts) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._local[key] = (tokens, now)
+            if len(self._local) > self.max_local_buckets:
+                self._local.popitem(last=False)
+        return allowed, self._wait(tokens, rate)
+
+    @staticmethod
+    def _wait(tokens, rate):
+        return max(0, (1 - tokens) / rate)
+
+    def reset(self):
+        """Forget all process-local buckets."""
+        with self._lock:
+            self._local.clear()
+
+
+_limiter = None
+
+
+def get_limiter():
+    """Return the process-wide limiter, creating it on first use."""
+    global _limiter
+    if _limiter is None:
+        _limiter = TokenBucketLimiter(settings.REDIS_URL)
+    return _limiter
+
+
+def get_identity(request, key_type):
+    """
+    Build the identity a bucket is tracked for.
+
+    'token' uses a digest of the Authorization header, 'user' the user's pk,
+    and both fall back to the client IP for anonymous requests.
+    """
+    if key_type == 'token':
+        auth = request.META.get('HTTP_AUTHORIZATION')
+        if auth:
+            return 'token:' + hashlib.sha256(auth.encode()).hexdigest()[:32]
+        key_type = 'user'
+    if key_type == 'user':
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+    return 'ip:' + request.META.get('REMOTE_ADDR', '')
+
+
+def check_rate_limit(request, scope):
+    """
+    Consume a token for `scope` on behalf of the requesting client.
+
+    Returns:
+        tuple: (allowed, wait). Scopes missing from SHORTENER_RATE_LIMITS are unlimited.
+    """
+    config = settings.SHORTENER_RATE_LIMITS.get(scope)
+    if not config:
+        return True, 0
+    identity = get_identity(request, config.get('key', 'ip'))
+    return get_limiter().consume(f"{scope}:{identity}", parse_rate(config['rate']), config['burst'])
+
+
+def check_client_rate_limit(scope, client_ip):
+    """
+    check_rate_limit() for callers without a Django request, such as the
+    standalone redirect app. The client is identified by IP whatever the
+    scope's key type (those callers never authenticate).
+
+    Returns:
+        tuple: (allowed, wait).
+    """
+    config = settings.SHORTENER_RATE_LIMITS.get(scope)
+    if not config:
+        return True, 0
+    return get_limiter().consume(f"{scope}:ip:{client_ip}", parse_rate(config['rate']), config['burst'])
+
+
+def _scope_applies(view, method):
+    methods = getattr(view, 'throttle_methods', None)
+    return bool(getattr(view, 'throttle_scope', None)) and (not methods or method in methods)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle backed by the shared token-bucket limiter.
+
+    Views opt in with `throttle_scope` and can restrict it to some HTTP
+    methods with `throttle_methods`.
+    """
+    def allow_request(self, request, view):
+        self._wait = 0
+        if not _scope_applies(view, request.method):
+            return True
+        allowed, self._wait = check_rate_limit(request, view.throttle_scope)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class RateLimitMixin:
+    """
+    Applies the token-bucket limiter to plain Django class-based views.
+
+    Uses the same `throttle_scope` / `throttle_methods` attributes as the DRF throttle.
+    """
+    throttle_scope = None
+    throttle_methods = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if _scope_applies(self, request.method):
+            allowed, wait = check_rate_limit(request, self.throttle_scope)
+            if not allowed:
+                request_logger.warning("Rate limit exceeded for scope '%s' from %s", self.throttle_scope, request.META.get('REMOTE_ADDR'))
+                response = HttpResponse("Too many requests. Please slow down.", status=429, content_type='text/plain')
+                response['Retry-After'] = str(math.ceil(wait))
+                if self.view_is_async:
+                    async def func():
+                        return response
+                    return func()
+                return response
+        return super().dispatch(request, *args, **kwargs)
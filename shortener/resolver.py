@@ -0,0 +1,245 @@
+"""
+Cached resolution of short codes to their destination.
+
+RedirectView only needs a handful of columns per code, so they are cached
+as a small tuple under shortener:code:<code> in the shared cache. Entries
+are evicted by shortener.signals whenever a ShortURL is saved or deleted,
+and unknown codes are cached briefly to absorb scans of random codes.
+
+In front of the shared cache each process keeps a small LRU/TTL cache (see
+shortener.invalidation) kept coherent over Redis pub/sub, and the current hot
+codes (see shortener.hotkeys) are pinned in process memory on top of that.
+When a memory-mapped snapshot is configured (see shortener.snapshot) it is
+consulted after the L1, before any network round-trip.
+"""
+
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
+from .archive import promote
+from .invalidation import InvalidationSubscriber, LocalCache, publish_invalidation
+from .models import ShortURL
+from .snapshot import get_snapshot, mark_dirty, refresh_dirty
+
+RESOLVE_FIELDS = ('id', 'original_url', 'expiration_date', 'redirect_status', 'is_active', 'short_key', 'custom_key')
+
+# Stored for codes that don't exist (None can't be told apart from a cache miss)
+MISSING = 0
+
+# code -> ResolvedURL for the pinned hot codes; replaced wholesale by pin_codes()
+_pinned = {}
+
+# code -> ResolvedURL or MISSING, per process
+_local = LocalCache(settings.SHORTENER_L1_MAX_ENTRIES, settings.SHORTENER_L1_TTL)
+
+# Codes collected by batched_invalidation(), per thread
+_batch = threading.local()
+
+
+class ResolvedURL(namedtuple(
+    'ResolvedURL', ['id', 'original_url', 'expiration_date', 'redirect_status', 'is_active'],
+    # Entries cached before is_active existed unpickle as active
+    defaults=(True,)
+)):
+    """The subset of a ShortURL needed to serve a redirect."""
+    __slots__ = ()
+
+    def is_expired(self):
+        return bool(self.expiration_date) and timezone.now() > self.expiration_date
+
+    def get_redirect_status(self):
+        return self.redirect_status or settings.SHORTENER_REDIRECT_STATUS
+
+
+# RESOLVE_FIELDS rows are the ResolvedURL values followed by the codes
+CODES_AT = len(ResolvedURL._fields)
+
+
+def code_cache_key(code):
+    return f"shortener:code:{code}"
+
+
+def resolve_local(code, reload_snapshot=True):
+    """
+    Look up a code in this process only: pinned codes, the L1 cache and
+    the snapshot.
+
+    Every SHORTENER_SNAPSHOT_RELOAD_INTERVAL seconds the lookup first checks
+    for a newer snapshot, which reads the disk and Redis. Event loops pass
+    reload_snapshot=False, which never blocks, and reload in a thread when
+    snapshot.reload_due() says so.
+
+    Returns:
+        ResolvedURL: The destination, MISSING for a code known not to exist,
+        or None when resolve_code() has to ask the cache or database.
+    """
+    pinned = _pinned.get(code)
+    if pinned is not None:
+        return pinned
+
+    if _subscriber is not None:
+        _subscriber.ensure_started()
+    local = _local.get(code)
+    if local is not None:
+        return local
+
+    snapshot = get_snapshot(reload=reload_snapshot)
+    if snapshot is not None:
+        values = snapshot.lookup(code)
+        if values is not None:
+            resolved = ResolvedURL(*values)
+            _local.set(code, resolved)
+            return resolved
+    return None
+
+
+def resolve_code(code):
+    """
+    Look up a short or custom code, going to the database only on a cache miss.
+
+    Codes missing from the main table are looked up in the archive, and an
+    archived link is promoted back (see shortener.archive).
+
+    Returns:
+        ResolvedURL: The destination, or None if the code doesn't exist.
+    """
+    local = resolve_local(code)
+    if local is not None:
+        return local or None
+
+    key = code_cache_key(code)
+    cached = cache.get(key)
+    if cached is not None:
+        _local.set(code, cached)
+        return cached or None
+
+    row = ShortURL.objects.filter(
+        models.Q(short_key=code) | models.Q(custom_key=code)
+    ).values_list(*RESOLVE_FIELDS).first()
+    if row is None:
+        # A hit on an archived (cold) link brings it back into the main table
+        promoted = promote(code)
+        if promoted is not None:
+            row = ShortURL.objects.filter(pk=promoted.pk).values_list(*RESOLVE_FIELDS).first()
+    if row is None:
+        cache.set(key, MISSING, settings.SHORTENER_RESOLVE_MISS_TIMEOUT)
+        _local.set(code, MISSING)
+        return None
+    resolved = ResolvedURL(*row[:CODES_AT])
+    cache.set(key, resolved, settings.SHORTENER_RESOLVE_CACHE_TIMEOUT)
+    _local.set(code, resolved)
+    return resolved
+
+
+def cache_rows(rows):
+    """
+    Store resolved entries for rows of RESOLVE_FIELDS values in one set_many call.
+
+    Returns:
+        int: The number of codes written.
+    """
+    entries = {}
+    for row in rows:
+        resolved = ResolvedURL(*row[:CODES_AT])
+        for code in row[CODES_AT:]:
+            if code:
+                entries[code_cache_key(code)] = resolved
+    cache.set_many(entries, settings.SHORTENER_RESOLVE_CACHE_TIMEOUT)
+    return len(entries)
+
+
+def evict_local(codes):
+    """Drop codes from this process's pinned set, L1 cache and snapshot."""
+    for code in codes:
+        _pinned.pop(code, None)
+    _local.delete_many(codes)
+    mark_dirty(codes)
+
+
+def clear_local():
+    """
+    Empty this process's L1 cache and re-sync the snapshot's dirty codes
+    (pinned codes are refreshed separately).
+    """
+    _local.clear()
+    refresh_dirty()
+
+
+def invalidate_codes(*codes):
+    """
+    Evict cached resolutions for the given codes (empty values are ignored)
+    from this process, the shared cache and, via pub/sub, every other worker.
+
+    The shared eviction and the broadcast are repeated once the surrounding
+    transaction commits, so a worker that re-reads the old row in between
+    can't keep it cached.
+    """
+    codes = {code for code in codes if code}
+    if not codes:
+        return
+    batch = getattr(_batch, 'codes', None)
+    if batch is not None:
+        batch.update(codes)
+        return
+    keys = [code_cache_key(code) for code in codes]
+    evict_local(codes)
+    cache.delete_many(keys)
+
+    def broadcast():
+        cache.delete_many(keys)
+        publish_invalidation(codes)
+
+    transaction.on_commit(broadcast)
+
+
+@contextmanager
+def batched_invalidation():
+    """
+    Collect the invalidate_codes() calls made in this thread during the
+    block (e.g. by post_delete signals of a bulk delete) into one call at
+    its end: one cache round-trip and one broadcast instead of one per row.
+    """
+    if getattr(_batch, 'codes', None) is not None:
+        yield
+        return
+    _batch.codes = set()
+    try:
+        yield
+    finally:
+        codes, _batch.codes = _batch.codes, None
+        invalidate_codes(*codes)
+
+
+def pin_codes(codes):
+    """
+    Replace the process-local pinned set with resolutions of `codes`.
+
+    Entries come from the shared cache where possible and from one database
+    query otherwise. Pins are refreshed on every hot-set publish, which bounds
+    how long a change made in another process can go unnoticed here.
+    """
+    global _pinned
+    keys = {code_cache_key(code): code for code in codes}
+    pinned = {}
+    for key, value in cache.get_many(list(keys)).items():
+        if value:
+            pinned[keys[key]] = value
+    missing = {code for code in codes if code not in pinned}
+    if missing:
+        rows = ShortURL.objects.filter(
+            models.Q(short_key__in=missing) | models.Q(custom_key__in=missing)
+        ).values_list(*RESOLVE_FIELDS)
+        for row in rows:
+            for code in row[CODES_AT:]:
+                if code in missing:
+                    pinned[code] = ResolvedURL(*row[:CODES_AT])
+    _pinned = pinned
+
+
+_subscriber = None
+if settings.REDIS_URL:
+    _subscriber = InvalidationSubscriber(settings.REDIS_URL, evict_local, clear_local)
@@ -0,0 +1,135 @@
+"""
+Indexed search over short links.
+
+Codes and domains are matched by prefix through B-tree range scans, and
+substrings of original_url through a trigram index: an FTS5 table kept in
+sync by triggers on SQLite, and a pg_trgm GIN index on PostgreSQL (both
+created in migration 0006). Neither path scans a user's whole link set.
+"""
+
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'shortener_shorturl_fts'
+
+# External-content FTS5 table over original_url; the trigram tokenizer makes
+# MATCH a substring search. Triggers keep it in sync with every write,
+# including bulk_create() and queryset.update().
+SQLITE_FTS_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"original_url, content='shortener_shorturl', content_rowid='id', tokenize='trigram')"
+)
+SQLITE_FTS_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON shortener_shorturl BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, original_url) VALUES (new.id, new.original_url);
+    END""",
+    f'{FTS_TABLE}_ad': f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON shortener_shorturl BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, original_url) VALUES ('delete', old.id, old.original_url);
+    END""",
+    f'{FTS_TABLE}_au': f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF original_url ON shortener_shorturl BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, original_url) VALUES ('delete', old.id, old.original_url);
+        INSERT INTO {FTS_TABLE}(rowid, original_url) VALUES (new.id, new.original_url);
+    END""",
+}
+
+# Trigram GIN index on the bare column: serves `original_url ILIKE '%...%'`
+# (ILikeContains below). Django's icontains compiles to
+# UPPER(original_url::text) LIKE UPPER(...), an expression it can't serve.
+POSTGRES_TRGM_INDEX = (
+    "CREATE INDEX IF NOT EXISTS shorturl_original_url_trgm "
+    "ON shortener_shorturl USING gin (original_url gin_trgm_ops)"
+)
+
+# Trigram indexes can't serve shorter substrings
+MIN_SUBSTRING_LENGTH = 3
+
+
+class ILikeContains(models.Lookup):
+    """
+    Case-insensitive substring match as `lhs ILIKE '%term%'` (PostgreSQL).
+
+    Used as an expression, e.g. ILikeContains(F('original_url'), term).
+    """
+    lookup_name = 'ilike_contains'
+    # Keep the term a plain value so get_db_prep_lookup() can escape it
+    prepare_rhs = False
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', [f"%{connection.ops.prep_for_like_query(value)}%"]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+def prefix_q(field, prefix):
+    """
+    Match values of `field` starting with `prefix` using an index range scan.
+
+    The bounds let any B-tree index serve the lookup whatever the column's
+    collation; startswith then drops collation-equal but different values.
+    """
+    return models.Q(**{
+        f'{field}__gte': prefix,
+        f'{field}__lt': prefix + '\uffff',
+        f'{field}__startswith': prefix,
+    })
+
+
+def url_substring_q(term, using='default'):
+    """
+    Match links whose original_url contains `term`, or None if it is too short.
+    """
+    if len(term) < MIN_SUBSTRING_LENGTH:
+        return None
+    if connections[using].vendor == 'sqlite':
+        phrase = '"' + term.replace('"', '""') + '"'
+        return models.Q(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [phrase]))
+    return models.Q(ILikeContains(models.F('original_url'), term))
+
+
+def search_urls(queryset, term):
+    """
+    Filter `queryset` to links matching a search term.
+
+    A link matches when its short or custom code starts with the term, its
+    domain starts with it, or its original URL contains it.
+
+    Args:
+        queryset (QuerySet): ShortURLs to search, usually one user's.
+        term (str): The search string.
+
+    Returns:
+        QuerySet: The matching links.
+    """
+    term = term.strip()
+    condition = prefix_q('short_key', term) | prefix_q('custom_key', term) | prefix_q('domain', term.lower())
+    substring = url_substring_q(term, queryset.db)
+    if substring is not None:
+        condition |= substring
+    return queryset.filter(condition)
+
+
+def ensure_sqlite_search_index(connection):
+    """
+    Create the SQLite FTS table and its triggers if any are missing.
+
+    SQLite migrations that alter shortener_shorturl rebuild the table, which
+    silently drops its triggers; this restores them and rebuilds the index.
+
+    Returns:
+        bool: True if anything had to be (re)created.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s", [f'{FTS_TABLE}%'])
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing >= {FTS_TABLE, *SQLITE_FTS_TRIGGERS}:
+            return False
+        cursor.execute(SQLITE_FTS_TABLE)
+        for sql in SQLITE_FTS_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
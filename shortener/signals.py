@@ -0,0 +1,49 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from .models import ShortURL
+from .resolver import invalidate_codes
+from .search import ensure_sqlite_search_index
+from .stats import adjust_user_stats, is_moving_links
+
+@receiver(post_save, sender=ShortURL)
+@receiver(post_delete, sender=ShortURL)
+def evict_resolved_codes(sender, instance, **kwargs):
+    """
+    Drop cached resolutions for a link's current and previously loaded codes,
+    whether it was changed through the API, the admin or a task.
+    """
+    invalidate_codes(instance.short_key, instance.custom_key, *instance.get_loaded_keys())
+
+
+@receiver(post_save, sender=ShortURL)
+def count_created_link(sender, instance, created, **kwargs):
+    """
+    Add a new link to its owner's UserStats; clicks it was created with are
+    added by the next fold unless already counted.
+    """
+    if created and not is_moving_links():
+        adjust_user_stats(instance.user_id, links=1, clicks=instance.counted_clicks, expired=int(instance.expiry_counted))
+
+
+@receiver(post_delete, sender=ShortURL)
+def uncount_deleted_link(sender, instance, **kwargs):
+    """
+    Remove a deleted link from its owner's UserStats.
+
+    Links deleted by a DeletionJob were already subtracted when the job
+    started (see shortener.deletion), and archived links stay counted.
+    """
+    if instance.deletion_job_id is None and not is_moving_links():
+        adjust_user_stats(
+            instance.user_id, links=-1, clicks=-instance.counted_clicks, expired=-int(instance.expiry_counted)
+        )
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, using='default', **kwargs):
+    """
+    Re-create SQLite search triggers dropped by a table rebuild in a later migration.
+    """
+    if sender.name == 'shortener':
+        ensure_sqlite_search_index(connections[using])
@@ -0,0 +1,378 @@
+"""
+Memory-mapped snapshot of the code -> destination map.
+
+export_snapshot writes every live code into SHORTENER_SNAPSHOT_DIR as a
+sorted binary file, then later as small delta files holding the codes that
+changed since. The workers on a node map these files read-only, so they all
+share one page-cache copy of the key space, and answer lookups with a binary
+search instead of a cache or database round-trip.
+
+File layout (little-endian):
+
+    header   MAGIC, entry count (Q), generated at (d, epoch seconds)
+    index    one Q per entry: byte offset of its record, sorted by code
+    records  RECORD header, then the code and the URL as UTF-8
+
+Snapshots go stale as links change. Every change goes through
+resolver.invalidate_codes, which marks its codes dirty: locally, over
+pub/sub and in a Redis set that the exporter rotates each generation (see
+shortener.invalidation). A worker never answers a dirty code from the
+snapshot, so the snapshot only ever serves codes unchanged since it was
+written, plus whatever the deltas have since re-published.
+"""
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from .invalidation import dirty_codes, release_rotated_codes, rotate_dirty_codes
+from .models import ShortURL
+
+logger = logging.getLogger('shortener')
+
+MAGIC = b'SNAPURL1'
+HEADER = struct.Struct('<8sQd')
+OFFSET = struct.Struct('<Q')
+# code length, link id, expiration (epoch microseconds, -1 for none),
+# redirect status (0 for the default), flags, URL length
+RECORD = struct.Struct('<BQqHBI')
+
+ACTIVE = 1
+TOMBSTONE = 2
+
+MANIFEST = 'manifest.json'
+
+SNAPSHOT_FIELDS = ('id', 'original_url', 'expiration_date', 'redirect_status', 'is_active', 'short_key', 'custom_key')
+
+# Lookup result for a code a delta marks as removed
+REMOVED = object()
+
+
+def pack_record(code, values):
+    """
+    Encode one entry; `values` is None for a tombstone.
+
+    Args:
+        code (bytes): The UTF-8 encoded code.
+        values (tuple): (id, original_url, expiration_date, redirect_status, is_active).
+    """
+    if values is None:
+        return RECORD.pack(len(code), 0, -1, 0, TOMBSTONE, 0) + code
+    link_id, original_url, expiration_date, redirect_status, is_active = values
+    url = original_url.encode()
+    expires = int(expiration_date.timestamp() * 1_000_000) if expiration_date else -1
+    flags = ACTIVE if is_active else 0
+    return RECORD.pack(len(code), link_id, expires, redirect_status or 0, flags, len(url)) + code + url
+
+
+def write_snapshot(path, entries, generated_at):
+    """
+    Write (code, values) entries as a sorted snapshot file at `path`.
+
+    Records are spooled to a temporary file in arrival order and only their
+    codes and offsets are sorted in memory (roughly 100 bytes per code).
+    The file is written next to `path` and renamed into place.
+
+    Returns:
+        int: The number of entries written.
+    """
+    keys = []
+    with tempfile.TemporaryFile() as records:
+        position = 0
+        for code, values in entries:
+            code = code.encode()
+            record = pack_record(code, values)
+            records.write(record)
+            keys.append((code, position))
+            position += len(record)
+        keys.sort()
+
+        data_start = HEADER.size + OFFSET.size * len(keys)
+        offsets = array('Q', (data_start + position for _, position in keys))
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, len(keys), generated_at))
+            out.write(offsets.tobytes())
+            records.seek(0)
+            shutil.copyfileobj(records, out)
+        os.replace(tmp_path, path)
+    return len(keys)
+
+
+class SnapshotFile:
+    """One read-only, memory-mapped snapshot or delta file."""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.generated_at = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a snapshot file")
+
+    def _offset(self, index):
+        return OFFSET.unpack_from(self._map, HEADER.size + OFFSET.size * index)[0]
+
+    def _code_at(self, offset):
+        start = offset + RECORD.size
+        return self._map[start:start + self._map[offset]]
+
+    def find(self, code):
+        """
+        Binary-search for `code` (bytes).
+
+        Returns:
+            The entry's values tuple, REMOVED for a tombstone, or None if absent.
+        """
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = self._offset(mid)
+            found = self._code_at(offset)
+            if found < code:
+                lo = mid + 1
+            elif found > code:
+                hi = mid
+            else:
+                return self._values_at(offset)
+        return None
+
+    def _values_at(self, offset):
+        code_length, link_id, expires, redirect_status, flags, url_length = RECORD.unpack_from(self._map, offset)
+        if flags & TOMBSTONE:
+            return REMOVED
+        start = offset + RECORD.size + code_length
+        original_url = self._map[start:start + url_length].decode()
+        expiration_date = None
+        if expires >= 0:
+            expiration_date = datetime.fromtimestamp(expires / 1_000_000, tz=dt_timezone.utc)
+        return link_id, original_url, expiration_date, redirect_status or None, bool(flags & ACTIVE)
+
+    def codes(self):
+        """Yield every code (str) in sorted order."""
+        for index in range(self.count):
+            yield self._code_at(self._offset(index)).decode()
+
+
+def read_manifest(directory):
+    """
+    Returns:
+        dict: {'generation', 'base', 'deltas'}, or None if nothing was exported yet.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(directory, manifest):
+    tmp_path = os.path.join(directory, f"{MANIFEST}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+
+
+class Snapshot:
+    """
+    A base file and its deltas as loaded by one process, plus the codes that
+    must not be answered from them.
+    """
+    def __init__(self, directory, manifest, dirty):
+        self.generation = manifest['generation']
+        # Newest first: a delta entry overrides everything older
+        names = [*reversed(manifest['deltas']), manifest['base']]
+        self.files = [SnapshotFile(os.path.join(directory, name)) for name in names]
+        self.dirty = dirty
+
+    def lookup(self, code):
+        """
+        Returns:
+            tuple: (id, original_url, expiration_date, redirect_status, is_active),
+            or None if the code is dirty or not in the snapshot.
+        """
+        if code in self.dirty:
+            return None
+        key = code.encode()
+        for snapshot_file in self.files:
+            values = snapshot_file.find(key)
+            if values is REMOVED:
+                return None
+            if values is not None:
+                return values
+        return None
+
+
+_snapshot = None
+_checked_at = 0
+_lock = threading.Lock()
+
+
+def reload_due():
+    """Whether the next get_snapshot() call re-reads the manifest (and may reload)."""
+    if not settings.SHORTENER_SNAPSHOT_DIR:
+        return False
+    return time.monotonic() - _checked_at >= settings.SHORTENER_SNAPSHOT_RELOAD_INTERVAL
+
+
+def get_snapshot(reload=True):
+    """
+    Return the current snapshot, reloading it when the manifest changes.
+
+    The manifest is re-read at most every SHORTENER_SNAPSHOT_RELOAD_INTERVAL
+    seconds. A reload reads the disk and fetches the dirty codes from Redis;
+    with reload=False the snapshot already loaded is returned as is, without
+    any I/O (for event loops, see reload_due()). Returns None when snapshots
+    are disabled, none was exported yet, or the dirty codes can't be fetched
+    (the snapshot can't be trusted without them).
+    """
+    global _snapshot, _checked_at
+    directory = settings.SHORTENER_SNAPSHOT_DIR
+    if not directory:
+        return None
+    if not reload or time.monotonic() - _checked_at < settings.SHORTENER_SNAPSHOT_RELOAD_INTERVAL:
+        return _snapshot
+    with _lock:
+        if time.monotonic() - _checked_at < settings.SHORTENER_SNAPSHOT_RELOAD_INTERVAL:
+            return _snapshot
+        _checked_at = time.monotonic()
+        try:
+            manifest = read_manifest(directory)
+            if manifest is None:
+                _snapshot = None
+            elif _snapshot is None or _snapshot.generation != manifest['generation']:
+                # Dirty codes first: if an export completes in between, we load
+                # its newer files with a superset of the dirty codes, never the
+                # older files without the codes it has just released
+                dirty = dirty_codes()
+                manifest = read_manifest(directory)
+                # The old maps are closed by garbage collection once no lookup uses them
+                _snapshot = Snapshot(directory, manifest, dirty)
+                logger.info(f"Loaded snapshot generation {_snapshot.generation} ({len(_snapshot.files)} files)")
+        except Exception as e:
+            logger.warning(f"Snapshot unavailable, resolving without it: {e}")
+            _snapshot = None
+    return _snapshot
+
+
+def reset_snapshot():
+    """Forget the loaded snapshot so the next lookup reloads it."""
+    global _snapshot, _checked_at
+    with _lock:
+        _snapshot = None
+        _checked_at = 0
+
+
+def mark_dirty(codes):
+    """Stop answering `codes` from the loaded snapshot (they changed)."""
+    if _snapshot is not None:
+        _snapshot.dirty.update(codes)
+
+
+def refresh_dirty():
+    """Re-fetch the shared dirty codes after invalidations may have been missed."""
+    snapshot = _snapshot
+    if snapshot is None:
+        return
+    try:
+        snapshot.dirty |= dirty_codes()
+    except Exception as e:
+        logger.warning(f"Could not refresh snapshot dirty codes, dropping the snapshot: {e}")
+        reset_snapshot()
+
+
+def live_links():
+    return ShortURL.objects.filter(is_active=True).filter(
+        models.Q(expiration_date__isnull=True) | models.Q(expiration_date__gt=timezone.now())
+    )
+
+
+def export_base(directory, chunk_size=5000):
+    """
+    Write a full snapshot of every live code and make it current.
+
+    The dirty set is rotated before reading, so changes made during the
+    export are still treated as dirty afterwards.
+
+    Returns:
+        int: The number of codes written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous = read_manifest(directory)
+    rotate_dirty_codes()
+    generated_at = time.time()
+    name = f"base-{int(generated_at * 1000)}.snap"
+
+    def entries():
+        rows = live_links().order_by().values_list(*SNAPSHOT_FIELDS).iterator(chunk_size=chunk_size)
+        for row in rows:
+            for code in row[5:]:
+                if code:
+                    yield code, row[:5]
+
+    count = write_snapshot(os.path.join(directory, name), entries(), generated_at)
+    generation = (previous['generation'] + 1) if previous else 1
+    write_manifest(directory, {'generation': generation, 'base': name, 'deltas': []})
+    release_rotated_codes()
+    _remove_unreferenced(directory, name)
+    return count
+
+
+def export_delta(directory, batch_size=1000):
+    """
+    Write the current state of every code changed since the last export.
+
+    Changed codes that are no longer live (deleted, renamed, expired,
+    deactivated) are written as tombstones.
+
+    Returns:
+        int: The number of codes written, or None if there is no base snapshot.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    codes = rotate_dirty_codes()
+    if not codes:
+        release_rotated_codes()
+        return 0
+
+    found = {}
+    ordered = sorted(codes)
+    for start in range(0, len(ordered), batch_size):
+        chunk = ordered[start:start + batch_size]
+        rows = live_links().filter(
+            models.Q(short_key__in=chunk) | models.Q(custom_key__in=chunk)
+        ).values_list(*SNAPSHOT_FIELDS)
+        for row in rows:
+            for code in row[5:]:
+                if code in codes:
+                    found[code] = row[:5]
+
+    generated_at = time.time()
+    name = f"delta-{int(generated_at * 1000)}.snap"
+    count = write_snapshot(os.path.join(directory, name), ((code, found.get(code)) for code in ordered), generated_at)
+    manifest['deltas'].append(name)
+    manifest['generation'] += 1
+    write_manifest(directory, manifest)
+    release_rotated_codes()
+    return count
+
+
+def _remove_unreferenced(directory, base):
+    # Workers still mapping an old file keep it alive until they reload
+    for name in os.listdir(directory):
+        if name.endswith('.snap') and name != base:
+            os.remove(os.path.join(directory, name))
@@ -0,0 +1,246 @@
+"""
+Per-user link totals (UserStats), maintained incrementally.
+
+Link creation and deletion adjust a user's counts from shortener.signals,
+and two periodic sweeps (scheduled with celery beat) catch up with the rest:
+sweep_expired() moves links whose expiration date has passed into
+expired_count, and fold_clicks() adds the clicks recorded since the last
+fold to total_clicks. Redirects only bump click_count and queue the link
+id in a Redis set, so the click total adds no database write (and no hot
+row) to the redirect path; it lags by at most the fold interval. Each adjustment is a single UPDATE of one row, so summary
+numbers never require scanning a user's links. Bulk paths that bypass
+signals (QuerySet.update(), bulk_create) call adjust_user_stats()
+themselves; reconcile_user_stats recomputes everything if totals drift.
+
+total_clicks is the sum of the links' counted_clicks, the part of
+click_count already folded in; deleting a link subtracts that part only.
+Archived links stay in the totals: shortener.archive folds their clicks
+before moving them and moves them inside moving_links(), which the signals
+check.
+"""
+
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import redis
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from .models import ArchivedShortURL, ShortURL, UserStats
+
+logger = logging.getLogger('shortener')
+
+# Ids of links clicked since they were last folded (a Redis set)
+CLICKED_SET_KEY = 'shortener:stats:clicked'
+
+_redis = None
+
+# Set while this thread moves links to or from the archive
+_moving = threading.local()
+
+
+@contextmanager
+def moving_links():
+    """
+    Mark ShortURL deletes and inserts made in this thread during the block as
+    moves to or from the archive, which leave their owners' totals unchanged.
+    """
+    previous = getattr(_moving, 'active', False)
+    _moving.active = True
+    try:
+        yield
+    finally:
+        _moving.active = previous
+
+
+def is_moving_links():
+    return getattr(_moving, 'active', False)
+
+
+def _client():
+    global _redis
+    if _redis is None:
+        # Short timeouts: mark_clicked() runs on the redirect path
+        _redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _redis
+
+
+def adjust_user_stats(user_id, links=0, clicks=0, expired=0):
+    """
+    Apply deltas to a user's totals, creating the row from the links if missing.
+
+    Call it after the change has been written: a missing row is computed
+    from the links as they are now, which already includes the change.
+    """
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        link_count=models.F('link_count') + links,
+        total_clicks=models.F('total_clicks') + clicks,
+        expired_count=models.F('expired_count') + expired,
+    )
+    if not updated:
+        recompute_user_stats([user_id])
+
+
+def recompute_user_stats(user_ids):
+    """
+    Recompute the totals of the given users from their links, archived ones
+    included.
+
+    Returns:
+        int: The number of users whose stored totals were wrong (or missing).
+    """
+    user_ids = list(user_ids)
+    counted = Counter()
+    # Archived links have every click counted (see shortener.archive)
+    for model, clicks in ((ShortURL, 'counted_clicks'), (ArchivedShortURL, 'click_count')):
+        rows = model.objects.filter(user_id__in=user_ids).order_by().values('user_id').annotate(
+            links=models.Count('id'),
+            clicks=models.Sum(clicks),
+            expired=models.Count('id', filter=models.Q(expiry_counted=True)),
+        )
+        for row in rows:
+            counted[row['user_id'], 'links'] += row['links']
+            counted[row['user_id'], 'clicks'] += row['clicks'] or 0
+            counted[row['user_id'], 'expired'] += row['expired']
+    stored = {
+        stats.user_id: (stats.link_count, stats.total_clicks, stats.expired_count)
+        for stats in UserStats.objects.filter(user_id__in=user_ids)
+    }
+    now = timezone.now()
+    rows = []
+    drifted = 0
+    for user_id in user_ids:
+        totals = (counted[user_id, 'links'], counted[user_id, 'clicks'], counted[user_id, 'expired'])
+        if stored.get(user_id) != totals:
+            drifted += 1
+        rows.append(UserStats(
+            user_id=user_id, link_count=totals[0], total_clicks=totals[1], expired_count=totals[2], reconciled_at=now
+        ))
+    try:
+        UserStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['link_count', 'total_clicks', 'expired_count', 'reconciled_at'],
+        )
+    except IntegrityError:
+        # The user was deleted meanwhile
+        pass
+    return drifted
+
+
+def sweep_expired(now=None, batch_size=1000):
+    """
+    Count links whose expiration date has passed since the last sweep.
+
+    Returns:
+        int: The number of links newly counted as expired.
+    """
+    now = now or timezone.now()
+    swept = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                ShortURL.objects.select_for_update(skip_locked=True)
+                .filter(expiry_counted=False, expiration_date__lte=now)
+                .order_by('expiration_date')
+                .values_list('pk', 'user_id')[:batch_size]
+            )
+            if not rows:
+                break
+            ShortURL.objects.filter(pk__in=[pk for pk, _ in rows]).update(expiry_counted=True)
+            for user_id, count in Counter(user_id for _, user_id in rows).items():
+                adjust_user_stats(user_id, expired=count)
+        swept += len(rows)
+    return swept
+
+
+def mark_clicked(url_id):
+    """
+    Queue a clicked link for the next fold_clicks(), once the click commits.
+
+    Without REDIS_URL the fold scans every link instead. A failed SADD only
+    delays the link's clicks until its next click or reconcile_user_stats.
+    """
+    if not settings.REDIS_URL:
+        return
+
+    def queue():
+        try:
+            _client().sadd(CLICKED_SET_KEY, url_id)
+        except redis.RedisError as e:
+            logger.warning(f"Queueing link {url_id} for the click fold failed: {e}")
+
+    transaction.on_commit(queue)
+
+
+def _fold_batch(condition, limit, skip_locked):
+    """
+    Fold the pending clicks of up to `limit` links matching `condition` in one
+    transaction.
+
+    Returns:
+        tuple: (clicks folded, pk of the last link read or None).
+    """
+    with transaction.atomic():
+        rows = list(
+            ShortURL.objects.select_for_update(skip_locked=skip_locked)
+            .filter(condition, click_count__gt=models.F('counted_clicks'))
+            .order_by('pk')
+            .values_list('pk', 'user_id', 'click_count', 'counted_clicks')[:limit]
+        )
+        if not rows:
+            return 0, None
+        ShortURL.objects.filter(pk__in=[pk for pk, *_ in rows]).update(counted_clicks=models.F('click_count'))
+        clicks = Counter()
+        for _, user_id, click_count, counted in rows:
+            clicks[user_id] += click_count - counted
+        for user_id, count in clicks.items():
+            adjust_user_stats(user_id, clicks=count)
+    return sum(clicks.values()), rows[-1][0]
+
+
+def fold_clicks(batch_size=1000, scan=False):
+    """
+    Add the clicks recorded since the last fold to their owners' total_clicks.
+
+    Only the links queued by mark_clicked() are read, a batch popped from the
+    Redis set at a time, so the work follows the number of links clicked, not
+    the size of the table. With scan=True (reconcile_user_stats), or without
+    REDIS_URL, every link is checked instead, in primary-key order.
+
+    Returns:
+        int: The number of clicks folded.
+    """
+    folded = 0
+    if scan or not settings.REDIS_URL:
+        last_pk = 0
+        while last_pk is not None:
+            # A link locked by a redirect is queued again by that redirect
+            count, last_pk = _fold_batch(models.Q(pk__gt=last_pk), batch_size, skip_locked=True)
+            folded += count
+        return folded
+    while True:
+        ids = _client().spop(CLICKED_SET_KEY, batch_size)
+        if not ids:
+            return folded
+        ids = [int(url_id) for url_id in ids]
+        try:
+            # Ids of links deleted or archived meanwhile simply match nothing
+            count, _ = _fold_batch(models.Q(pk__in=ids), len(ids), skip_locked=False)
+        except Exception:
+            _client().sadd(CLICKED_SET_KEY, *ids)
+            raise
+        folded += count
+
+
+def get_user_stats(user):
+    """
+    Return the user's UserStats, computing them first if they don't exist yet.
+    """
+    try:
+        return UserStats.objects.get(user=user)
+    except UserStats.DoesNotExist:
+        recompute_user_stats([user.pk])
+        return UserStats.objects.get(user=user)
@@ -1,68 +1,161 @@
 from celery import shared_task
 from .models import ShortURL
-from .utils import encode_base62
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from .utils import SHORT_KEY_ID_OFFSET, encode_base62
+from .broadcast import get_publisher
 import logging
 
 logger = logging.getLogger('shortener')
 
-@shared_task
+def broadcast_url(url_obj):
+    """Tell open dashboards about a link's key, status and QR code (queued; sent from the worker's publisher loop)."""
+    from django.conf import settings
+    get_publisher().publish(
+        "url_updates",
+        {
+            "type": "url.update",
+            "data": {
+                "action": "new_url",
+                "url_id": url_obj.id,
+                "original_url": url_obj.original_url,
+                "short_url": f"{settings.SITE_URL}/{url_obj.short_key or url_obj.custom_key}/",
+                "click_count": url_obj.click_count,
+                "status": url_obj.status,
+                "qr_code": url_obj.qr_code.url if url_obj.qr_code else None
+            }
+        }
+    )
+
+
+@shared_task(priority=0)
 def generate_short_key_task(url_id):
+    """
+    Activate a new link: assign its short key and mark it done.
+
+    Routed to the 'critical' queue; the QR code is rendered separately by
+    generate_qr_code_task so a QR backlog never holds up activation.
+    """
     logger.info(f"Starting async generation task for URL ID: {url_id}")
     try:
         url_obj = ShortURL.objects.get(id=url_id)
-        # 1. Generate short key if needed
         if not url_obj.short_key and not url_obj.custom_key:
-            url_obj.short_key = encode_base62(url_id + 100000)
+            url_obj.short_key = encode_base62(url_id + SHORT_KEY_ID_OFFSET)
             url_obj.status = 'done'
         elif url_obj.custom_key:
              url_obj.status = 'done'
-        
-        # 2. Generate QR Code
-        import qrcode
-        from io import BytesIO
-        from django.core.files import File
-        from django.conf import settings
-        
-        qr_data = f"{settings.SITE_URL}/{url_obj.short_key or url_obj.custom_key}/"
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        
-        file_name = f"qr_{url_obj.id}.png"
-        url_obj.qr_code.save(file_name, File(buffer), save=False)
-        
         url_obj.save()
-        
-        # Broadcast the new URL
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            "url_updates",
-            {
-                "type": "url.update",
-                "data": {
-                    "action": "new_url",
-                    "url_id": url_obj.id,
-                    "original_url": url_obj.original_url,
-                    "short_url": f"{settings.SITE_URL}/{url_obj.short_key or url_obj.custom_key}/",
-                    "click_count": url_obj.click_count,
-                    "status": url_obj.status,
-                    "qr_code": url_obj.qr_code.url if url_obj.qr_code else None
-                }
-            }
-        )
-        
+        broadcast_url(url_obj)
         logger.info(f"Successfully processed URL ID: {url_id}. Short key: {url_obj.short_key}")
     except ShortURL.DoesNotExist:
         logger.error(f"URL ID {url_id} not found in task.")
-        pass
+        return
     except Exception as e:
         logger.error(f"Task failed for URL ID {url_id}: {str(e)}", exc_info=True)
         if 'url_obj' in locals():
             url_obj.status = 'failed'
             url_obj.save(update_fields=['status'])
+        return
+    generate_qr_code_task.delay(url_id)
+
+
+@shared_task
+def generate_qr_code_task(url_id):
+    """
+    Render and store a link's QR code (stored under its content hash, see shortener.qr).
+
+    Routed to the 'bulk' queue. A failure leaves the link working, just
+    without a QR code.
+    """
+    from django.conf import settings
+    from .qr import render_qr_png, store_qr_png
+
+    url_obj = ShortURL.objects.filter(id=url_id).first()
+    if url_obj is None:
+        logger.error(f"URL ID {url_id} not found in QR task.")
+        return
+    try:
+        qr_data = f"{settings.SITE_URL}/{url_obj.short_key or url_obj.custom_key}/"
+        url_obj.qr_code.name = store_qr_png(render_qr_png(qr_data))
+        # Only the QR column: the link may have been edited since activation
+        url_obj.save(update_fields=['qr_code', 'updated_at'])
+    except Exception as e:
+        logger.error(f"QR generation failed for URL ID {url_id}: {str(e)}", exc_info=True)
+        return
+    broadcast_url(url_obj)
+
+
+# Runs can outlast the broker's visibility timeout; acknowledge up front so
+# a long run is never redelivered to a second worker
+@shared_task(acks_late=False)
+def check_link_health_task(limit=None):
+    """
+    Check the links whose last health check is older than the configured age.
+
+    Meant to be scheduled periodically (e.g. with celery beat); every run
+    continues with the links that have waited longest.
+    """
+    from datetime import timedelta
+    from django.conf import settings
+    from .health import LinkChecker, check_due_links
+
+    checker = LinkChecker(
+        settings.SHORTENER_LINK_HEALTH_CONCURRENCY,
+        settings.SHORTENER_LINK_HEALTH_PER_HOST,
+        settings.SHORTENER_LINK_HEALTH_TIMEOUT,
+        allow_private=settings.SHORTENER_LINK_HEALTH_ALLOW_PRIVATE,
+    )
+    checked, broken, disabled = check_due_links(
+        timedelta(hours=settings.SHORTENER_LINK_HEALTH_MAX_AGE_HOURS),
+        limit=limit,
+        checker=checker,
+        disable_after=settings.SHORTENER_LINK_HEALTH_DISABLE_AFTER,
+    )
+    logger.info(f"Link-health run: {checked} checked, {broken} broken, {disabled} deactivated")
+
+
+# A large account can take longer than the broker's visibility timeout;
+# acknowledge up front (an interrupted job is resumed from the admin)
+@shared_task(acks_late=False)
+def run_deletion_job_task(job_id):
+    """Delete the rows of a DeletionJob in chunks (see shortener.deletion)."""
+    from django.conf import settings
+    from .deletion import run_deletion
+    from .models import DeletionJob
+
+    job = DeletionJob.objects.filter(pk=job_id).first()
+    if job is None or job.status == 'done':
+        return
+    try:
+        run_deletion(job, chunk_size=settings.SHORTENER_DELETION_CHUNK_SIZE)
+    except Exception as e:
+        logger.error(f"Deletion job {job_id} failed: {str(e)}", exc_info=True)
+        DeletionJob.objects.filter(pk=job_id).update(status='failed', error=str(e)[:255])
+
+
+@shared_task
+def sweep_expired_links_task():
+    """
+    Count links that expired since the last run into their owners' UserStats.
+
+    Scheduled with celery beat (CELERY_BEAT_SCHEDULE); expired counts lag
+    by at most the schedule interval.
+    """
+    from .stats import sweep_expired
+
+    swept = sweep_expired()
+    if swept:
+        logger.info(f"Expiry sweep: {swept} links newly expired")
+
+
+@shared_task
+def fold_click_totals_task():
+    """
+    Add clicks recorded since the last run to their owners' UserStats.
+
+    Scheduled with celery beat (CELERY_BEAT_SCHEDULE); click totals lag by
+    at most the schedule interval.
+    """
+    from .stats import fold_clicks
+
+    folded = fold_clicks()
+    if folded:
+        logger.info(f"Click fold: {folded} clicks added to user totals")
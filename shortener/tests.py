@@ -1,9 +1,55 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.contrib.auth import get_user_model
-from .models import ShortURL
+from rest_framework.test import APIClient
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+import redis
+from .admin import ShortURLAdmin
+from .api import renderers
+from .api.renderers import FastJSONRenderer
+from .api.serializers import ShortURLSerializer
+from .api.views import ShortURLBulkCreateAPIView
+from .health import LinkChecker
+from .aliases import reserve_aliases, reserved_by_others
+from .archive import archive_links
+from .deletion import run_deletion
+from .models import ArchivedShortURL, DeletionJob, LinkHealth, ShortURL, UserStats
 from .utils import encode_base62
+from .ratelimit import TokenBucketLimiter, get_limiter, parse_rate
+from .qr import render_qr_png, store_qr_png
+from .tasks import generate_qr_code_task, generate_short_key_task, run_deletion_job_task
+from .broadcast import ChannelPublisher
+from .clicks import record_click
+from .logutils import BackgroundHandler, RequestSampleFilter
+from .idempotency import idempotency_cache_key, request_fingerprint
+from .snapshot import REMOVED, SnapshotFile, get_snapshot, reset_snapshot, write_snapshot
+from .search import url_substring_q
+from .stats import fold_clicks, sweep_expired
+from .resolver import clear_local, code_cache_key, evict_local, pin_codes, resolve_code
+from .invalidation import InvalidationSubscriber, LocalCache
+from . import invalidation
+from .hotkeys import HeavyHitters, get_tracker, hot_codes
+from . import resolver
 
 User = get_user_model()
 
@@ -63,3 +109,1467 @@ class ShortURLModelTests(TestCase):
                 original_url=self.original_url,
                 short_key="unique1"
             )
+
+
+class RedirectViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.user = User.objects.create_user(
+            email="redirect@example.com",
+            password="password123",
+            first_name="Redirect",
+            last_name="User"
+        )
+
+    def test_default_redirect_is_uncached_302(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="tmp1")
+        response = self.client.get('/tmp1/')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], "https://example.com")
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_permanent_redirect_is_cacheable(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="perm1", redirect_status=301)
+        response = self.client.get('/perm1/')
+        self.assertEqual(response.status_code, 301)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=86400', response['Cache-Control'])
+
+    def test_max_age_is_capped_by_expiration(self):
+        ShortURL.objects.create(
+            user=self.user,
+            original_url="https://example.com",
+            short_key="perm2",
+            redirect_status=308,
+            expiration_date=timezone.now() + timedelta(seconds=120)
+        )
+        response = self.client.get('/perm2/')
+        self.assertEqual(response.status_code, 308)
+        max_age = int(response['Cache-Control'].split('max-age=')[1].split(',')[0])
+        self.assertLessEqual(max_age, 120)
+
+    @override_settings(SHORTENER_REDIRECT_STATUS=307, SHORTENER_REDIRECT_MAX_AGE=60)
+    def test_global_default_status(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="glob1")
+        response = self.client.get('/glob1/')
+        self.assertEqual(response.status_code, 307)
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+
+class ConditionalAPITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="api@example.com",
+            password="password123",
+            first_name="Api",
+            last_name="User"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="cond1")
+
+    def test_list_etag_returns_304(self):
+        response = self.client.get(reverse('api_url_list_create'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(reverse('api_url_list_create'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        ShortURL.objects.create(user=self.user, original_url="https://example.org", short_key="cond2")
+        response = self.client.get(reverse('api_url_list_create'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_last_modified_returns_304(self):
+        detail_url = reverse('api_url_detail', args=['cond1'])
+        response = self.client.get(detail_url)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('ETag', response)
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        get_limiter().reset()
+        self.addCleanup(get_limiter().reset)
+        self.user = User.objects.create_user(
+            email="limit@example.com",
+            password="password123",
+            first_name="Limit",
+            last_name="User"
+        )
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/s'), 10)
+        self.assertEqual(parse_rate('30/min'), 0.5)
+
+    def test_local_bucket_refills(self):
+        limiter = TokenBucketLimiter()
+        self.assertTrue(limiter.consume('k', rate=1000, burst=1)[0])
+        allowed, wait = limiter.consume('k', rate=0.001, burst=1)
+        self.assertFalse(allowed)
+        self.assertGreater(wait, 0)
+
+    @override_settings(SHORTENER_RATE_LIMITS={'redirect': {'rate': '1/min', 'burst': 2, 'key': 'ip'}})
+    def test_redirect_is_throttled(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="lim1")
+        self.assertEqual(self.client.get('/lim1/').status_code, 302)
+        self.assertEqual(self.client.get('/lim1/').status_code, 302)
+        response = self.client.get('/lim1/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(SHORTENER_RATE_LIMITS={'create': {'rate': '1/min', 'burst': 1, 'key': 'user'}})
+    def test_api_create_is_throttled_per_user(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = {'original_url': 'https://example.com'}
+        self.assertEqual(client.post(reverse('api_url_list_create'), payload).status_code, 201)
+        self.assertEqual(client.post(reverse('api_url_list_create'), payload).status_code, 429)
+        # Reads are not part of the create scope
+        self.assertEqual(client.get(reverse('api_url_list_create')).status_code, 200)
+
+
+class BulkImportExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="bulk@example.com",
+            password="password123",
+            first_name="Bulk",
+            last_name="User"
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_export_and_import_round_trip(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/a", short_key="rt1", click_count=5)
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/b", custom_key="promo")
+
+        for fmt in ('csv', 'jsonl'):
+            path = os.path.join(self.tmpdir.name, f"links.{fmt}")
+            call_command('export_urls', format=fmt, output=path, stderr=StringIO())
+            ShortURL.objects.all().delete()
+
+            call_command('import_urls', path, stdout=StringIO(), stderr=StringIO())
+            self.assertEqual(ShortURL.objects.get(short_key="rt1").click_count, 5)
+            self.assertEqual(ShortURL.objects.get(custom_key="promo").user, self.user)
+
+    def test_export_includes_archived_links(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/live", short_key="live1")
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/cold", short_key="cold1", click_count=4)
+        ShortURL.objects.filter(short_key="cold1").update(status="done", updated_at=timezone.now() - timedelta(days=400))
+        archive_links(timezone.now() - timedelta(days=365))
+        self.assertTrue(ArchivedShortURL.objects.filter(short_key="cold1").exists())
+
+        path = os.path.join(self.tmpdir.name, "links.jsonl")
+        call_command('export_urls', format='jsonl', output=path, stderr=StringIO())
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['short_key'] for row in rows], ["live1", "cold1"])
+        self.assertEqual(rows[1]['status'], 'done')
+        self.assertEqual(rows[1]['user'], self.user.email)
+
+        ShortURL.objects.all().delete()
+        ArchivedShortURL.objects.all().delete()
+        call_command('import_urls', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(ShortURL.objects.get(short_key="cold1").click_count, 4)
+
+    def test_import_generates_keys_and_skips_conflicts(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com", custom_key="taken")
+        path = os.path.join(self.tmpdir.name, "links.jsonl")
+        with open(path, 'w') as f:
+            f.write(json.dumps({'original_url': 'https://example.com/new'}) + "\n")
+            f.write(json.dumps({'original_url': 'https://example.com/dup', 'custom_key': 'taken'}) + "\n")
+            f.write(json.dumps({'original_url': 'not a url'}) + "\n")
+
+        out = StringIO()
+        call_command('import_urls', path, user=self.user.email, batch_size=2, stdout=out, stderr=StringIO())
+        self.assertIn("Imported 1 links, skipped 2", out.getvalue())
+        imported = ShortURL.objects.get(original_url='https://example.com/new')
+        self.assertEqual(imported.short_key, encode_base62(imported.pk + 100000))
+        self.assertEqual(imported.status, 'done')
+
+    def test_import_skips_keys_taken_in_the_other_column(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/a", custom_key="shared")
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/b", short_key="gen1")
+        path = os.path.join(self.tmpdir.name, "links.jsonl")
+        with open(path, 'w') as f:
+            f.write(json.dumps({'original_url': 'https://example.com/c', 'short_key': 'shared'}) + "\n")
+            f.write(json.dumps({'original_url': 'https://example.com/d', 'custom_key': 'gen1'}) + "\n")
+
+        out = StringIO()
+        call_command('import_urls', path, user=self.user.email, stdout=out, stderr=StringIO())
+        self.assertIn("Imported 0 links, skipped 2", out.getvalue())
+
+    def test_import_keeps_generated_keys_on_the_ids_that_generate_them(self):
+        existing = ShortURL.objects.create(user=self.user, original_url="https://example.com", custom_key="mine")
+        pinned_id = existing.pk + 500
+        path = os.path.join(self.tmpdir.name, "links.jsonl")
+        with open(path, 'w') as f:
+            f.write(json.dumps({'original_url': 'https://example.com/pinned', 'short_key': encode_base62(pinned_id + 100000)}) + "\n")
+            # Its id is taken, so a later link would be handed the same key
+            f.write(json.dumps({'original_url': 'https://example.com/clash', 'short_key': encode_base62(existing.pk + 100000)}) + "\n")
+            f.write(json.dumps({'original_url': 'https://example.com/new'}) + "\n")
+
+        out = StringIO()
+        call_command('import_urls', path, user=self.user.email, stdout=out, stderr=StringIO())
+        self.assertIn("Imported 2 links, skipped 1", out.getvalue())
+        self.assertEqual(ShortURL.objects.get(original_url='https://example.com/pinned').pk, pinned_id)
+        new = ShortURL.objects.get(original_url='https://example.com/new')
+        self.assertGreater(new.pk, pinned_id)
+        self.assertEqual(new.short_key, encode_base62(new.pk + 100000))
+
+
+class ExportAPITests(TestCase):
+    def setUp(self):
+        get_limiter().reset()
+        self.addCleanup(get_limiter().reset)
+        self.user = User.objects.create_user(
+            email="export@example.com",
+            password="password123",
+            first_name="Export",
+            last_name="User"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/1", short_key="exp1", click_count=3)
+        other = User.objects.create_user(email="other@example.com", password="password123", first_name="O", last_name="U")
+        ShortURL.objects.create(user=other, original_url="https://example.com/2", short_key="exp2")
+
+    def test_csv_export_streams_only_own_links(self):
+        response = self.client.get(reverse('api_url_export'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('short_key,custom_key,original_url'))
+        self.assertNotIn('click_count', lines[0])
+        self.assertTrue(lines[1].startswith('exp1,'))
+
+    def test_jsonl_export_with_stats(self):
+        response = self.client.get(reverse('api_url_export'), {'format': 'jsonl', 'stats': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['click_count'], 3)
+
+    def test_export_includes_archived_links(self):
+        ShortURL.objects.filter(short_key="exp1").update(status="done", updated_at=timezone.now() - timedelta(days=400))
+        archive_links(timezone.now() - timedelta(days=365))
+        response = self.client.get(reverse('api_url_export'), {'format': 'jsonl', 'stats': 'true'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['short_key'], 'exp1')
+        self.assertEqual(rows[0]['click_count'], 3)
+        self.assertEqual(rows[0]['status'], 'done')
+
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+class QRCodeTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(
+            email="qr@example.com",
+            password="password123",
+            first_name="Qr",
+            last_name="User"
+        )
+
+    def test_identical_images_are_stored_once(self):
+        png = render_qr_png("https://example.com/x/")
+        name = store_qr_png(png)
+        self.assertRegex(name, r'^qr_codes/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(store_qr_png(png), name)
+        self.assertEqual(len(os.listdir(os.path.join(self.media.name, os.path.dirname(name)))), 1)
+
+    def test_task_assigns_key_and_content_addressed_qr(self):
+        url = ShortURL.objects.create(user=self.user, original_url="https://example.com")
+        with mock.patch.object(generate_qr_code_task, 'delay') as queue_qr:
+            generate_short_key_task(url.id)
+        url.refresh_from_db()
+        self.assertEqual(url.status, 'done')
+        self.assertEqual(url.short_key, encode_base62(url.id + 100000))
+        # The QR code is rendered by a separate, lower-priority task
+        self.assertFalse(url.qr_code)
+        queue_qr.assert_called_once_with(url.id)
+
+        generate_qr_code_task(url.id)
+        url.refresh_from_db()
+        self.assertRegex(url.qr_code.name, r'^qr_codes/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+    def test_tasks_are_routed_by_urgency(self):
+        from url_shortener.celery import app
+        self.assertEqual(app.amqp.router.route({}, generate_short_key_task.name)['queue'].name, 'critical')
+        self.assertEqual(app.amqp.router.route({}, generate_qr_code_task.name)['queue'].name, 'bulk')
+        self.assertEqual(generate_short_key_task.priority, 0)
+        self.assertTrue(app.conf.task_ignore_result)
+
+    def test_qr_served_with_immutable_cache(self):
+        name = store_qr_png(render_qr_png("https://example.com/y/"))
+        response = self.client.get('/media/' + name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+
+        with self.settings(SHORTENER_QR_SERVE_MODE='x-accel'):
+            response = self.client.get('/media/' + name)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + name)
+        self.assertEqual(response.content, b'')
+
+
+class RecordingChannelLayer:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    async def group_send(self, group, message):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("layer unavailable")
+        self.sent.append((group, message))
+
+
+class ChannelPublisherTests(TestCase):
+    def test_publishes_from_background_loop(self):
+        layer = RecordingChannelLayer()
+        publisher = ChannelPublisher(channel_layer=layer, batch_size=2)
+        for i in range(5):
+            publisher.publish("url_updates", {"type": "url.update", "data": i})
+        publisher.flush()
+        self.assertEqual([message["data"] for _, message in layer.sent], [0, 1, 2, 3, 4])
+        self.assertEqual(publisher.stats['published'], 5)
+
+    def test_retries_then_drops(self):
+        layer = RecordingChannelLayer(failures=3)
+        publisher = ChannelPublisher(channel_layer=layer, max_retries=1, retry_delay=0)
+        publisher.publish("url_updates", {"type": "url.update", "data": "a"})
+        publisher.flush()
+        publisher.publish("url_updates", {"type": "url.update", "data": "b"})
+        publisher.flush()
+        self.assertEqual(publisher.stats, {'published': 1, 'retried': 2, 'dropped': 1})
+        self.assertEqual(layer.sent[0][1]["data"], "b")
+
+
+class ResolutionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.user = User.objects.create_user(
+            email="cache@example.com",
+            password="password123",
+            first_name="Cache",
+            last_name="User"
+        )
+
+    def test_redirect_is_served_from_cache_and_counts_clicks(self):
+        url = ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="hot1")
+        self.client.get('/hot1/')
+        # Cached lookup: only the click UPDATE hits the database
+        with self.assertNumQueries(1):
+            response = self.client.get('/hot1/')
+        self.assertEqual(response['Location'], "https://example.com")
+        url.refresh_from_db()
+        self.assertEqual(url.click_count, 2)
+
+    def test_changes_evict_old_and_new_codes(self):
+        self.assertIsNone(resolve_code("alias1"))
+        url = ShortURL.objects.create(user=self.user, original_url="https://example.com", custom_key="alias1")
+        self.assertEqual(resolve_code("alias1").original_url, "https://example.com")
+
+        url = ShortURL.objects.get(pk=url.pk)
+        url.custom_key = "alias2"
+        url.save()
+        self.assertIsNone(resolve_code("alias1"))
+        self.assertEqual(resolve_code("alias2").id, url.pk)
+
+        url.delete()
+        self.assertIsNone(resolve_code("alias2"))
+
+    def test_warm_redirect_cache(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/a", short_key="warm1", click_count=10)
+        ShortURL.objects.create(user=self.user, original_url="https://example.com/b", short_key="warm2", click_count=1)
+        ShortURL.objects.create(
+            user=self.user, original_url="https://example.com/c", short_key="warm3", click_count=50,
+            expiration_date=timezone.now() - timedelta(days=1)
+        )
+        cache.clear()
+
+        call_command('warm_redirect_cache', top=1, stdout=StringIO(), stderr=StringIO())
+        self.assertIsNotNone(cache.get(code_cache_key("warm1")))
+        self.assertIsNone(cache.get(code_cache_key("warm2")))
+        self.assertIsNone(cache.get(code_cache_key("warm3")))
+
+    def test_local_cache_serves_without_shared_tier(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="l1a")
+        resolve_code("l1a")
+        cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_code("l1a").original_url, "https://example.com")
+
+    def test_published_invalidation_evicts_local_entry(self):
+        url = ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="l1b")
+        resolve_code("l1b")
+        # A change made elsewhere: no signal fires in this process
+        ShortURL.objects.filter(pk=url.pk).update(original_url="https://example.org")
+        cache.clear()
+        self.assertEqual(resolve_code("l1b").original_url, "https://example.com")
+
+        subscriber = InvalidationSubscriber("redis://localhost:6379/1", evict_local, clear_local)
+        subscriber.handle(json.dumps(["l1b"]))
+        self.assertEqual(resolve_code("l1b").original_url, "https://example.org")
+
+    def test_local_cache_is_bounded_lru_with_ttl(self):
+        local = LocalCache(max_entries=2, ttl=60)
+        local.set("a", 1)
+        local.set("b", 2)
+        local.get("a")
+        local.set("c", 3)
+        self.assertIsNone(local.get("b"))
+        self.assertEqual((local.get("a"), local.get("c")), (1, 3))
+
+        expiring = LocalCache(max_entries=2, ttl=0.01)
+        expiring.set("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(expiring.get("a"))
+
+
+class HeavyHitterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.addCleanup(pin_codes, [])
+        self.user = User.objects.create_user(
+            email="hot@example.com",
+            password="password123",
+            first_name="Hot",
+            last_name="User"
+        )
+
+    def test_top_k_of_skewed_stream(self):
+        hitters = HeavyHitters(k=3, width=256, depth=4)
+        for i in range(2000):
+            hitters.add(f"cold{i}")
+            if i % 2 == 0:
+                hitters.add("campaign")
+            if i % 5 == 0:
+                hitters.add("newsletter")
+        top = hitters.top()
+        self.assertEqual(len(hitters.counts), 3)
+        self.assertEqual(len(hitters.heap), 3)
+        self.assertEqual([code for code, _ in top[:2]], ["campaign", "newsletter"])
+        self.assertGreaterEqual(top[0][1], 1000)
+
+    @override_settings(SHORTENER_HOT_PUBLISH_INTERVAL=0)
+    def test_redirects_publish_and_pin_hot_codes(self):
+        ShortURL.objects.create(user=self.user, original_url="https://example.com", short_key="camp1")
+        tracker = get_tracker()
+        tracker._new_interval()
+        self.client.get('/camp1/')
+        self.assertEqual(hot_codes()[0][0], "camp1")
+        self.assertIn("camp1", resolver._pinned)
+
+        # Pinned: served without touching the cache or the lookup query
+        with self.assertNumQueries(1):
+            self.client.get('/camp1/')
+
+    def test_hot_links_endpoint_is_staff_only(self):
+        cache.set('shortener:hotset', [("camp1", 12.4)])
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(reverse('api_hot_links')).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = client.get(reverse('api_hot_links'))
+        self.assertEqual(response.json(), [{'code': 'camp1', 'estimated_clicks': 12}])
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            password="password123",
+            first_name="Admin",
+            last_name="User"
+        )
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            password="password123",
+            first_name="Owner",
+            last_name="User"
+        )
+        self.urls = [
+            ShortURL.objects.create(user=self.owner, original_url=f"https://example.com/{i}", short_key=f"adm{i}")
+            for i in range(3)
+        ]
+        ShortURL.objects.create(user=self.admin, original_url="https://example.com/other", custom_key="promo")
+        self.client.force_login(self.admin)
+        self.changelist = reverse('admin:shortener_shorturl_changelist')
+
+    def test_cursor_paging(self):
+        with mock.patch.object(ShortURLAdmin, 'list_per_page', 2):
+            response = self.client.get(self.changelist)
+            page = [url.pk for url in response.context['cl'].result_list]
+            next_cursor = response.context['cl'].next_cursor
+            self.assertEqual(next_cursor, page[-1])
+            self.assertContains(response, f"?cursor={next_cursor}")
+
+            response = self.client.get(self.changelist, {'cursor': next_cursor})
+            rest = [url.pk for url in response.context['cl'].result_list]
+            self.assertIsNone(response.context['cl'].next_cursor)
+
+        self.assertEqual(page + rest, sorted(page + rest, reverse=True))
+        self.assertEqual(len(page + rest), 4)
+
+    def test_only_estimated_counts_are_marked_approximate(self):
+        # SQLite keeps no row estimate, so the count is exact
+        response = self.client.get(self.changelist)
+        self.assertContains(response, "4 short urls")
+        self.assertNotContains(response, "~4")
+
+        with mock.patch('shortener.admin.estimate_table_rows', return_value=1200):
+            response = self.client.get(self.changelist)
+        self.assertContains(response, "~1200 short urls")
+
+    def test_search_is_prefix_or_exact_email(self):
+        response = self.client.get(self.changelist, {'q': 'adm'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        response = self.client.get(self.changelist, {'q': 'example.com/other'})
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+        response = self.client.get(self.changelist, {'q': 'admin@example.com'})
+        self.assertEqual([url.custom_key for url in response.context['cl'].result_list], ["promo"])
+
+
+class SearchAPITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="search@example.com",
+            password="password123",
+            first_name="Search",
+            last_name="User"
+        )
+        other = User.objects.create_user(
+            email="other@example.com",
+            password="password123",
+            first_name="Other",
+            last_name="User"
+        )
+        self.blog = ShortURL.objects.create(user=self.user, original_url="https://www.Blog.example.com/posts/launch-day", short_key="srch1")
+        self.shop = ShortURL.objects.create(user=self.user, original_url="https://shop.test/cart?ref=newsletter", custom_key="sale")
+        ShortURL.objects.create(user=other, original_url="https://blog.example.com/posts/launch-day", short_key="srch2")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, term, **params):
+        response = self.client.get(reverse('api_url_search'), {'q': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_domain_is_kept_in_sync(self):
+        self.assertEqual(self.blog.domain, "blog.example.com")
+        self.shop.original_url = "https://Example.org/"
+        self.shop.save()
+        self.assertEqual(ShortURL.objects.get(pk=self.shop.pk).domain, "example.org")
+
+    def test_matches_codes_domains_and_url_substrings(self):
+        self.assertEqual([r['id'] for r in self.search("srch")['results']], [self.blog.pk])
+        self.assertEqual([r['id'] for r in self.search("sa")['results']], [self.shop.pk])
+        self.assertEqual([r['id'] for r in self.search("shop.t")['results']], [self.shop.pk])
+        self.assertEqual([r['id'] for r in self.search("launch")['results']], [self.blog.pk])
+
+        # The index follows writes that bypass save()
+        ShortURL.objects.filter(pk=self.shop.pk).update(original_url="https://shop.test/launch")
+        self.assertEqual({r['id'] for r in self.search("launch")['results']}, {self.blog.pk, self.shop.pk})
+
+    def test_paginates_and_requires_a_term(self):
+        page = self.search("http", page_size=1)
+        self.assertEqual(len(page['results']), 1)
+        self.assertIsNotNone(page['next'])
+        self.assertEqual(self.client.get(reverse('api_url_search')).status_code, 400)
+
+    def test_postgres_substring_filters_the_indexed_column_with_ilike(self):
+        # The pg_trgm index is on the bare column; icontains' UPPER(...) LIKE can't use it
+        postgres = mock.Mock(vendor='postgresql')
+        with mock.patch('shortener.search.connections', {'default': postgres}):
+            condition = url_substring_q("50%_off")
+        sql, params = ShortURL.objects.filter(condition).query.sql_with_params()
+        self.assertIn('"shortener_shorturl"."original_url" ILIKE %s', sql)
+        self.assertNotIn('UPPER', sql)
+        self.assertEqual(params, (r"%50\%\_off%",))
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_limiter().reset()
+        self.addCleanup(get_limiter().reset)
+        self.user = User.objects.create_user(
+            email="idem@example.com",
+            password="password123",
+            first_name="Idem",
+            last_name="User"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('api_url_list_create')
+
+    def test_retry_replays_the_first_response(self):
+        payload = {'original_url': "https://example.com/once"}
+        first = self.client.post(self.url, payload, format='json', HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(first.status_code, 201)
+
+        with self.assertNumQueries(0):
+            retry = self.client.post(self.url, payload, format='json', HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(ShortURL.objects.filter(user=self.user).count(), 1)
+
+    def test_key_reused_with_other_payload_is_rejected(self):
+        self.client.post(self.url, {'original_url': "https://example.com/a"}, format='json', HTTP_IDEMPOTENCY_KEY="k1")
+        response = self.client.post(self.url, {'original_url': "https://example.com/b"}, format='json', HTTP_IDEMPOTENCY_KEY="k1")
+        self.assertEqual(response.status_code, 422)
+
+    @override_settings(SHORTENER_IDEMPOTENCY_WAIT=0)
+    def test_concurrent_duplicate_gets_conflict(self):
+        payload = {'original_url': "https://example.com/slow"}
+        # Simulate the first request still running
+        cache.set(
+            idempotency_cache_key(self.user.pk, 'ShortURLListCreateAPIView', "busy"),
+            {'state': 'pending', 'fingerprint': request_fingerprint(SimpleNamespace(path=self.url, data=payload))}
+        )
+        response = self.client.post(self.url, payload, format='json', HTTP_IDEMPOTENCY_KEY="busy")
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(ShortURL.objects.filter(original_url="https://example.com/slow", user=self.user).exists())
+
+    def test_bulk_create_is_idempotent(self):
+        payload = [{'original_url': "https://example.com/1"}, {'original_url': "https://example.com/2"}]
+        url = reverse('api_url_bulk_create')
+        first = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY="bulk")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(len(first.json()), 2)
+        retry = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY="bulk")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(ShortURL.objects.filter(user=self.user).count(), 2)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Local destination server: /ok works, /get-only rejects HEAD, /hop and
+    /hop-out redirect to /ok on 127.0.0.1 and 127.0.0.2, anything else is 404.
+    """
+    def do_HEAD(self):
+        if self.path in ('/hop', '/hop-out'):
+            host = '127.0.0.1' if self.path == '/hop' else '127.0.0.2'
+            self.send_response(302)
+            self.send_header('Location', f"http://{host}:{self.server.server_port}/ok")
+        elif self.path == '/get-only':
+            self.send_response(405)
+        else:
+            self.send_response(200 if self.path == '/ok' else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self.send_response(200 if self.path in ('/ok', '/get-only') else 404)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+# The stand-in destination server listens on loopback
+@override_settings(SHORTENER_LINK_HEALTH_ALLOW_PRIVATE=True)
+class LinkHealthTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.user = User.objects.create_user(
+            email="health@example.com",
+            password="password123",
+            first_name="Health",
+            last_name="User"
+        )
+        self.ok = ShortURL.objects.create(user=self.user, original_url=f"{self.base}/ok", short_key="hok")
+        self.get_only = ShortURL.objects.create(user=self.user, original_url=f"{self.base}/get-only", short_key="hget")
+        self.dead = ShortURL.objects.create(user=self.user, original_url=f"{self.base}/gone", short_key="hdead")
+
+    def test_records_status_and_rechecks_by_age(self):
+        out = StringIO()
+        call_command('check_links', stdout=out, stderr=StringIO())
+        self.assertIn("Checked 3 links: 1 broken", out.getvalue())
+        self.assertEqual(LinkHealth.objects.get(link=self.ok).status_code, 200)
+        self.assertEqual(LinkHealth.objects.get(link=self.get_only).status_code, 200)
+        dead = LinkHealth.objects.get(link=self.dead)
+        self.assertEqual((dead.ok, dead.status_code, dead.consecutive_failures), (False, 404, 1))
+
+        # Nothing is due again until it ages past --max-age-hours
+        out = StringIO()
+        call_command('check_links', stdout=out, stderr=StringIO())
+        self.assertIn("Checked 0 links", out.getvalue())
+        call_command('check_links', max_age_hours=0, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(LinkHealth.objects.get(link=self.dead).consecutive_failures, 2)
+
+    def test_broken_links_can_be_disabled(self):
+        self.assertIsNotNone(resolve_code("hdead"))
+        call_command('check_links', disable_after=1, stdout=StringIO(), stderr=StringIO())
+        self.dead.refresh_from_db()
+        self.assertFalse(self.dead.is_active)
+        self.assertEqual(self.client.get('/hdead/').status_code, 404)
+        self.assertEqual(self.client.get('/hok/').status_code, 302)
+
+    def test_unreachable_host_is_recorded_as_error(self):
+        link = ShortURL.objects.create(user=self.user, original_url="http://127.0.0.1:9/", short_key="hclosed")
+        results = asyncio.run(LinkChecker(timeout=2, allow_private=True).check_many([(link.pk, link.original_url)]))
+        self.assertIsNone(results[0].status_code)
+        self.assertIn("ConnectError", results[0].error)
+
+    def test_private_destinations_and_redirect_hops_are_refused(self):
+        results = asyncio.run(LinkChecker(timeout=2).check_many([(1, f"{self.base}/ok")]))
+        self.assertIsNone(results[0].status_code)
+        self.assertIn("BlockedDestination", results[0].error)
+
+        # Every hop is checked: 127.0.0.1 is let through here, 127.0.0.2 is not
+        checker = LinkChecker(timeout=2)
+        with mock.patch('shortener.health.is_public_address', lambda address: address == '127.0.0.1'):
+            results = asyncio.run(checker.check_many([(1, f"{self.base}/hop"), (2, f"{self.base}/hop-out")]))
+        self.assertEqual(results[0].status_code, 200)
+        self.assertIsNone(results[1].status_code)
+        self.assertIn("127.0.0.2", results[1].error)
+
+    def test_disabled_links_are_reactivated_when_they_pass(self):
+        call_command('check_links', disable_after=1, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(self.client.get('/hdead/').status_code, 404)
+        # The destination comes back
+        ShortURL.objects.filter(pk=self.dead.pk).update(original_url=f"{self.base}/ok")
+        owner_disabled = ShortURL.objects.create(user=self.user, original_url=f"{self.base}/ok", short_key="hoff", is_active=False)
+        call_command('check_links', max_age_hours=0, disable_after=1, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(self.client.get('/hdead/').status_code, 302)
+        self.assertFalse(LinkHealth.objects.get(link=self.dead).deactivated)
+        owner_disabled.refresh_from_db()
+        self.assertFalse(owner_disabled.is_active)
+
+    def test_unencodable_url_does_not_sink_the_batch(self):
+        links = [(1, f"{self.base}/ok"), (2, "http://xn--ls8h.la/"), (3, "http://[::1/")]
+        results = asyncio.run(LinkChecker(timeout=2, allow_private=True).check_many(links))
+        self.assertEqual([result.link_id for result in results], [1, 2, 3])
+        self.assertEqual(results[0].status_code, 200)
+        self.assertIsNone(results[1].status_code)
+        self.assertTrue(results[1].error)
+        self.assertIsNone(results[2].status_code)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.user = User.objects.create_user(
+            email="archive@example.com",
+            password="password123",
+            first_name="Archive",
+            last_name="User"
+        )
+        self.cold = ShortURL.objects.create(
+            user=self.user, original_url="https://example.com/cold", custom_key="coldlink", status='done', click_count=7
+        )
+        self.warm = ShortURL.objects.create(user=self.user, original_url="https://example.com/warm", short_key="warm1", status='done')
+        ShortURL.objects.filter(pk=self.cold.pk).update(updated_at=timezone.now() - timedelta(days=400))
+
+    def test_archive_and_promote_on_redirect(self):
+        resolve_code("coldlink")
+        out = StringIO()
+        call_command('archive_links', stdout=out)
+        self.assertIn("Archived 1 links", out.getvalue())
+        self.assertFalse(ShortURL.objects.filter(pk=self.cold.pk).exists())
+        self.assertTrue(ArchivedShortURL.objects.filter(pk=self.cold.pk, custom_key="coldlink").exists())
+
+        response = self.client.get('/coldlink/')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], "https://example.com/cold")
+        self.assertFalse(ArchivedShortURL.objects.exists())
+        promoted = ShortURL.objects.get(pk=self.cold.pk)
+        self.assertEqual(promoted.click_count, 8)
+        self.assertEqual(promoted.created_at, self.cold.created_at)
+
+    def test_archived_links_stay_in_user_stats(self):
+        def totals():
+            stats = UserStats.objects.get(user=self.user)
+            return stats.link_count, stats.total_clicks
+
+        fold_clicks()
+        ShortURL.objects.filter(pk=self.cold.pk).update(click_count=9)
+        call_command('archive_links', stdout=StringIO())
+        # The two clicks not folded yet are added as the link moves
+        self.assertEqual(totals(), (2, 9))
+        self.assertIn("0 corrected", self.reconcile())
+
+        self.assertEqual(self.client.get('/coldlink/').status_code, 302)
+        self.assertEqual(totals(), (2, 9))
+        self.assertEqual(fold_clicks(), 1)
+        self.assertEqual(totals(), (2, 10))
+        self.assertIn("0 corrected", self.reconcile())
+
+    def reconcile(self):
+        out = StringIO()
+        call_command('reconcile_user_stats', stdout=out)
+        return out.getvalue()
+
+    def test_disabled_and_queued_links_are_not_archived(self):
+        disabled = ShortURL.objects.create(user=self.user, original_url="https://example.com/off", short_key="off1", status='done', is_active=False)
+        job = DeletionJob.objects.create(user=self.user, email=self.user.email, kind='links')
+        queued = ShortURL.objects.create(user=self.user, original_url="https://example.com/gone", short_key="gone1", status='done', deletion_job=job)
+        ShortURL.objects.filter(pk__in=[disabled.pk, queued.pk]).update(updated_at=timezone.now() - timedelta(days=400))
+        call_command('archive_links', stdout=StringIO())
+        self.assertEqual(list(ArchivedShortURL.objects.values_list('pk', flat=True)), [self.cold.pk])
+        self.assertFalse(resolve_code("off1").is_active)
+
+    def test_owner_can_delete_archived_links(self):
+        other = ShortURL.objects.create(user=self.user, original_url="https://example.com/cold2", short_key="cold2", status='done')
+        ShortURL.objects.filter(pk=other.pk).update(updated_at=timezone.now() - timedelta(days=400))
+        call_command('archive_links', stdout=StringIO())
+        self.assertEqual(ArchivedShortURL.objects.count(), 2)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.assertEqual(client.delete(reverse('api_url_detail', args=["coldlink"])).status_code, 204)
+        with mock.patch.object(run_deletion_job_task, 'delay'):
+            response = client.post(reverse('api_url_bulk_delete'), {'codes': ["cold2"]}, format='json')
+        self.assertEqual((response.status_code, response.data['total']), (202, 1))
+        self.assertFalse(ArchivedShortURL.objects.exists())
+        self.assertEqual(self.client.get('/coldlink/').status_code, 404)
+        self.assertEqual(self.client.get('/cold2/').status_code, 404)
+
+    def test_archived_alias_stays_reserved(self):
+        call_command('archive_links', stdout=StringIO())
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(reverse('api_url_list_create'), {'original_url': "https://example.com/new", 'custom_key': "coldlink"}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('custom_key', response.json())
+
+
+class FakeSetRedis:
+    """The Redis set commands shortener.invalidation uses, kept in memory."""
+    def __init__(self):
+        self.sets = {}
+
+    def publish(self, channel, message):
+        return 0
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(member.encode() for member in members)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    def sunionstore(self, destination, keys):
+        self.sets[destination] = set().union(*(self.sets.get(key, set()) for key in keys))
+
+    def delete(self, key):
+        self.sets.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.commands]
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(
+            SHORTENER_SNAPSHOT_DIR=self.directory, SHORTENER_SNAPSHOT_RELOAD_INTERVAL=0,
+            REDIS_URL='redis://snapshot-test',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch('shortener.invalidation._publisher', FakeSetRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        reset_snapshot()
+        self.addCleanup(reset_snapshot)
+        self.user = User.objects.create_user(
+            email="snap@example.com",
+            password="password123",
+            first_name="Snap",
+            last_name="User"
+        )
+
+    def create(self, **kwargs):
+        return ShortURL.objects.create(user=self.user, status='done', **kwargs)
+
+    def test_snapshots_require_redis(self):
+        self.create(original_url="https://example.com/snap", short_key="snap0")
+        with override_settings(REDIS_URL=None):
+            with self.assertRaises(ImproperlyConfigured):
+                call_command('export_snapshot', stdout=StringIO())
+        call_command('export_snapshot', stdout=StringIO())
+        reset_snapshot()
+        with override_settings(REDIS_URL=None):
+            # Without the dirty codes the snapshot is not used
+            self.assertIsNone(get_snapshot())
+            self.assertEqual(resolve_code("snap0").original_url, "https://example.com/snap")
+
+    def test_failed_dirty_write_is_retried(self):
+        redis_client = mock.MagicMock()
+        redis_client.pipeline.return_value.execute.side_effect = [redis.ConnectionError("blip"), None]
+        with mock.patch('shortener.invalidation._client', return_value=redis_client), \
+                mock.patch('shortener.invalidation._defer', wraps=invalidation._defer) as defer, \
+                mock.patch('shortener.invalidation.threading.Timer'):
+            invalidation.publish_invalidation({"snap1"})
+            defer.assert_called_once_with({"snap1"})
+            self.assertEqual(invalidation._pending, {"snap1"})
+            invalidation._retry()
+        self.assertEqual(invalidation._pending, set())
+        redis_client.pipeline.return_value.sadd.assert_called_with(invalidation.DIRTY_SET_KEY, "snap1")
+
+    def test_file_format_round_trip(self):
+        path = os.path.join(self.directory, "test.snap")
+        expires = timezone.now() + timedelta(days=1)
+        entries = [(f"c{i}", (i, f"https://example.com/{i}", None, None, True)) for i in range(500)]
+        entries += [("zz", (900, "https://example.com/ü", expires, 308, True)), ("gone", None)]
+        write_snapshot(path, reversed(entries), time.time())
+
+        snapshot_file = SnapshotFile(path)
+        self.assertEqual(list(snapshot_file.codes()), sorted(code for code, _ in entries))
+        self.assertEqual(snapshot_file.find(b"c123"), (123, "https://example.com/123", None, None, True))
+        link_id, url, expiration_date, status, active = snapshot_file.find(b"zz")
+        self.assertEqual((url, status), ("https://example.com/ü", 308))
+        self.assertEqual(expiration_date, expires)
+        self.assertIs(snapshot_file.find(b"gone"), REMOVED)
+        self.assertIsNone(snapshot_file.find(b"c5000"))
+
+    def test_redirects_resolve_from_snapshot_without_queries(self):
+        self.create(original_url="https://example.com/snap", short_key="snap1")
+        call_command('export_snapshot', stdout=StringIO())
+        cache.clear()
+        clear_local()
+        reset_snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_code("snap1").original_url, "https://example.com/snap")
+
+    def test_changed_codes_bypass_snapshot_until_delta(self):
+        url = self.create(original_url="https://example.com/old", short_key="snap2")
+        call_command('export_snapshot', stdout=StringIO())
+        self.assertEqual(resolve_code("snap2").original_url, "https://example.com/old")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            url.original_url = "https://example.com/new"
+            url.save()
+        self.assertEqual(resolve_code("snap2").original_url, "https://example.com/new")
+
+        out = StringIO()
+        call_command('export_snapshot', delta=True, stdout=out)
+        self.assertIn("Wrote delta of 1 codes", out.getvalue())
+        cache.clear()
+        clear_local()
+        reset_snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_code("snap2").original_url, "https://example.com/new")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            url.delete()
+        call_command('export_snapshot', delta=True, stdout=StringIO())
+        reset_snapshot()
+        self.assertIsNone(resolve_code("snap2"))
+
+
+class RedirectASGITests(TransactionTestCase):
+    """The standalone resolver app; transactional because it queries from worker threads."""
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        get_limiter().reset()
+        # Links are created with keys; commits here would otherwise queue key generation
+        patcher = mock.patch.object(generate_short_key_task, 'delay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(
+            email="asgi@example.com",
+            password="password123",
+            first_name="Asgi",
+            last_name="User"
+        )
+
+    def request(self, path, method='GET'):
+        from url_shortener.redirect_asgi import application
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': [], 'client': ('10.0.0.1', 1234)}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(application(scope, receive, send))
+        start, body = sent
+        return start['status'], dict(start['headers']), body['body']
+
+    def test_redirect_matches_redirect_view(self):
+        link = ShortURL.objects.create(user=self.user, status='done', original_url="https://example.com/é", short_key="asgi1", redirect_status=301)
+        status, headers, body = self.request('/asgi1/')
+        self.assertEqual(status, 301)
+        self.assertEqual(headers[b'location'].decode(), self.client.get('/asgi1/')['Location'])
+        self.assertEqual(headers[b'cache-control'], b'public, max-age=86400')
+        link.refresh_from_db()
+        self.assertEqual(link.click_count, 2)
+
+        # Repeat hits are answered from process memory
+        with mock.patch('url_shortener.redirect_asgi.resolve_code') as resolve:
+            self.assertEqual(self.request('/asgi1/')[0], 301)
+        resolve.assert_not_called()
+        link.refresh_from_db()
+        self.assertEqual(link.click_count, 3)
+
+    def test_unknown_inactive_and_malformed_paths(self):
+        ShortURL.objects.create(user=self.user, status='done', original_url="https://example.com", short_key="asgi2", is_active=False)
+        self.assertEqual(self.request('/nope/')[0], 404)
+        self.assertEqual(self.request('/asgi2/')[0], 404)
+        self.assertEqual(self.request('/a/b/')[0], 404)
+        self.assertEqual(self.request('/asgi2/', method='POST')[0], 405)
+        status, headers, _ = self.request('/asgi2')
+        self.assertEqual((status, headers[b'location']), (301, b'/asgi2/'))
+
+    def test_snapshot_reload_stays_off_the_event_loop(self):
+        ShortURL.objects.create(user=self.user, status='done', original_url="https://example.com", short_key="asgi3")
+        self.addCleanup(reset_snapshot)
+        threads = set()
+
+        def read_manifest(directory):
+            threads.add(threading.get_ident())
+            return None
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(SHORTENER_SNAPSHOT_DIR=directory, SHORTENER_SNAPSHOT_RELOAD_INTERVAL=0), \
+                mock.patch('shortener.snapshot.read_manifest', side_effect=read_manifest):
+            reset_snapshot()
+            self.assertEqual(self.request('/asgi3/')[0], 302)
+        self.assertTrue(threads)
+        # asyncio.run() drives the loop from this thread
+        self.assertNotIn(threading.get_ident(), threads)
+
+    @override_settings(SHORTENER_RATE_LIMITS={'redirect': {'rate': '1/min', 'burst': 1, 'key': 'ip'}})
+    def test_rate_limited(self):
+        self.assertEqual(self.request('/nope/')[0], 404)
+        status, headers, _ = self.request('/nope/')
+        self.assertEqual(status, 429)
+        self.assertIn(b'retry-after', headers)
+
+
+class CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+        self.threads.add(threading.get_ident())
+
+
+class LoggingTests(TestCase):
+    def test_background_handler_writes_off_thread(self):
+        target = CollectingHandler()
+        target.set_name('test-collect')
+        handler = BackgroundHandler(['test-collect'])
+        log = logging.getLogger('shortener.tests.background')
+        log.addHandler(handler)
+        self.addCleanup(log.removeHandler, handler)
+
+        log.warning("code %s resolved", "abc")
+        handler.close()
+        self.assertEqual(target.messages, ["code abc resolved"])
+        self.assertNotIn(threading.get_ident(), target.threads)
+
+    def test_background_handler_drops_when_full(self):
+        target = CollectingHandler()
+        target.set_name('test-full')
+        handler = BackgroundHandler(['test-full'], queue_size=1)
+        handler.listener.stop()
+        record = logging.makeLogRecord({'msg': "x"})
+        handler.handle(record)
+        handler.handle(record)
+        self.assertEqual(handler.dropped, 1)
+
+    def test_request_filter_samples_info_and_caps_rate(self):
+        sampled = RequestSampleFilter(sample_rate=0)
+        self.assertFalse(sampled.filter(logging.makeLogRecord({'levelno': logging.INFO})))
+        self.assertTrue(sampled.filter(logging.makeLogRecord({'levelno': logging.WARNING})))
+
+        capped = RequestSampleFilter(max_per_second=2)
+        record = logging.makeLogRecord({'levelno': logging.WARNING})
+        with mock.patch('shortener.logutils.time.monotonic', return_value=100.5):
+            self.assertEqual([capped.filter(record) for _ in range(3)], [True, True, False])
+        with mock.patch('shortener.logutils.time.monotonic', return_value=101.2):
+            self.assertTrue(capped.filter(record))
+        self.assertEqual(capped.suppressed, 1)
+
+
+class DeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(
+            email="delete@example.com",
+            password="password123",
+            first_name="Delete",
+            last_name="User"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.links = [
+            ShortURL.objects.create(user=self.user, status='done', original_url=f"https://example.com/{n}", short_key=f"del{n}")
+            for n in range(5)
+        ]
+
+    def test_bulk_delete_disables_then_deletes_in_chunks(self):
+        qr_name = store_qr_png(render_qr_png("https://example.com/del0/"))
+        ShortURL.objects.filter(pk=self.links[0].pk).update(qr_code=qr_name)
+        self.assertEqual(self.client.get('/del0/').status_code, 302)
+
+        with mock.patch.object(run_deletion_job_task, 'delay') as queue_job, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/shorten/bulk/delete/', {'codes': ['del0', 'del1', 'del2', 'nope']}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data['kind'], response.data['total']), ('links', 3))
+        queue_job.assert_called_once_with(response.data['id'])
+
+        # Disabled and hidden before the job runs
+        self.assertEqual(self.client.get('/del0/').status_code, 404)
+        self.assertEqual(len(self.client.get('/api/shorten/').data), 2)
+
+        job = DeletionJob.objects.get(pk=response.data['id'])
+        progress = []
+        run_deletion(job, chunk_size=2, progress=lambda job: progress.append(job.deleted))
+        self.assertEqual(progress, [2, 3])
+        self.assertEqual(ShortURL.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(default_storage.exists(qr_name))
+
+        response = self.client.get(f"/api/jobs/deletion/{job.pk}/")
+        self.assertEqual((response.data['status'], response.data['progress']), ('done', 1.0))
+
+    def test_account_deletion(self):
+        ArchivedShortURL.objects.create(
+            id=999, user=self.user, original_url="https://example.com/cold", short_key="cold1",
+            created_at=timezone.now(), archived_at=timezone.now()
+        )
+        self.assertTrue(resolve_code("del0").is_active)
+        with mock.patch.object(run_deletion_job_task, 'delay'), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/api/auth/me/')
+        # Evicted in the request: the link stops redirecting before the job runs
+        self.assertFalse(resolve_code("del0").is_active)
+        clear_local()
+        self.assertFalse(resolve_code("del0").is_active)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['total'], 6)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(ShortURL.objects.filter(user=self.user, is_active=True).exists())
+
+        run_deletion_job_task(response.data['id'])
+        job = DeletionJob.objects.get(pk=response.data['id'])
+        self.assertEqual((job.status, job.deleted, job.user_id), ('done', 6, None))
+        self.assertFalse(User.objects.filter(email="delete@example.com").exists())
+        self.assertFalse(ArchivedShortURL.objects.exists())
+
+
+class StatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.user = User.objects.create_user(
+            email="stats@example.com",
+            password="password123",
+            first_name="Stats",
+            last_name="User"
+        )
+        self.links = [
+            ShortURL.objects.create(user=self.user, status='done', original_url=f"https://example.com/{n}", short_key=f"st{n}")
+            for n in range(3)
+        ]
+
+    def totals(self):
+        stats = UserStats.objects.get(user=self.user)
+        return stats.link_count, stats.total_clicks, stats.expired_count, stats.active_count
+
+    def test_create_click_and_delete_adjust_totals(self):
+        self.assertEqual(self.totals(), (3, 0, 0, 3))
+        self.client.get('/st0/')
+        self.client.get('/st0/')
+        self.links[1].delete()
+        # Clicks reach the totals when they are folded in
+        self.assertEqual(self.totals(), (2, 0, 0, 2))
+        self.assertEqual(fold_clicks(), 2)
+        self.assertEqual(fold_clicks(), 0)
+        self.assertEqual(self.totals(), (2, 2, 0, 2))
+
+        # A link deleted before its latest clicks were folded takes only the folded ones along
+        self.client.get('/st0/')
+        self.links[0].refresh_from_db()
+        self.links[0].delete()
+        self.assertEqual(self.totals(), (1, 0, 0, 1))
+
+    @override_settings(REDIS_URL='redis://stats-test')
+    def test_fold_reads_only_the_links_clicked_since_the_last_fold(self):
+        clicked = set()
+        fake = mock.Mock()
+        fake.sadd.side_effect = lambda key, *ids: clicked.update(ids)
+        fake.spop.side_effect = lambda key, count: [str(clicked.pop()).encode() for _ in range(min(count, len(clicked)))]
+        with mock.patch('shortener.stats._client', return_value=fake):
+            with self.captureOnCommitCallbacks(execute=True):
+                record_click(self.links[0].pk)
+                record_click(self.links[0].pk)
+                record_click(self.links[2].pk)
+            # Not queued, so only a scan finds it
+            ShortURL.objects.filter(pk=self.links[1].pk).update(click_count=5)
+
+            self.assertEqual(fold_clicks(batch_size=1), 3)
+            self.assertEqual(clicked, set())
+            self.assertEqual(self.totals()[1], 3)
+            self.assertEqual(fold_clicks(scan=True), 5)
+        self.assertEqual(self.totals()[1], 8)
+
+    def test_fold_runs_in_batches_across_users(self):
+        other = User.objects.create_user(email="fold@example.com", password="password123", first_name="F", last_name="U")
+        link = ShortURL.objects.create(user=other, status='done', original_url="https://example.com/other", short_key="st9")
+        ShortURL.objects.filter(pk=self.links[0].pk).update(click_count=3)
+        ShortURL.objects.filter(pk=self.links[2].pk).update(click_count=1)
+        ShortURL.objects.filter(pk=link.pk).update(click_count=5)
+        self.assertEqual(fold_clicks(batch_size=1), 9)
+        self.assertEqual(self.totals()[1], 4)
+        self.assertEqual(UserStats.objects.get(user=other).total_clicks, 5)
+
+    def test_sweep_counts_expired_links_once(self):
+        link = self.links[0]
+        link.expiration_date = timezone.now() - timedelta(minutes=1)
+        link.save()
+        self.assertEqual(sweep_expired(), 1)
+        self.assertEqual(sweep_expired(), 0)
+        self.assertEqual(self.totals(), (3, 0, 1, 2))
+
+        # Extending the link makes it active again
+        link.refresh_from_db()
+        link.expiration_date = timezone.now() + timedelta(days=1)
+        link.save(update_fields=['expiration_date'])
+        link.refresh_from_db()
+        self.assertFalse(link.expiry_counted)
+        self.assertEqual(self.totals(), (3, 0, 0, 3))
+
+    def test_bulk_delete_subtracts_up_front(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(run_deletion_job_task, 'delay'), self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/shorten/bulk/delete/', {'codes': ['st0', 'st1']}, format='json')
+        self.assertEqual(self.totals(), (1, 0, 0, 1))
+        run_deletion(DeletionJob.objects.get(pk=response.data['id']))
+        self.assertEqual(self.totals(), (1, 0, 0, 1))
+
+    def test_reconcile_repairs_drift_and_api_reports_totals(self):
+        UserStats.objects.filter(user=self.user).update(link_count=99, total_clicks=7)
+        ShortURL.objects.filter(pk=self.links[2].pk).update(
+            click_count=4, expiration_date=timezone.now() - timedelta(days=1)
+        )
+        out = StringIO()
+        call_command('reconcile_user_stats', stdout=out)
+        self.assertIn("1 corrected", out.getvalue())
+        self.assertIn("1 links newly expired", out.getvalue())
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('api_user_detail'))
+        self.assertEqual(
+            response.data['stats'],
+            {'link_count': 3, 'active_count': 2, 'expired_count': 1, 'total_clicks': 4}
+        )
+
+
+class ValuesSerializerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="values@example.com",
+            password="password123",
+            first_name="Values",
+            last_name="User"
+        )
+        ShortURL.objects.create(user=self.user, status='done', original_url="https://example.com/plain", short_key="val1")
+        ShortURL.objects.create(
+            user=self.user,
+            status='done',
+            original_url="https://exämple.com/ünïcode\u2028",
+            custom_key="val2",
+            expiration_date=timezone.now() + timedelta(days=3),
+            redirect_status=301,
+            qr_code="qr_codes/val 2.png",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def model_serializer_json(self, path):
+        request = APIRequestFactory().get(path)
+        data = ShortURLSerializer(ShortURL.objects.filter(user=self.user), many=True, context={'request': request}).data
+        return JSONRenderer().render(data)
+
+    def test_list_matches_model_serializer_byte_for_byte(self):
+        response = self.client.get(reverse('api_url_list_create'))
+        self.assertEqual(response.content, self.model_serializer_json(reverse('api_url_list_create')))
+        self.assertEqual(response.json()[0]['qr_code'], "http://testserver/media/qr_codes/val%202.png")
+
+    def test_bulk_create_matches_model_serializer(self):
+        payload = [{'original_url': "https://example.com/b1"}, {'original_url': "https://example.com/b2", 'custom_key': "val3"}]
+        response = self.client.post(reverse('api_url_bulk_create'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        created = ShortURL.objects.filter(pk__in=[row['id'] for row in response.json()]).order_by('pk')
+        expected = ShortURLSerializer(created, many=True, context={'request': response.wsgi_request}).data
+        self.assertEqual(response.json(), json.loads(JSONRenderer().render(expected)))
+
+    def test_bulk_create_rejects_aliases_repeated_in_the_request(self):
+        payload = [
+            {'original_url': "https://a.com", 'custom_key': "same1"},
+            {'original_url': "https://b.com", 'custom_key': "same1"},
+        ]
+        response = self.client.post(reverse('api_url_bulk_create'), payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['non_field_errors'][0], {})
+        self.assertIn('custom_key', response.json()['non_field_errors'][1])
+        self.assertFalse(ShortURL.objects.filter(custom_key="same1").exists())
+
+    def test_bulk_create_alias_race_is_a_conflict(self):
+        # Another request inserted the alias between validation and the insert
+        with mock.patch.object(ShortURLBulkCreateAPIView, 'perform_create', side_effect=IntegrityError):
+            response = self.client.post(
+                reverse('api_url_bulk_create'), [{'original_url': "https://a.com", 'custom_key': "race1"}], format='json'
+            )
+        self.assertEqual(response.status_code, 409)
+
+    @skipUnless(renderers.orjson, "orjson is not installed")
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {'text': "line\u2028sep ünï \"q\"", 'when': timezone.now(), 'items': [1, None, True], 'nested': {'a': []}}
+        with mock.patch.object(renderers.orjson, 'dumps', wraps=renderers.orjson.dumps) as dumps:
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        dumps.assert_called_once()
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2')
+        )
+
+    def test_fast_renderer_falls_back_without_orjson(self):
+        data = {'text': "line\u2028sep", 'when': timezone.now()}
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class AliasCheckTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="alias@example.com",
+            password="password123",
+            first_name="Alias",
+            last_name="User"
+        )
+        self.other = User.objects.create_user(
+            email="rival@example.com",
+            password="password123",
+            first_name="Rival",
+            last_name="User"
+        )
+        ShortURL.objects.create(user=self.other, status='done', original_url="https://example.com/live", custom_key="live")
+        ArchivedShortURL.objects.create(
+            id=9001, user=self.other, original_url="https://example.com/old", short_key="old1",
+            created_at=timezone.now(), archived_at=timezone.now()
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('api_alias_check')
+
+    def check(self, client, aliases, reserve=False):
+        response = client.post(self.url, {'aliases': aliases, 'reserve': reserve}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data, {row['alias']: row['reason'] for row in response.data['results']}
+
+    def test_answers_many_aliases_in_two_queries(self):
+        aliases = ["live", "old1", "a/b", *(f"free{n}" for n in range(200))]
+        # One for live links, one for archived ones
+        with self.assertNumQueries(2):
+            data, reasons = self.check(self.client, aliases)
+        self.assertEqual((reasons["live"], reasons["old1"], reasons["a/b"], reasons["free7"]), ('taken', 'taken', 'invalid', None))
+        self.assertEqual([row['alias'] for row in data['results']], aliases)
+        self.assertIsNone(data['reserved_until'])
+
+    def test_reserved_aliases_are_held_for_the_caller(self):
+        data, reasons = self.check(self.client, ["camp1", "camp2"], reserve=True)
+        self.assertEqual(reasons, {"camp1": None, "camp2": None})
+        self.assertIsNotNone(data['reserved_until'])
+
+        rival = APIClient()
+        rival.force_authenticate(self.other)
+        self.assertEqual(self.check(rival, ["camp1"], reserve=True)[1], {"camp1": 'reserved'})
+        response = rival.post(reverse('api_url_list_create'), {'original_url': "https://example.com", 'custom_key': "camp1"}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Still available to the holder, who can renew and use it
+        self.assertEqual(self.check(self.client, ["camp1"], reserve=True)[1], {"camp1": None})
+        response = self.client.post(reverse('api_url_list_create'), {'original_url': "https://example.com", 'custom_key': "camp1"}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.check(rival, ["camp1"])[1], {"camp1": 'taken'})
+
+    @override_settings(REDIS_URL='redis://alias-test')
+    def test_reservations_are_claimed_in_one_round_trip(self):
+        holders = {f"shortener:alias:camp{n}": str(self.other.pk).encode() for n in (2, 3)}
+        holders["shortener:alias:camp1"] = str(self.user.pk).encode()
+        script = mock.Mock(side_effect=lambda keys, args: [
+            position for position, key in enumerate(keys, 1) if holders.setdefault(key, str(args[0]).encode()) == str(args[0]).encode()
+        ])
+        fake = mock.Mock()
+        fake.register_script.return_value = script
+        fake.mget.side_effect = lambda keys: [holders.get(key) for key in keys]
+        aliases = ["camp0", "camp1", "camp2", "camp4"]
+        with mock.patch('shortener.aliases._client', return_value=fake), \
+                mock.patch('shortener.aliases._reserve_script', None):
+            self.assertEqual(reserved_by_others(self.user.pk, aliases), {"camp2"})
+            self.assertEqual(reserve_aliases(self.user.pk, aliases), {"camp0", "camp1", "camp4"})
+            self.assertEqual(reserve_aliases(self.user.pk, ["camp3"]), set())
+        self.assertEqual(script.call_count, 2)
+        self.assertEqual(script.call_args_list[0].kwargs['keys'], [f"shortener:alias:{alias}" for alias in aliases])
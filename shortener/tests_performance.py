@@ -0,0 +1,184 @@
+"""
+Query-count and wall-time budgets for the request paths that matter.
+
+Each test grows one user's account through SIZES and measures the same
+request at every size. It fails when the path runs more queries than its
+budget, when its query count changes with the account size (an N+1 or an
+unbounded prefetch), or when it is slower than its time budget for that
+size. Paths that return every link of the account get a per-link time
+allowance on top of their base budget; all others must stay flat.
+
+Run just this suite with `python manage.py test shortener.tests_performance`.
+Time budgets are generous for CI machines; scale them with
+PERF_BUDGET_SCALE (e.g. 2 on a slow runner).
+"""
+
+import os
+import tempfile
+import time
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from .models import ShortURL
+from .ratelimit import get_limiter
+from .resolver import clear_local
+from .tasks import generate_qr_code_task, generate_short_key_task
+
+User = get_user_model()
+
+SIZES = (10, 100, 1000)
+
+BUDGET_SCALE = float(os.getenv('PERF_BUDGET_SCALE', '1'))
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@override_settings(
+    SHORTENER_RATE_LIMITS={},
+    # Keep hot-set publishing (and its pin query) out of the measurements
+    SHORTENER_HOT_PUBLISH_INTERVAL=3600,
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+)
+class PerformanceBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        get_limiter().reset()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media_override = override_settings(MEDIA_ROOT=self.media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.user = User.objects.create_user(
+            email="perf@example.com",
+            password="password123",
+            first_name="Perf",
+            last_name="User"
+        )
+        self.link = ShortURL.objects.create(user=self.user, status='done', original_url="https://example.com/first", short_key="perf0")
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def grow_to(self, size):
+        """Give the user `size` links in total (bulk insert, no signals)."""
+        existing = ShortURL.objects.filter(user=self.user).count()
+        ShortURL.objects.bulk_create([
+            ShortURL(
+                user=self.user,
+                status='done',
+                original_url=f"https://example.com/page/{n}",
+                short_key=f"perf{n}",
+                domain="example.com",
+            )
+            for n in range(existing, size)
+        ])
+
+    def assertBudget(self, request, queries, base_ms, per_link_ms=0, before=None):
+        """
+        Run `request` at every size and check it against its budget.
+
+        Args:
+            request (callable): Performs the request and checks its response.
+            queries (int): Most queries allowed, at every size.
+            base_ms (float): Wall-time budget at any size.
+            per_link_ms (float): Extra time allowed per link in the account.
+            before (callable): Untimed reset run before each measurement.
+        """
+        counts = {}
+        for size in SIZES:
+            self.grow_to(size)
+            # Untimed warm-up run: first-use imports and template compilation
+            if size == SIZES[0]:
+                if before:
+                    before()
+                request()
+            if before:
+                before()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                request()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            counts[size] = len(captured)
+            queries_run = '\n'.join(query['sql'] for query in captured.captured_queries)
+            self.assertLessEqual(counts[size], queries, f"{counts[size]} queries at {size} links:\n{queries_run}")
+            budget_ms = (base_ms + per_link_ms * size) * BUDGET_SCALE
+            self.assertLessEqual(elapsed_ms, budget_ms, f"{elapsed_ms:.1f}ms at {size} links (budget {budget_ms:.0f}ms)")
+        self.assertEqual(len(set(counts.values())), 1, f"Query count grows with the account: {counts}")
+
+    def reset_resolution(self):
+        cache.clear()
+        clear_local()
+
+    def test_redirect(self):
+        def request():
+            response = self.client.get('/perf0/')
+            self.assertEqual(response.status_code, 302)
+        # Resolve (cache cold) and count the click
+        self.assertBudget(request, queries=2, base_ms=50, before=self.reset_resolution)
+
+    def test_redirect_cached(self):
+        def request():
+            self.assertEqual(self.client.get('/perf0/').status_code, 302)
+        # Only the click UPDATE once the code is in the L1
+        self.assertBudget(request, queries=1, base_ms=30)
+
+    def test_dashboard(self):
+        self.client.force_login(self.user)
+
+        def request():
+            response = self.client.get('/dashboard/')
+            self.assertEqual(response.status_code, 200)
+        # Session, user, the user's totals, links
+        self.assertBudget(request, queries=4, base_ms=100, per_link_ms=1)
+
+    def test_api_list(self):
+        def request():
+            response = self.api.get('/api/shorten/')
+            self.assertEqual(response.status_code, 200)
+        # Validators aggregate, then the links
+        self.assertBudget(request, queries=2, base_ms=50, per_link_ms=0.5)
+
+    def test_api_detail(self):
+        def request():
+            response = self.api.get('/api/urls/perf0/')
+            self.assertEqual(response.status_code, 200)
+        self.assertBudget(request, queries=1, base_ms=30)
+
+    def test_api_create(self):
+        def request():
+            response = self.api.post('/api/shorten/', {'original_url': "https://example.com/new"}, format='json')
+            self.assertEqual(response.status_code, 201)
+        # Insert, then the owner's totals
+        self.assertBudget(request, queries=2, base_ms=50)
+
+    def test_user_detail(self):
+        def request():
+            response = self.api.get('/api/auth/me/')
+            self.assertEqual(response.status_code, 200)
+        # The user's totals
+        self.assertBudget(request, queries=1, base_ms=30)
+
+    def test_user_detail_with_urls(self):
+        def request():
+            response = self.api.get('/api/auth/me/?include=urls')
+            self.assertEqual(response.status_code, 200)
+        # The user's totals, then the nested links in one query, however many there are
+        self.assertBudget(request, queries=2, base_ms=50, per_link_ms=0.5)
+
+    def test_key_generation_task(self):
+        def request():
+            url = ShortURL.objects.create(user=self.user, original_url="https://example.com/task")
+            with mock.patch.object(generate_qr_code_task, 'delay'):
+                generate_short_key_task(url.id)
+        # Insert and the owner's totals, then the task's fetch and save
+        self.assertBudget(request, queries=4, base_ms=50)
+
+    def test_qr_code_task(self):
+        def request():
+            generate_qr_code_task(self.link.id)
+        # Fetch and save
+        self.assertBudget(request, queries=2, base_ms=100)
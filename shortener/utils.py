@@ -1,4 +1,7 @@
 import string
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.utils import timezone
 
 BASE62_ALPHABET = string.ascii_letters + string.digits
 
@@ -23,3 +26,82 @@ def encode_base62(num):
         arr.append(BASE62_ALPHABET[rem])
     arr.reverse()
     return ''.join(arr)
+
+
+# Generated short keys are encode_base62(id + SHORT_KEY_ID_OFFSET)
+SHORT_KEY_ID_OFFSET = 100000
+
+def decode_base62(key):
+    """
+    Decode a Base62 string back into a number.
+
+    Args:
+        key (str): A string of BASE62_ALPHABET characters.
+
+    Returns:
+        int: The decoded number, or None if `key` isn't Base62.
+    """
+    if not key:
+        return None
+    num = 0
+    base = len(BASE62_ALPHABET)
+    for char in key:
+        digit = BASE62_ALPHABET.find(char)
+        if digit < 0:
+            return None
+        num = num * base + digit
+    return num
+
+
+def generated_key_id(key):
+    """
+    Return the id whose generated short key is `key`, or None if no id
+    generates it.
+    """
+    num = decode_base62(key)
+    if num is None or num < SHORT_KEY_ID_OFFSET or encode_base62(num) != key:
+        return None
+    return num - SHORT_KEY_ID_OFFSET
+
+
+PERMANENT_REDIRECT_STATUSES = (301, 308)
+
+def redirect_cache_max_age(redirect_status, expiration_date=None):
+    """
+    Compute the Cache-Control max-age for a redirect response.
+
+    Permanent and temporary redirects use separate configured lifetimes,
+    and the result never outlives the link's expiration date.
+
+    Args:
+        redirect_status (int): The HTTP status of the redirect.
+        expiration_date (datetime): When the link expires, if ever.
+
+    Returns:
+        int: The max-age in seconds (0 means the response must not be cached).
+    """
+    if redirect_status in PERMANENT_REDIRECT_STATUSES:
+        max_age = settings.SHORTENER_PERMANENT_REDIRECT_MAX_AGE
+    else:
+        max_age = settings.SHORTENER_REDIRECT_MAX_AGE
+    if expiration_date:
+        remaining = int((expiration_date - timezone.now()).total_seconds())
+        max_age = min(max_age, remaining)
+    return max(max_age, 0)
+
+
+def extract_domain(url):
+    """
+    Extract the searchable domain of a URL.
+
+    Args:
+        url (str): An absolute URL.
+
+    Returns:
+        str: The lower-cased host without a leading 'www.', or '' if there is none.
+    """
+    try:
+        host = urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+    return host.removeprefix('www.')
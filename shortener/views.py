@@ -1,24 +1,42 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
-from django.http import HttpResponseRedirect
-from django.db import models, IntegrityError
+import os
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.db import IntegrityError
+from django.utils.cache import add_never_cache_headers, patch_cache_control
 from django.contrib import messages
+from .aliases import reserved_by_others
+from .archive import archived_codes
+from .clicks import record_click
 from .models import ShortURL
+from .hotkeys import get_tracker
+from .resolver import resolve_code
+from .utils import redirect_cache_max_age
+from .ratelimit import RateLimitMixin
+from .stats import get_user_stats
 import logging
 
 logger = logging.getLogger('shortener')
+# Per-request messages: sampled and rate-limited (see shortener.logutils)
+request_logger = logging.getLogger('shortener.requests')
 
-class DashboardView(LoginRequiredMixin, View):
+class DashboardView(LoginRequiredMixin, RateLimitMixin, View):
     """
     User dashboard view.
-    Lists all short URLs created by the user and allows creating new ones.
+    Lists the user's live short URLs (archived ones are counted in the
+    stats but not listed) and allows creating new ones.
     """
     template_name = 'dashboard.html'
+    throttle_scope = 'create'
+    throttle_methods = ('POST',)
     
     def get(self, request):
-        urls = request.user.urls.all()
-        return render(request, self.template_name, {'urls': urls})
+        urls = request.user.urls.filter(deletion_job__isnull=True)
+        stats = get_user_stats(request.user)
+        return render(request, self.template_name, {'urls': urls, 'stats': stats})
     
     def post(self, request):
         original_url = request.POST.get('original_url')
@@ -28,6 +46,14 @@ class DashboardView(LoginRequiredMixin, View):
             try:
                 if not custom_key:
                     custom_key = None
+                elif archived_codes([custom_key]):
+                    # Still reserved by an archived link
+                    messages.error(request, f"The alias '{custom_key}' is already taken. Please choose another one.")
+                    return redirect('dashboard')
+                elif reserved_by_others(request.user.pk, [custom_key]):
+                    # Held by another user's pending alias check (see shortener.aliases)
+                    messages.error(request, f"The alias '{custom_key}' is reserved. Please choose another one.")
+                    return redirect('dashboard')
                     
                 url = ShortURL.objects.create(original_url=original_url, user=request.user, custom_key=custom_key)
                 logger.info(f"URL created by {request.user.email}: {url.short_key or url.custom_key} -> {original_url}")
@@ -38,20 +64,58 @@ class DashboardView(LoginRequiredMixin, View):
         
         return redirect('dashboard')
 
-class RedirectView(View):
+class RedirectView(RateLimitMixin, View):
     """
     Handles the actual URL redirection.
+
+    The redirect status comes from the link (or the global default) and the
+    Cache-Control lifetime is bounded by the link's expiration date.
     """
+    throttle_scope = 'redirect'
+
     def get(self, request, short_code):
-        url_obj = ShortURL.objects.filter(models.Q(short_key=short_code) | models.Q(custom_key=short_code)).first()
-        if not url_obj or url_obj.is_expired():
-            logger.warning(f"404 or Expired access attempt for code: {short_code}")
+        url_obj = resolve_code(short_code)
+        if not url_obj or url_obj.is_expired() or not url_obj.is_active:
+            request_logger.warning("404, expired or inactive access attempt for code: %s", short_code)
             return render(request, '404.html', status=404)
         
-        url_obj.click_count += 1
-        url_obj.save(update_fields=['click_count'])
+        record_click(url_obj.id)
+        get_tracker().record(short_code)
         
-        logger.info(f"Redirecting {short_code} to {url_obj.original_url}")
+        request_logger.info("Redirecting %s to %s", short_code, url_obj.original_url)
+
+        redirect_status = url_obj.get_redirect_status()
+        response = HttpResponseRedirect(url_obj.original_url, status=redirect_status)
+        max_age = redirect_cache_max_age(redirect_status, url_obj.expiration_date)
+        if max_age:
+            patch_cache_control(response, public=True, max_age=max_age)
+        else:
+            add_never_cache_headers(response)
+        return response
 
-        return HttpResponseRedirect(url_obj.original_url)
+class QRCodeView(View):
+    """
+    Serves content-addressed QR images with immutable, far-future caching.
 
+    Depending on SHORTENER_QR_SERVE_MODE the bytes are streamed by Django
+    ('django') or handed off to the front web server via X-Accel-Redirect
+    ('x-accel', nginx) or X-Sendfile ('x-sendfile'), so Python workers never
+    stream image data in production.
+    """
+    def get(self, request, path):
+        name = f"qr_codes/{path}"
+        mode = settings.SHORTENER_QR_SERVE_MODE
+        if mode == 'x-accel':
+            response = HttpResponse(content_type='image/png')
+            response['X-Accel-Redirect'] = settings.SHORTENER_QR_ACCEL_PREFIX + name
+        elif mode == 'x-sendfile':
+            response = HttpResponse(content_type='image/png')
+            response['X-Sendfile'] = os.path.join(settings.MEDIA_ROOT, name)
+        else:
+            try:
+                response = FileResponse(default_storage.open(name), content_type='image/png')
+            except FileNotFoundError:
+                raise Http404
+        # The name is the content hash, so the bytes behind it never change
+        patch_cache_control(response, public=True, max_age=settings.SHORTENER_QR_MAX_AGE, immutable=True)
+        return response
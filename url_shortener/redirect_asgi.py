@@ -0,0 +1,130 @@
+"""
+Standalone ASGI app that serves only short-link redirects.
+
+It answers GET/HEAD /<code>/ from the same resolution chain as RedirectView
+(pinned codes, L1, snapshot, shared cache, database, archive) and records
+clicks the same way, but skips Django's URL resolver, middleware and
+templates, so a redirect is a few dictionary lookups and one send. Codes
+resolved from process memory are answered on the event loop; everything
+that can block (snapshot reloads, cache, database, Redis rate limiter,
+click recording) runs in the thread pool, and clicks are recorded after
+the response is sent.
+
+Run it with `entrypoint.sh resolver` and route /<code>/ to it in front of the
+main app; everything else (dashboard, API, admin) stays on url_shortener.asgi.
+"""
+
+import logging
+import math
+import os
+
+import django
+from asgiref.sync import sync_to_async
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'url_shortener.settings')
+django.setup(set_prefix=False)
+
+from django.conf import settings  # noqa: E402
+from django.db import close_old_connections  # noqa: E402
+from django.utils.encoding import iri_to_uri  # noqa: E402
+from django.utils.http import http_date  # noqa: E402
+from shortener.clicks import record_click  # noqa: E402
+from shortener.hotkeys import get_tracker  # noqa: E402
+from shortener.ratelimit import check_client_rate_limit  # noqa: E402
+from shortener.resolver import resolve_code, resolve_local  # noqa: E402
+from shortener.snapshot import get_snapshot, reload_due  # noqa: E402
+from shortener.utils import redirect_cache_max_age  # noqa: E402
+
+# Per-request messages: sampled and rate-limited (see shortener.logutils)
+request_logger = logging.getLogger('shortener.requests')
+
+NEVER_CACHE = b'max-age=0, no-cache, no-store, must-revalidate, private'
+NOT_FOUND_BODY = b'<!doctype html><title>404 Not Found</title><h1>Link Not Found</h1>'
+
+
+def _resolve(code):
+    close_old_connections()
+    return resolve_code(code)
+
+
+def _record(url_id, code):
+    close_old_connections()
+    record_click(url_id)
+    get_tracker().record(code)
+
+
+resolve_in_thread = sync_to_async(_resolve, thread_sensitive=False)
+record_in_thread = sync_to_async(_record, thread_sensitive=False)
+rate_limit_in_thread = sync_to_async(check_client_rate_limit, thread_sensitive=False)
+reload_snapshot_in_thread = sync_to_async(get_snapshot, thread_sensitive=False)
+
+
+async def send_response(send, status, headers=(), body=b''):
+    await send({'type': 'http.response.start', 'status': status, 'headers': list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    method = scope['method']
+    if method not in ('GET', 'HEAD'):
+        return await send_response(send, 405, [(b'allow', b'GET, HEAD')])
+
+    code, slash, rest = scope['path'][1:].partition('/')
+    if not code or rest:
+        return await send_response(send, 404, [(b'content-type', b'text/html; charset=utf-8')], NOT_FOUND_BODY)
+    if not slash:
+        # What APPEND_SLASH does in the main app
+        location = iri_to_uri(f"{scope['path']}/")
+        if scope.get('query_string'):
+            location += '?' + scope['query_string'].decode('latin-1')
+        return await send_response(send, 301, [(b'location', location.encode('latin-1'))])
+
+    if settings.SHORTENER_RATE_LIMITS.get('redirect'):
+        client_ip = (scope.get('client') or ('',))[0]
+        allowed, wait = await rate_limit_in_thread('redirect', client_ip)
+        if not allowed:
+            request_logger.warning("Rate limit exceeded for scope 'redirect' from %s", client_ip)
+            return await send_response(
+                send, 429,
+                [(b'content-type', b'text/plain'), (b'retry-after', str(math.ceil(wait)).encode())],
+                b'Too many requests. Please slow down.'
+            )
+
+    if reload_due():
+        # Reading the manifest and the dirty codes blocks; keep it off the loop
+        await reload_snapshot_in_thread()
+    resolved = resolve_local(code, reload_snapshot=False)
+    if resolved is None:
+        resolved = await resolve_in_thread(code)
+    if not resolved or resolved.is_expired() or not resolved.is_active:
+        request_logger.warning("404, expired or inactive access attempt for code: %s", code)
+        body = b'' if method == 'HEAD' else NOT_FOUND_BODY
+        return await send_response(send, 404, [(b'content-type', b'text/html; charset=utf-8')], body)
+
+    redirect_status = resolved.get_redirect_status()
+    headers = [(b'location', iri_to_uri(resolved.original_url).encode('latin-1'))]
+    max_age = redirect_cache_max_age(redirect_status, resolved.expiration_date)
+    if max_age:
+        headers.append((b'cache-control', f"public, max-age={max_age}".encode()))
+    else:
+        headers.append((b'cache-control', NEVER_CACHE))
+        headers.append((b'expires', http_date().encode()))
+    await send_response(send, redirect_status, headers)
+
+    # After the response, so the client never waits on the UPDATE
+    await record_in_thread(resolved.id, code)
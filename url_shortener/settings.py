@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -57,6 +58,9 @@ INSTALLED_APPS = [
 
 AUTH_USER_MODEL = 'accounts.User'
 
+# Password checks run on a bounded pool (see accounts.hashing)
+AUTHENTICATION_BACKENDS = ['accounts.backends.PooledModelBackend']
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -116,6 +120,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hasher profile: 'default' (Django's PBKDF2), 'tuned' (PBKDF2 with
+# ACCOUNTS_PBKDF2_ITERATIONS) or 'scrypt'. The first hasher of the profile
+# is preferred; stored hashes made by any other one are rewritten on login.
+PASSWORD_HASHER_PROFILES = {
+    'default': [
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ],
+    'tuned': [
+        'accounts.hashing.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ],
+    'scrypt': [
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+}
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[os.getenv('PASSWORD_HASHER_PROFILE', 'default')]
+ACCOUNTS_PBKDF2_ITERATIONS = int(os.getenv('ACCOUNTS_PBKDF2_ITERATIONS', '600000'))
+
+# Login pool: hashing threads and the max number of running + queued checks
+# before new logins are rejected with 503.
+ACCOUNTS_LOGIN_WORKERS = int(os.getenv('ACCOUNTS_LOGIN_WORKERS', '2'))
+ACCOUNTS_LOGIN_MAX_PENDING = int(os.getenv('ACCOUNTS_LOGIN_MAX_PENDING', '16'))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
@@ -136,13 +168,21 @@ STATIC_URL = 'static/'
 # DRF & JWT Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Same JSON as DRF's JSONRenderer, encoded with orjson when installed
+    'DEFAULT_RENDERER_CLASSES': (
+        'shortener.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'shortener.ratelimit.TokenBucketThrottle',
+    ),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -166,6 +206,50 @@ CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
+# Nothing reads task results; tasks that need one set ignore_result=False
+CELERY_TASK_IGNORE_RESULT = True
+
+# Queues: 'critical' activates new links (key generation) and gets its own
+# workers, so QR rendering ('bulk') and link-health runs ('maintenance')
+# can never delay it. Anything unrouted goes to 'default'.
+# See the worker modes in entrypoint.sh.
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'shortener.tasks.generate_short_key_task': {'queue': 'critical'},
+    'shortener.tasks.generate_qr_code_task': {'queue': 'bulk'},
+    'shortener.tasks.check_link_health_task': {'queue': 'maintenance'},
+    'shortener.tasks.run_deletion_job_task': {'queue': 'maintenance'},
+    'shortener.tasks.sweep_expired_links_task': {'queue': 'maintenance'},
+    'shortener.tasks.fold_click_totals_task': {'queue': 'maintenance'},
+}
+# Periodic tasks, sent by exactly one `entrypoint.sh beat` process. The
+# intervals (seconds) bound how far UserStats lags behind expirations and clicks.
+CELERY_BEAT_SCHEDULE = {
+    'sweep-expired-links': {
+        'task': 'shortener.tasks.sweep_expired_links_task',
+        'schedule': int(os.getenv('SHORTENER_EXPIRY_SWEEP_INTERVAL', '300')),
+    },
+    'fold-click-totals': {
+        'task': 'shortener.tasks.fold_click_totals_task',
+        'schedule': int(os.getenv('SHORTENER_CLICK_FOLD_INTERVAL', '300')),
+    },
+}
+# Priorities within a queue, 0 (highest) to 9; Redis emulates them with one
+# list per step
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    # Unacknowledged (acks_late) tasks are redelivered after this many seconds
+    'visibility_timeout': int(os.getenv('CELERY_VISIBILITY_TIMEOUT', '3600')),
+}
+# Tasks are idempotent: acknowledge after running, so a crashed worker's
+# tasks are redelivered, and reserve one task at a time, so a worker busy
+# with a long task doesn't sit on others that idle workers could run.
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 
 # Channels Configuration
 ASGI_APPLICATION = 'url_shortener.asgi.application'
@@ -178,6 +262,11 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Worker-side broadcast publisher (shortener.broadcast): pending message cap
+# and max messages sent concurrently per flush
+SHORTENER_BROADCAST_MAX_QUEUE = 1000
+SHORTENER_BROADCAST_BATCH_SIZE = 100
+
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 LOGIN_URL = 'login'
@@ -185,9 +274,137 @@ LOGIN_URL = 'login'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How QR images are served: 'django' streams them from Python, 'x-accel'
+# (nginx) and 'x-sendfile' (Apache/lighttpd) hand the file to the web server.
+# For x-accel, SHORTENER_QR_ACCEL_PREFIX must map to an internal location
+# aliased to MEDIA_ROOT.
+SHORTENER_QR_SERVE_MODE = os.getenv('SHORTENER_QR_SERVE_MODE', 'django')
+SHORTENER_QR_ACCEL_PREFIX = os.getenv('SHORTENER_QR_ACCEL_PREFIX', '/protected-media/')
+SHORTENER_QR_MAX_AGE = 60 * 60 * 24 * 365
+
 SITE_URL = os.getenv('SITE_URL', 'http://127.0.0.1:8000')
 
+# Redirect semantics
+# Default status for links without a per-link redirect_status (301, 302, 307 or 308)
+SHORTENER_REDIRECT_STATUS = int(os.getenv('SHORTENER_REDIRECT_STATUS', '302'))
+# Cache-Control max-age (seconds) for temporary (302/307) and permanent (301/308)
+# redirects; always capped by the link's expiration date. 0 disables caching.
+SHORTENER_REDIRECT_MAX_AGE = int(os.getenv('SHORTENER_REDIRECT_MAX_AGE', '0'))
+SHORTENER_PERMANENT_REDIRECT_MAX_AGE = int(os.getenv('SHORTENER_PERMANENT_REDIRECT_MAX_AGE', '86400'))
+
+# Shared Redis for cross-process state such as rate-limit buckets and the cache.
+# Leave unset to keep that state in-process (single worker / development).
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a resolved short code stays cached (evicted early on save/delete),
+# and how long unknown codes are remembered as missing
+SHORTENER_RESOLVE_CACHE_TIMEOUT = int(os.getenv('SHORTENER_RESOLVE_CACHE_TIMEOUT', '86400'))
+SHORTENER_RESOLVE_MISS_TIMEOUT = int(os.getenv('SHORTENER_RESOLVE_MISS_TIMEOUT', '30'))
+
+# Per-process (L1) resolution cache in front of the shared one. Changes are
+# broadcast over Redis pub/sub; the TTL bounds how long a worker can serve a
+# stale destination if a message is lost. A TTL of 0 disables the L1.
+SHORTENER_L1_MAX_ENTRIES = int(os.getenv('SHORTENER_L1_MAX_ENTRIES', '10000'))
+SHORTENER_L1_TTL = float(os.getenv('SHORTENER_L1_TTL', '5'))
+
+# Memory-mapped snapshot of all live codes (shortener.snapshot, written by
+# export_snapshot). Unset disables it. Workers re-read the manifest every
+# RELOAD_INTERVAL seconds; export_snapshot --delta writes a full snapshot
+# instead once MAX_DELTAS deltas have accumulated. The codes changed since
+# the last export are tracked in Redis, so REDIS_URL is required.
+SHORTENER_SNAPSHOT_DIR = os.getenv('SHORTENER_SNAPSHOT_DIR') or None
+if SHORTENER_SNAPSHOT_DIR and not REDIS_URL:
+    raise ImproperlyConfigured("SHORTENER_SNAPSHOT_DIR requires REDIS_URL.")
+SHORTENER_SNAPSHOT_RELOAD_INTERVAL = 30
+SHORTENER_SNAPSHOT_MAX_DELTAS = 24
+
+# Heavy-hitter tracking (shortener.hotkeys): size of the hot set, count-min
+# sketch dimensions, how often each process publishes (seconds) and how much
+# of the previous hot-set counts survive each publish
+SHORTENER_HOT_TOP_K = 100
+SHORTENER_HOT_SKETCH_WIDTH = 4096
+SHORTENER_HOT_SKETCH_DEPTH = 4
+SHORTENER_HOT_PUBLISH_INTERVAL = int(os.getenv('SHORTENER_HOT_PUBLISH_INTERVAL', '10'))
+SHORTENER_HOT_DECAY = 0.5
+
+# Idempotency-Key handling on create endpoints: how long a stored response is
+# replayed, how long an in-flight claim lasts if its worker dies, and how long
+# a concurrent duplicate waits for the first request (seconds)
+SHORTENER_IDEMPOTENCY_TTL = int(os.getenv('SHORTENER_IDEMPOTENCY_TTL', '86400'))
+SHORTENER_IDEMPOTENCY_LOCK_TIMEOUT = 30
+SHORTENER_IDEMPOTENCY_WAIT = 10
+
+# Link-health checks (shortener.health, check_links): re-check links older
+# than MAX_AGE_HOURS, probes in flight overall and per host, per-request
+# timeout (seconds), and consecutive failures before a link is deactivated
+# (0 only records failures)
+SHORTENER_LINK_HEALTH_MAX_AGE_HOURS = int(os.getenv('SHORTENER_LINK_HEALTH_MAX_AGE_HOURS', '168'))
+SHORTENER_LINK_HEALTH_CONCURRENCY = 100
+SHORTENER_LINK_HEALTH_PER_HOST = 4
+SHORTENER_LINK_HEALTH_TIMEOUT = 10
+SHORTENER_LINK_HEALTH_DISABLE_AFTER = int(os.getenv('SHORTENER_LINK_HEALTH_DISABLE_AFTER', '0'))
+SHORTENER_LINK_HEALTH_USER_AGENT = 'SnapURL-LinkChecker/1.0'
+# The checker refuses destinations (and redirect hops) that resolve to
+# loopback, private or link-local addresses; only enable this in development
+SHORTENER_LINK_HEALTH_ALLOW_PRIVATE = os.getenv('SHORTENER_LINK_HEALTH_ALLOW_PRIVATE', 'False') == 'True'
+
+# Days without clicks or edits after which archive_links moves a link to the
+# archive table (it is promoted back on its next redirect)
+SHORTENER_ARCHIVE_AFTER_DAYS = int(os.getenv('SHORTENER_ARCHIVE_AFTER_DAYS', '180'))
+
+# Maximum links accepted by one POST /api/shorten/bulk/
+SHORTENER_BULK_CREATE_MAX = 100
+
+# Seconds a JWT-authenticated user stays cached (evicted early on save/delete)
+ACCOUNTS_USER_CACHE_TIMEOUT = int(os.getenv('ACCOUNTS_USER_CACHE_TIMEOUT', '60'))
+
+# Token-bucket rate limits per route scope. 'rate' is the refill rate, 'burst'
+# the bucket capacity and 'key' the identity a bucket is kept for: 'ip', 'user'
+# or 'token' (the Authorization header). Scopes not listed here are unlimited.
+SHORTENER_RATE_LIMITS = {
+    'redirect': {'rate': '50/s', 'burst': 100, 'key': 'ip'},
+    'create': {'rate': '30/min', 'burst': 10, 'key': 'user'},
+    'login': {'rate': '10/min', 'burst': 5, 'key': 'ip'},
+    'export': {'rate': '10/hour', 'burst': 3, 'key': 'user'},
+}
+
+# Background deletion of accounts and link sets (see shortener.deletion):
+# rows deleted per transaction, and codes accepted per bulk-delete request
+SHORTENER_DELETION_CHUNK_SIZE = int(os.getenv('SHORTENER_DELETION_CHUNK_SIZE', '1000'))
+SHORTENER_BULK_DELETE_MAX = 10000
+
+# Batch alias checks (POST /api/shorten/aliases/check/): aliases accepted per
+# request, and seconds the available ones stay reserved when asked to
+SHORTENER_ALIAS_CHECK_MAX = 500
+SHORTENER_ALIAS_RESERVATION_TTL = int(os.getenv('SHORTENER_ALIAS_RESERVATION_TTL', '300'))
+
 # Logging Configuration
+# With LOG_QUEUE on, loggers only enqueue records and a background thread
+# formats and writes them (see shortener.logutils), so disk I/O never runs
+# on the request path.
+LOG_QUEUE = os.getenv('LOG_QUEUE', 'True') == 'True'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# Per-request messages (redirects, API calls): fraction of INFO records kept,
+# and a cap on records of any level per second and process (0 = no cap)
+SHORTENER_REQUEST_LOG_SAMPLE_RATE = float(os.getenv('SHORTENER_REQUEST_LOG_SAMPLE_RATE', '1'))
+SHORTENER_REQUEST_LOG_MAX_PER_SECOND = int(os.getenv('SHORTENER_REQUEST_LOG_MAX_PER_SECOND', '100'))
+
+LOG_HANDLERS = ['queue'] if LOG_QUEUE else ['console', 'file']
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -201,6 +418,13 @@ LOGGING = {
             'style': '{',
         },
     },
+    'filters': {
+        'request_sample': {
+            '()': 'shortener.logutils.RequestSampleFilter',
+            'sample_rate': SHORTENER_REQUEST_LOG_SAMPLE_RATE,
+            'max_per_second': SHORTENER_REQUEST_LOG_MAX_PER_SECOND,
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
@@ -215,19 +439,34 @@ LOGGING = {
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
-            'level': 'INFO',
+            'handlers': LOG_HANDLERS,
+            # INFO adds little beyond runserver's access log, which Django
+            # routes separately ('django.server')
+            'level': os.getenv('DJANGO_LOG_LEVEL', 'WARNING'),
             'propagate': True,
         },
         'shortener': {
-            'handlers': ['console', 'file'],
+            'handlers': LOG_HANDLERS,
             'level': 'INFO',
             'propagate': True,
         },
+        'shortener.requests': {
+            'filters': ['request_sample'],
+        },
         'accounts': {
-            'handlers': ['console', 'file'],
+            'handlers': LOG_HANDLERS,
             'level': 'INFO',
             'propagate': True,
         },
+        'accounts.requests': {
+            'filters': ['request_sample'],
+        },
     },
 }
+
+if LOG_QUEUE:
+    LOGGING['handlers']['queue'] = {
+        '()': 'shortener.logutils.BackgroundHandler',
+        'handlers': ['console', 'file'],
+        'queue_size': LOG_QUEUE_SIZE,
+    }
@@ -15,10 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from shortener.views import RedirectView
+from shortener.views import QRCodeView, RedirectView
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
@@ -32,6 +32,13 @@ urlpatterns = [
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+
+    # Content-addressed QR images (see shortener.qr)
+    re_path(
+        rf'^{settings.MEDIA_URL.lstrip("/")}qr_codes/(?P<path>[0-9a-f]{{2}}/[0-9a-f]{{64}}\.png)$',
+        QRCodeView.as_view(),
+        name='qr_code',
+    ),
     
     path('<str:short_code>/', RedirectView.as_view(), name='redirect'),
 ]